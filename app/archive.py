@@ -0,0 +1,341 @@
+"""Cold storage for closed months of attendance.
+
+Months older than ``ATTENDANCE_HOT_MONTHS`` are written to one compressed
+Parquet file each in ``ATTENDANCE_ARCHIVE_DIR`` and removed from
+``attendances``, so the hot table only ever holds recent months and
+punching, today's sheet and the kiosk flow cost the same after years of
+history. ``archived_months`` records what has been moved. The hours report,
+file exports and ``summaries.rebuild`` read archived months back from the
+files; the summary tables are never archived.
+
+On MySQL, ``partition`` converts ``attendances`` to monthly RANGE partitions,
+after which archiving a month drops its partition instead of deleting rows.
+
+    python -m app.archive run
+    python -m app.archive status
+    python -m app.archive partition    # MySQL, once
+"""
+import argparse
+import logging
+import os
+from datetime import date, datetime, timedelta
+from sqlalchemy import delete, func, inspect, select, text
+from sqlalchemy.orm import Session
+from app import models
+from app.summaries import month_start
+from config.settings import (
+    ATTENDANCE_ARCHIVE_DIR,
+    ATTENDANCE_HOT_MONTHS,
+    ATTENDANCE_ARCHIVE_COMPRESSION,
+    ATTENDANCE_PARTITION_MONTHS_AHEAD,
+)
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = ("id", "user_id", "user_name", "date", "clock_in", "clock_out")
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Archived attendance needs the pyarrow package")
+    return pa, pq
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_end(month: date) -> date:
+    return add_months(month, 1) - timedelta(days=1)
+
+
+def archived_months(db: Session, start: date, end: date):
+    """``[(month, path)]`` of archived months overlapping ``start``..``end``."""
+    archived = models.ArchivedMonth
+    return db.execute(
+        select(archived.month, archived.path)
+        .where(archived.month.between(month_start(start), end))
+        .order_by(archived.month)
+    ).all()
+
+
+def _read(path, start: date = None, end: date = None):
+    _, pq = _pyarrow()
+    filters = None
+    if start is not None:
+        filters = [("date", ">=", start), ("date", "<=", end)]
+    return pq.read_table(path, filters=filters)
+
+
+def _schema():
+    pa, _ = _pyarrow()
+    return pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("user_name", pa.string()),
+        ("date", pa.date32()),
+        ("clock_in", pa.time32("s")),
+        ("clock_out", pa.time32("s")),
+    ])
+
+
+def iter_punches(db: Session, start: date, end: date):
+    """``(user_id, day, clock_in, clock_out)`` for archived days in ``start``..``end``."""
+    for _, path in archived_months(db, start, end):
+        table = _read(path, start, end)
+        yield from zip(*(table[name].to_pylist() for name in ("user_id", "date", "clock_in", "clock_out")))
+
+
+def load_hours_columns(db: Session, start: date, end: date):
+    """Archived punches as the arrays ``reports.load_grid`` returns, or ``None``.
+
+    Days are ordinals, times are seconds since midnight, missing ones NaN.
+    """
+    months = archived_months(db, start, end)
+    if not months:
+        return None
+    import numpy as np
+    pa, _ = _pyarrow()
+
+    tables = [_read(path, start, end) for _, path in months]
+    table = pa.concat_tables(tables)
+
+    def seconds(name):
+        # Parquet has no seconds unit for times: they come back as time32[ms]
+        column = table[name].cast(pa.time32("s")).cast(pa.int32())
+        return column.to_numpy(zero_copy_only=False).astype(np.float64)
+
+    return {
+        "user_id": table["user_id"].to_numpy().astype(np.int64),
+        "day": table["date"].cast(pa.int32()).to_numpy().astype(np.int64) + _EPOCH_ORDINAL,
+        "clock_in": seconds("clock_in"),
+        "clock_out": seconds("clock_out"),
+    }
+
+
+class PunchLookup:
+    """``get(user_id, day)`` over archived months, holding one month at a time.
+
+    Meant for readers that walk a range in date order, like the exports.
+    """
+
+    def __init__(self, months):
+        self.paths = dict(months)
+        self.month = None
+        self.punches = {}
+
+    def get(self, user_id: int, day: date):
+        month = month_start(day)
+        if month != self.month:
+            self.month = month
+            self.punches = {}
+            if month in self.paths:
+                table = _read(self.paths[month])
+                for uid, punch_day, clock_in, clock_out in zip(
+                    *(table[name].to_pylist() for name in ("user_id", "date", "clock_in", "clock_out"))
+                ):
+                    self.punches[(uid, punch_day)] = (clock_in, clock_out)
+        return self.punches.get((user_id, day))
+
+
+def punch_lookup(db: Session, start: date, end: date):
+    """A ``PunchLookup`` for ``start``..``end``, or ``None`` when nothing there is archived."""
+    months = archived_months(db, start, end)
+    return PunchLookup(months) if months else None
+
+
+def _write(path, rows):
+    pa, pq = _pyarrow()
+    columns = list(zip(*rows)) if rows else [[] for _ in _COLUMNS]
+    table = pa.table([pa.array(values, field.type) for values, field in zip(columns, _schema())], schema=_schema())
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path, compression=ATTENDANCE_ARCHIVE_COMPRESSION)
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _partitions(conn):
+    """Names of the ``attendances`` partitions (MySQL), empty when not partitioned."""
+    if conn.dialect.name != "mysql":
+        return []
+    return list(conn.execute(text(
+        "SELECT partition_name FROM information_schema.partitions "
+        "WHERE table_schema = DATABASE() AND table_name = 'attendances' AND partition_name IS NOT NULL "
+        "ORDER BY partition_ordinal_position"
+    )).scalars())
+
+
+def _partition_name(month: date) -> str:
+    return f"p{month:%Y%m}"
+
+
+def _partition_defs(months):
+    return ", ".join(
+        f"PARTITION {_partition_name(month)} VALUES LESS THAN (TO_DAYS('{add_months(month, 1).isoformat()}'))"
+        for month in months
+    ) + ", PARTITION pmax VALUES LESS THAN MAXVALUE"
+
+
+def archive_month(db: Session, month: date, directory: str = ATTENDANCE_ARCHIVE_DIR) -> int:
+    """Move ``month`` out of ``attendances``; returns the number of rows moved.
+
+    A month that was archived before and has gained rows since (a late kiosk
+    upload) is rewritten with both; punches already archived win.
+    """
+    attendance = models.Attendance
+    last_day = month_end(month)
+    hot = db.execute(
+        select(*(getattr(attendance, name) for name in _COLUMNS))
+        .where(attendance.date.between(month, last_day))
+        .order_by(attendance.date, attendance.user_id)
+    ).all()
+    if not hot:
+        db.rollback()
+        return 0
+
+    record = db.get(models.ArchivedMonth, month)
+    rows = {}
+    if record is not None:
+        for row in zip(*(_read(record.path)[name].to_pylist() for name in _COLUMNS)):
+            rows[(row[1], row[3])] = row
+    for row in hot:
+        key = (row.user_id, row.date)
+        if key not in rows:
+            rows[key] = tuple(row)
+        elif rows[key][5] is None and row.clock_out is not None:
+            rows[key] = rows[key][:5] + (row.clock_out,)
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"attendances-{month:%Y-%m}.parquet")
+    _write(path, sorted(rows.values(), key=lambda row: (row[3], row[1])))
+
+    if record is None:
+        record = models.ArchivedMonth(month=month)
+        db.add(record)
+    record.path = path
+    record.rows = len(rows)
+    record.archived_at = datetime.utcnow()
+
+    ids = [row.id for row in hot]
+    partition = _partition_name(month)
+    drop_partition = False
+    if partition in _partitions(db.connection()):
+        count = db.execute(text(f"SELECT COUNT(*) FROM attendances PARTITION ({partition})")).scalar()
+        drop_partition = count == len(ids)  # Otherwise rows arrived meanwhile: delete only what was archived
+    if not drop_partition:
+        for start in range(0, len(ids), 500):
+            db.execute(delete(attendance).where(attendance.id.in_(ids[start:start + 500])))
+    db.commit()
+    if drop_partition:
+        # DDL commits on its own: a crash before it leaves the rows in both
+        # places, and the next run merges and drops them
+        db.execute(text(f"ALTER TABLE attendances DROP PARTITION {partition}"))
+        db.commit()
+    logger.info(f"Archived {len(ids)} attendance rows for {month:%Y-%m} to {path}")
+    return len(ids)
+
+
+def ensure_partitions(conn, today: date = None, months_ahead: int = ATTENDANCE_PARTITION_MONTHS_AHEAD):
+    """Split ``pmax`` so every month up to ``months_ahead`` has its own partition."""
+    names = _partitions(conn)
+    if not names:
+        return []
+    current = month_start(today or date.today())
+    last = max((name for name in names if name != "pmax"), default=None)
+    first = add_months(date(int(last[1:5]), int(last[5:7]), 1), 1) if last else current
+    months = []
+    month = first
+    while month <= add_months(current, months_ahead):
+        months.append(month)
+        month = add_months(month, 1)
+    if months:
+        conn.execute(text(f"ALTER TABLE attendances REORGANIZE PARTITION pmax INTO ({_partition_defs(months)})"))
+    return [_partition_name(month) for month in months]
+
+
+def partition(engine, today: date = None, months_ahead: int = ATTENDANCE_PARTITION_MONTHS_AHEAD):
+    """Convert ``attendances`` to monthly RANGE partitions on ``date`` (MySQL only).
+
+    MySQL requires the partitioning column in every unique key and does not
+    allow foreign keys on partitioned tables, so the primary key becomes
+    ``(id, date)`` and the ``user_id`` foreign key is dropped.
+    """
+    with engine.begin() as conn:
+        if conn.dialect.name != "mysql":
+            raise RuntimeError("Partitioning is only supported on MySQL; elsewhere archival keeps the table small")
+        if _partitions(conn):
+            return ensure_partitions(conn, today, months_ahead)
+        for foreign_key in inspect(conn).get_foreign_keys("attendances"):
+            conn.execute(text(f"ALTER TABLE attendances DROP FOREIGN KEY {foreign_key['name']}"))
+        conn.execute(text(
+            "ALTER TABLE attendances MODIFY date DATE NOT NULL, DROP PRIMARY KEY, ADD PRIMARY KEY (id, date)"
+        ))
+        current = month_start(today or date.today())
+        first = conn.execute(select(func.min(models.Attendance.date))).scalar()
+        month = month_start(first) if first else current
+        months = []
+        while month <= add_months(current, months_ahead):
+            months.append(month)
+            month = add_months(month, 1)
+        conn.execute(text(f"ALTER TABLE attendances PARTITION BY RANGE (TO_DAYS(date)) ({_partition_defs(months)})"))
+        return [_partition_name(month) for month in months]
+
+
+def run(today: date = None, hot_months: int = ATTENDANCE_HOT_MONTHS):
+    """Archive every month older than the ``hot_months`` most recent ones."""
+    from app.database import SessionLocal, engine
+
+    today = today or date.today()
+    cutoff = add_months(month_start(today), -(max(hot_months, 1) - 1))
+    db = SessionLocal()
+    try:
+        first = db.execute(
+            select(func.min(models.Attendance.date)).where(models.Attendance.date < cutoff)
+        ).scalar()
+        db.rollback()
+        archived = {}
+        month = month_start(first) if first else cutoff
+        while month < cutoff:
+            moved = archive_month(db, month)
+            if moved:
+                archived[f"{month:%Y-%m}"] = moved
+            month = add_months(month, 1)
+    finally:
+        db.close()
+    with engine.begin() as conn:
+        created = ensure_partitions(conn, today)
+    return {"archived": archived, "kept_from": cutoff.isoformat(), "partitions_created": created}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive closed months of attendance")
+    parser.add_argument("command", choices=["run", "status", "partition"])
+    args = parser.parse_args()
+
+    from app.database import SessionLocal, engine
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "run":
+        print(run())
+    elif args.command == "partition":
+        print(partition(engine))
+    else:
+        db = SessionLocal()
+        try:
+            for month, path, rows, archived_at in db.execute(select(
+                models.ArchivedMonth.month, models.ArchivedMonth.path,
+                models.ArchivedMonth.rows, models.ArchivedMonth.archived_at,
+            ).order_by(models.ArchivedMonth.month)):
+                print(f"{month:%Y-%m}  {rows:>8} rows  {path}  (archived {archived_at:%Y-%m-%d %H:%M})")
+            print(f"partitions: {', '.join(_partitions(db.connection())) or 'none'}")
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
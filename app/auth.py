@@ -1,14 +1,21 @@
 from passlib.context import CryptContext
-from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from config.settings import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from collections import OrderedDict
+from config.settings import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, BCRYPT_ROUNDS
+from config.settings import JWT_KEYS, VERIFIED_TOKEN_CACHE_SIZE
 from app.schemas import TokenData
+import base64
+import binascii
+import hashlib
+import hmac
+import json
 import logging
+import threading
+import time
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -16,33 +23,179 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# Compact HS256/384/512 JWTs, signed and verified with HMAC state prepared
+# once per key. Tokens carry the signing key's id in a "kid" header, so keys
+# can be rotated (see JWT_KEYS) without logging everyone out.
+
+_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+_URLSAFE_TO_STANDARD = bytes.maketrans(b"-_", b"+/")
+
+def _b64decode(data: bytes) -> bytes:
+    """Strict unpadded base64url: one valid encoding per value, or InvalidToken.
+
+    Lenient decoding would accept padding, stray characters or non-zero
+    trailing bits, i.e. several spellings of one signature.
+    """
+    if b"+" in data or b"/" in data:
+        raise InvalidToken("Invalid base64url segment")
+    try:
+        decoded = base64.b64decode(data.translate(_URLSAFE_TO_STANDARD) + b"=" * (-len(data) % 4), validate=True)
+    except binascii.Error:
+        raise InvalidToken("Invalid base64url segment")
+    if _b64encode(decoded) != data:
+        raise InvalidToken("Non-canonical base64url segment")
+    return decoded
+
+
+class SigningKey:
+    """A keyring entry: its encoded JWT header and a keyed HMAC that is copied, not re-keyed, per token."""
+    __slots__ = ("kid", "header", "_mac")
+
+    def __init__(self, kid: str, secret: str, algorithm: str = ALGORITHM):
+        self.kid = kid
+        self._mac = hmac.new(secret.encode("utf-8"), digestmod=_DIGESTS[algorithm])
+        header = {"alg": algorithm, "typ": "JWT", "kid": kid}
+        self.header = _b64encode(json.dumps(header, separators=(",", ":")).encode("utf-8"))
+
+    def sign(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+
+def load_keyring(spec: str = JWT_KEYS, default_secret: str = SECRET_KEY):
+    """``kid -> SigningKey`` in ``spec`` order; the first one signs."""
+    entries = [entry.split(":", 1) for entry in spec.split(",") if entry.strip()]
+    if not entries:
+        entries = [("default", default_secret)]
+    keyring = OrderedDict()
+    for kid, secret in entries:
+        keyring[kid.strip()] = SigningKey(kid.strip(), secret)
+    return keyring
+
+
+keyring = load_keyring()
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of decoded tokens, keyed by the token's SHA-256.
+
+    An entry is only served until the token's ``exp``, so a cached token
+    expires exactly when a freshly verified one would.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data = OrderedDict()  # digest -> (exp, TokenData)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: bytes):
+        with self._lock:
+            entry = self._data.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            exp, token_data = entry
+            if exp is not None and exp < time.time():
+                del self._data[digest]
+                self.misses += 1
+                return None
+            self._data.move_to_end(digest)
+            self.hits += 1
+            return token_data
+
+    def set(self, digest: bytes, token_data, exp):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[digest] = (exp, token_data)
+            self._data.move_to_end(digest)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+verified_tokens = VerifiedTokenCache(VERIFIED_TOKEN_CACHE_SIZE)
+
+
 def create_access_token(data: dict):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    
-    # Ensure SECRET_KEY is bytes
-    secret_bytes = SECRET_KEY.encode('utf-8') if isinstance(SECRET_KEY, str) else SECRET_KEY
-    
+    to_encode["exp"] = int(time.time()) + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    key = next(iter(keyring.values()))
     try:
-        return jwt.encode(to_encode, secret_bytes, algorithm=ALGORITHM)
-    except Exception as e:
+        payload = _b64encode(json.dumps(to_encode, separators=(",", ":")).encode("utf-8"))
+    except (TypeError, ValueError) as e:
         logger.error(f"Error creating access token: {str(e)}")
         raise RuntimeError("Failed to create access token")
+    signing_input = key.header + b"." + payload
+    return (signing_input + b"." + _b64encode(key.sign(signing_input))).decode("ascii")
+
+def _verify(token: str) -> dict:
+    """Check signature, algorithm and time claims; returns the claims."""
+    signing_input, _, signature = token.encode("ascii").rpartition(b".")
+    header_segment, _, payload_segment = signing_input.partition(b".")
+    if not header_segment or not payload_segment or b"." in payload_segment:
+        raise InvalidToken("Not enough segments")
+    header = json.loads(_b64decode(header_segment))
+    if not isinstance(header, dict) or header.get("alg") != ALGORITHM:
+        raise InvalidToken("The specified alg value is not allowed")
+    kid = header.get("kid")
+    if kid is None:
+        candidates = keyring.values()  # Issued before key ids; any listed key may have signed it
+    elif kid in keyring:
+        candidates = (keyring[kid],)
+    else:
+        raise InvalidToken(f"Unknown key id {kid!r}")
+    signature = _b64decode(signature)
+    if not any(hmac.compare_digest(key.sign(signing_input), signature) for key in candidates):
+        raise InvalidToken("Signature verification failed")
+    claims = json.loads(_b64decode(payload_segment))
+    if not isinstance(claims, dict):
+        raise InvalidToken("Invalid payload")
+    now = time.time()
+    for name in ("exp", "nbf"):
+        if name in claims and not isinstance(claims[name], (int, float)):
+            raise InvalidToken(f"Invalid {name} claim")
+    if "exp" in claims and claims["exp"] < int(now):
+        raise InvalidToken("Signature has expired")
+    if "nbf" in claims and claims["nbf"] > now:
+        raise InvalidToken("The token is not yet valid (nbf)")
+    if "sub" in claims and not isinstance(claims["sub"], str):
+        raise InvalidToken("Subject must be a string")
+    return claims
 
 def decode_token(token: str):
+    # Tokens verified before are answered from the LRU until they expire
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    cached = verified_tokens.get(digest)
+    if cached is not None:
+        return cached
     try:
-        # Ensure SECRET_KEY is bytes
-        secret_bytes = SECRET_KEY.encode('utf-8') if isinstance(SECRET_KEY, str) else SECRET_KEY
-        
-        payload = jwt.decode(token, secret_bytes, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        return TokenData(email=email)
-    except JWTError as e:
+        claims = _verify(token)
+    except (ValueError, TypeError) as e:  # InvalidToken, bad base64/JSON, non-ASCII
         logger.error(f"JWT Error: {str(e)}")
         return None
-    except Exception as e:
-        logger.error(f"Error decoding token: {str(e)}")
-        return None
\ No newline at end of file
+    email = claims.get("sub")
+    if email is None:
+        return None
+    token_data = TokenData(email=email, exp=claims.get("exp"))
+    verified_tokens.set(digest, token_data, token_data.exp)
+    return token_data
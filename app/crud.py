@@ -1,18 +1,27 @@
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from datetime import datetime, date
-from app import models, schemas
+from app import archive, models, schemas, summaries
+from app.cache import UserSnapshot
+from app.user_index import user_index, record_changes
 from app.auth import get_password_hash, verify_password
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
+from sqlalchemy import Date, and_, cast, func, insert, literal, or_, select, text, true, type_coerce, update
+from app.database import upsert, supports_returning
+from config.settings import SCAN_DEBOUNCE_SECONDS, EXPORT_YIELD_PER, USER_BULK_INSERT_CHUNK
 
 def get_user_by_qr(db: Session, qr_code: str):
-    return db.query(models.User).filter(models.User.qr_code == qr_code).first()
+    # Served from the in-memory index; returns a UserSnapshot
+    users = user_index.by_qr(qr_code)
+    return users[0] if users else None
 
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = get_password_hash(user.password)
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str = None):
+    # Callers that already hashed off-thread pass the hash in
+    if hashed_password is None:
+        hashed_password = get_password_hash(user.password)
     db_user = models.User(
         name=user.name,
         email=user.email,
@@ -25,6 +34,56 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
+# The two lookups below end their transaction so the pooled connection is
+# not held while the password hash is computed in the hashing pool.
+def email_registered(db: Session, email: str):
+    exists = db.query(models.User.id).filter(models.User.email == email).first() is not None
+    db.rollback()
+    return exists
+
+def get_login_credentials(db: Session, email: str):
+    row = db.query(models.User.id, models.User.email, models.User.password)\
+            .filter(models.User.email == email).first()
+    db.rollback()
+    return tuple(row) if row else None
+
+def update_password_hash(db: Session, user_id: int, hashed_password: str):
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.password: hashed_password}, synchronize_session=False
+    )
+    db.commit()
+
+def find_registered(db: Session, emails, qr_codes):
+    """Return the subsets of ``emails`` and ``qr_codes`` already taken by users.
+
+    Like ``email_registered``, ends the transaction before the caller hashes.
+    """
+    taken_emails, taken_qr_codes = set(), set()
+    for chunk in _chunks(list(emails), 500):
+        taken_emails.update(db.scalars(select(models.User.email).where(models.User.email.in_(chunk))))
+    for chunk in _chunks(list(qr_codes), 500):
+        taken_qr_codes.update(db.scalars(select(models.User.qr_code).where(models.User.qr_code.in_(chunk))))
+    db.rollback()
+    return taken_emails, taken_qr_codes
+
+def bulk_create_users(db: Session, users):
+    """Insert ``users`` (dicts of User columns, passwords already hashed) in one transaction.
+
+    Rows go out as chunked executemany batches. Returns ``{email: id}``.
+    """
+    for chunk in _chunks(users, USER_BULK_INSERT_CHUNK):
+        db.execute(insert(models.User), chunk)
+    ids = {}
+    for chunk in _chunks([user["email"] for user in users], 500):
+        ids.update(db.execute(select(models.User.email, models.User.id).where(models.User.email.in_(chunk))).all())
+    # executemany skips the ORM events, so keep the user index current here
+    record_changes(db, db.connection(), [
+        (ids[user["email"]], UserSnapshot(ids[user["email"]], user["name"], user["email"], user["role"]), user["qr_code"])
+        for user in users
+    ])
+    db.commit()
+    return ids
+
 def authenticate_user(db: Session, email: str, password: str):
     user = get_user_by_email(db, email)
     if not user:
@@ -35,38 +94,351 @@ def authenticate_user(db: Session, email: str, password: str):
         return None
     return user
 
+_ATTENDANCE_COLUMNS = (
+    models.Attendance.id,
+    models.Attendance.user_id,
+    models.Attendance.user_name,
+    models.Attendance.date,
+    models.Attendance.clock_in,
+    models.Attendance.clock_out,
+)
+
+def _punch_time():
+    # Whole seconds: MySQL TIME drops fractions and responses are %H:%M:%S anyway
+    return datetime.now().time().replace(microsecond=0)
+
+def _attendance_by_id(db: Session, attendance_id: int):
+    return db.execute(
+        select(*_ATTENDANCE_COLUMNS).where(models.Attendance.id == attendance_id)
+    ).one()
+
 def clock_in(db: Session, user: models.User):
+    """Record today's clock-in with a single upsert.
+
+    A conflicting row is only updated while its ``clock_in`` is NULL, and the
+    database's answer decides the outcome: a concurrent or repeated punch,
+    even within the same second, can neither create a second row nor move
+    the time, and gets a 400.
+    """
     today = date.today()
-    attendance = db.query(models.Attendance).filter_by(user_id=user.id, date=today).first()
-    if not attendance:
-        attendance = models.Attendance(user_id=user.id, user_role=user.role, date=today, clock_in=datetime.now())
-        db.add(attendance)
+    now = _punch_time()
+    table = models.Attendance.__table__
+    values = {"user_id": user.id, "user_name": user.name, "date": today, "clock_in": now}
+    if supports_returning(db):
+        stmt = upsert(
+            db, models.Attendance, values,
+            index_elements=["user_id", "date"],
+            update=lambda new: {"clock_in": new.clock_in},
+            where=table.c.clock_in.is_(None),
+        )
+        attendance = db.execute(stmt.returning(*_ATTENDANCE_COLUMNS)).one_or_none()
     else:
-        attendance.clock_in = datetime.now()
-        attendance.user_role = user.role 
-    db.commit()
-    db.refresh(attendance)
+        # MySQL applies assignments left to right, so id is decided while clock_in
+        # is still the old value. LAST_INSERT_ID(id) only runs when the punch
+        # applies; otherwise no id is reported and lastrowid is 0.
+        stmt = upsert(
+            db, models.Attendance, values,
+            index_elements=["user_id", "date"],
+            update=lambda new: {
+                "id": func.if_(table.c.clock_in.is_(None), func.last_insert_id(table.c.id), table.c.id),
+                "clock_in": func.coalesce(table.c.clock_in, new.clock_in),
+            },
+        )
+        attendance_id = db.execute(stmt).lastrowid
+        attendance = _attendance_by_id(db, attendance_id) if attendance_id else None
+    if attendance is None:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Already clocked in today")
+    summaries.record_clock_in(db, user.id, user.role, today, now)
+    summaries.commit(db)
     return attendance
 
 def clock_out(db: Session, user: models.User):
+    """Record today's clock-out with a single conditional UPDATE."""
     today = date.today()
-    attendance = db.query(models.Attendance).filter_by(user_id=user.id, date=today).first()
-    if attendance:
-        attendance.clock_out = datetime.now()
-        attendance.user_role = user.role 
-        db.commit()
-        db.refresh(attendance)
-        return attendance
-    return None
-
-def get_today_attendance(db: Session):
-    today = date.today()
-    return (
-        db.query(models.Attendance)
-        .options(joinedload(models.Attendance.user))
-        .filter(models.Attendance.date == today)
-        .all()
+    now = _punch_time()
+    todays_row = (models.Attendance.user_id == user.id) & (models.Attendance.date == today)
+    stmt = (
+        update(models.Attendance)
+        .where(todays_row, models.Attendance.clock_out.is_(None))
+        .values(clock_out=now)
     )
+    if supports_returning(db):
+        attendance = db.execute(stmt.returning(*_ATTENDANCE_COLUMNS)).one_or_none()
+    else:
+        attendance = None
+        if db.execute(stmt).rowcount:
+            attendance = db.execute(select(*_ATTENDANCE_COLUMNS).where(todays_row)).one()
+    if attendance is None:
+        # Only the failure path pays for a second lookup to pick the message
+        exists = db.execute(select(models.Attendance.id).where(todays_row)).first()
+        db.rollback()
+        if exists is None:
+            raise HTTPException(status_code=400, detail="You haven't clocked in today")
+        raise HTTPException(status_code=400, detail="Already clocked out today")
+    summaries.record_clock_out(db, user.id, user.role, today, attendance.clock_in, now)
+    summaries.commit(db)
+    return attendance
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _local_naive(timestamp: datetime):
+    return timestamp.astimezone().replace(tzinfo=None) if timestamp.tzinfo else timestamp
+
+def _apply_punches(db: Session, punches):
+    """Apply ``(timestamp, ref, (user_id, name, role), kind)`` punches in time order.
+
+    ``kind`` is ``"clock_in"``, ``"clock_out"`` or ``None`` for a kiosk scan
+    that toggles the day: the first one clocks in, the next one outside the
+    debounce window clocks out, later ones are ignored. Attendance rows are
+    written with chunked multi-row upserts that only fill empty punches, and
+    only what the database reports as written counts: a concurrent writer
+    that got there first turns the punch into "ignored". Days of archived
+    months start from their archived punches; a late clock-out for one is
+    written as a hot row carrying the archived clock-in. Returns ``{ref:
+    (status, user_id, detail)}`` and an ``(event type, attendance record)``
+    pair per applied punch.
+    """
+    returning = supports_returning(db)
+    # Current state of every (user, day) the punches touch
+    state = {}
+    user_ids = list({user_id for _, _, (user_id, _, _), _ in punches})
+    days = list({timestamp.date() for timestamp, _, _, _ in punches})
+    if punches:
+        for chunk in _chunks(user_ids, 500):
+            query = select(*_ATTENDANCE_COLUMNS).where(
+                models.Attendance.user_id.in_(chunk), models.Attendance.date.in_(days)
+            )
+            if not returning:
+                # MySQL cannot report which upserted rows changed, so lock what
+                # the plan is based on (gap locks cover rows not there yet)
+                query = query.with_for_update()
+            for row in db.execute(query):
+                state[(row.user_id, row.date)] = {"clock_in": row.clock_in, "clock_out": row.clock_out}
+        # A late upload can reach a month that was already archived; the
+        # current month never is, so live punches skip the lookup
+        past = [day for day in days if day < summaries.month_start(date.today())]
+        archived = archive.punch_lookup(db, min(past), max(past)) if past else None
+        if archived is not None:
+            for key in sorted({(user_id, timestamp.date()) for timestamp, _, (user_id, _, _), _ in punches},
+                              key=lambda key: key[1]):
+                punch = archived.get(*key) if key not in state else None
+                if punch is not None:
+                    state[key] = {"clock_in": punch[0], "clock_out": punch[1]}
+
+    outcomes = {}
+    changed = {}  # (user_id, day) -> planned row
+    planned = {}  # (user_id, day) -> (role, clock_in planned, [(ref, order, event)])
+    for order, (timestamp, ref, (user_id, name, role), kind) in enumerate(sorted(punches, key=lambda punch: punch[0])):
+        key = (user_id, timestamp.date())
+        day = state.setdefault(key, {"clock_in": None, "clock_out": None})
+        punch_time = timestamp.time().replace(microsecond=0)
+        if kind is None:
+            kind = "clock_in" if day["clock_in"] is None else "clock_out"
+            if kind == "clock_out" and day["clock_out"] is None and \
+                    _seconds_between(day["clock_in"], punch_time) < SCAN_DEBOUNCE_SECONDS:
+                outcomes[ref] = ("ignored", user_id, "Repeat scan")
+                continue
+        if kind == "clock_in":
+            if day["clock_in"] is not None:
+                outcomes[ref] = ("ignored", user_id, "Already clocked in today")
+                continue
+            day["clock_in"] = punch_time
+        else:
+            if day["clock_in"] is None:
+                outcomes[ref] = ("ignored", user_id, "No clock-in record found for today")
+                continue
+            if day["clock_out"] is not None:
+                outcomes[ref] = ("ignored", user_id, "Already clocked out")
+                continue
+            day["clock_out"] = punch_time
+        outcomes[ref] = (kind, user_id, None)
+        changed[key] = {"user_id": user_id, "user_name": name, "date": key[1], **day}
+        entry = planned.setdefault(key, (role, kind == "clock_in", []))
+        entry[2].append((ref, order, (f"attendance.{kind}", dict(changed[key]))))
+
+    table = models.Attendance.__table__
+    key_columns = (table.c.user_id, table.c.date)
+    clock_ins = [row for key, row in changed.items() if planned[key][1]]
+    clock_outs = [row for key, row in changed.items() if not planned[key][1]]
+    if returning:
+        # Rows come back only when inserted or actually updated by the WHERE
+        written = set()
+        for chunk in _chunks(clock_ins, 500):
+            written.update(db.execute(upsert(
+                db, models.Attendance, chunk,
+                index_elements=["user_id", "date"],
+                update=lambda new: {"clock_in": new.clock_in, "clock_out": new.clock_out},
+                where=table.c.clock_in.is_(None),
+            ).returning(*key_columns)).tuples())
+        for chunk in _chunks(clock_outs, 500):
+            for user_id, day, clock_in in db.execute(upsert(
+                db, models.Attendance, chunk,
+                index_elements=["user_id", "date"],
+                update=lambda new: {"clock_out": new.clock_out},
+                where=table.c.clock_in.isnot(None) & table.c.clock_out.is_(None),
+            ).returning(*key_columns, table.c.clock_in)):
+                written.add((user_id, day))
+                changed[(user_id, day)]["clock_in"] = clock_in  # Worked time from the stored clock-in
+    else:
+        written = set(changed)
+        for chunk in _chunks(clock_ins + clock_outs, 500):
+            db.execute(upsert(
+                db, models.Attendance, chunk,
+                index_elements=["user_id", "date"],
+                update=lambda new: {
+                    "clock_in": func.coalesce(table.c.clock_in, new.clock_in),
+                    "clock_out": func.coalesce(table.c.clock_out, new.clock_out),
+                },
+            ))
+
+    events = []
+    for key, (role, clocked_in, applied) in planned.items():
+        row = changed[key]
+        if key not in written:
+            detail = "Already clocked in today" if clocked_in else "Already clocked out"
+            for ref, _, _ in applied:
+                outcomes[ref] = ("ignored", key[0], detail)
+            continue
+        if clocked_in:
+            summaries.record_clock_in(db, key[0], role, key[1], row["clock_in"])
+        if row["clock_out"] is not None:
+            summaries.record_clock_out(db, key[0], role, key[1], row["clock_in"], row["clock_out"])
+        events.extend((order, event) for _, order, event in applied)
+    return outcomes, [event for _, event in sorted(events, key=lambda item: item[0])]
+
+def _store_receipts(db: Session, receipts):
+    for chunk in _chunks(receipts, 500):
+        db.execute(upsert(
+            db, models.ScanReceipt, chunk,
+            index_elements=["idempotency_key"],
+            update=lambda new: {"idempotency_key": new.idempotency_key},
+        ))
+
+def get_scan_receipts(db: Session, keys):
+    receipts = {}
+    for chunk in _chunks(keys, 500):
+        for receipt in db.query(
+            models.ScanReceipt.idempotency_key,
+            models.ScanReceipt.user_id,
+            models.ScanReceipt.status,
+            models.ScanReceipt.detail,
+        ).filter(models.ScanReceipt.idempotency_key.in_(chunk)):
+            receipts[receipt.idempotency_key] = receipt
+    return receipts
+
+def apply_scan_batch(db: Session, scans):
+    """Apply a kiosk batch of QR scans in one transaction.
+
+    Each scan toggles the user's day: the first one clocks in, the next one
+    (outside the debounce window) clocks out, later ones are ignored. Keys that
+    were already processed return their stored result instead of re-applying.
+    Returns one ``schemas.ScanResult`` per input scan, in input order, and
+    an ``(event type, attendance record)`` pair per applied punch.
+    """
+    results = [None] * len(scans)
+    now = datetime.now()
+
+    # Replays: keys repeated inside the batch or already stored from an earlier upload
+    receipts = get_scan_receipts(db, list({scan.idempotency_key for scan in scans}))
+    fresh, seen = [], set()
+    for index, scan in enumerate(scans):
+        receipt = receipts.get(scan.idempotency_key)
+        if receipt is not None or scan.idempotency_key in seen:
+            results[index] = receipt
+            continue
+        seen.add(scan.idempotency_key)
+        fresh.append(index)
+    fresh_indexes = set(fresh)
+
+    # Resolve every QR code from the in-memory user index
+    users_by_qr = {
+        qr_code: [(user.id, user.name, user.role) for user in users]
+        for qr_code, users in user_index.by_qr_codes({scans[index].qr_code for index in fresh}).items()
+    }
+
+    punches = []
+    for index in fresh:
+        matches = users_by_qr.get(scans[index].qr_code, [])
+        if len(matches) == 1:
+            punches.append((_local_naive(scans[index].timestamp), index, matches[0], None))
+    outcomes, events = _apply_punches(db, punches)
+
+    new_receipts = []
+    for index in fresh:
+        scan = scans[index]
+        if index in outcomes:
+            status, user_id, detail = outcomes[index]
+        else:
+            status = "ambiguous_qr" if users_by_qr.get(scan.qr_code) else "unknown_qr"
+            user_id, detail = None, None
+        new_receipts.append({
+            "idempotency_key": scan.idempotency_key,
+            "user_id": user_id,
+            "status": status,
+            "detail": detail,
+            "processed_at": now,
+        })
+        results[index] = schemas.ScanResult(
+            idempotency_key=scan.idempotency_key, status=status, user_id=user_id, detail=detail
+        )
+    _store_receipts(db, new_receipts)
+    summaries.commit(db)
+
+    # Fill in replayed entries (stored receipts or the first copy within this batch)
+    first_by_key = {}
+    for index in fresh:
+        first_by_key.setdefault(scans[index].idempotency_key, results[index])
+    for index, scan in enumerate(scans):
+        if index in fresh_indexes:
+            continue
+        original = results[index] or first_by_key[scan.idempotency_key]
+        results[index] = schemas.ScanResult(
+            idempotency_key=scan.idempotency_key,
+            status=original.status,
+            user_id=original.user_id,
+            detail=original.detail,
+            replayed=True,
+        )
+    return results, events
+
+def apply_buffered_punches(db: Session, punches):
+    """Write a batch of journaled API punches in one transaction.
+
+    ``punches`` are dicts with ``key``, ``user_id``, ``name``, ``role``,
+    ``kind`` and ``timestamp``. The key is stored as a scan receipt, so a
+    journal replayed after a crash skips what was already written.
+    Returns ``{key: (status, user_id, detail)}`` and the events to publish.
+    """
+    done = get_scan_receipts(db, [punch["key"] for punch in punches])
+    pending = [punch for punch in punches if punch["key"] not in done]
+    outcomes, events = _apply_punches(db, [
+        (punch["timestamp"], punch["key"], (punch["user_id"], punch["name"], punch["role"]), punch["kind"])
+        for punch in pending
+    ])
+    now = datetime.now()
+    _store_receipts(db, [
+        {"idempotency_key": key, "user_id": user_id, "status": status, "detail": detail, "processed_at": now}
+        for key, (status, user_id, detail) in outcomes.items()
+    ])
+    summaries.commit(db)
+    for key, receipt in done.items():
+        outcomes[key] = (receipt.status, receipt.user_id, receipt.detail)
+    return outcomes, events
+
+def _seconds_between(earlier, later):
+    return (later.hour * 3600 + later.minute * 60 + later.second) - \
+        (earlier.hour * 3600 + earlier.minute * 60 + earlier.second)
+
+def get_today_attendance(db: Session, user_id: int = None):
+    # Served through ix_attendances_date_user_id; the denormalized user_name
+    # means the users table is not needed
+    query = db.query(models.Attendance).filter(models.Attendance.date == date.today())
+    if user_id is not None:
+        query = query.filter(models.Attendance.user_id == user_id)
+    return query.order_by(models.Attendance.user_id).all()
     
 def create_leave_request(db: Session, user_id: int, leave_request: schemas.LeaveRequestCreate):
     # Get the user object to access the name
@@ -122,16 +494,208 @@ def get_leave_requests(db: Session, user_id: int = None):
                 .all()  
 
 
-# In crud.py
+LEAVE_COLUMNS = (
+    models.LeaveRequest.id,
+    models.LeaveRequest.user_id,
+    models.LeaveRequest.user_name,
+    models.LeaveRequest.date,
+    models.LeaveRequest.reason,
+    models.LeaveRequest.status,
+)
+
+def encode_leave_cursor(row):
+    return f"{row.date.isoformat()}:{row.id}"
+
+def decode_leave_cursor(cursor: str):
+    try:
+        day, leave_id = cursor.split(":")
+        return date.fromisoformat(day), int(leave_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def leave_requests_page_query(user_id: int = None, date_from: date = None, date_to: date = None,
+                              after: str = None, limit: int = None, status: str = None):
+    """Leave requests ordered by (date, id), starting after a keyset ``after`` cursor."""
+    leave = models.LeaveRequest
+    stmt = select(*LEAVE_COLUMNS).order_by(leave.date, leave.id)
+    if user_id is not None:
+        stmt = stmt.where(leave.user_id == user_id)
+    if status is not None:
+        stmt = stmt.where(leave.status == status)
+    if date_from is not None:
+        stmt = stmt.where(leave.date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(leave.date <= date_to)
+    if after is not None:
+        after_date, after_id = decode_leave_cursor(after)
+        stmt = stmt.where(or_(leave.date > after_date, and_(leave.date == after_date, leave.id > after_id)))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
 def is_user_on_leave(db: Session, user_id: int, date: date):
-    # Check if user has an approved leave request for this date
-    return db.query(models.LeaveRequest).filter(
-        models.LeaveRequest.user_id == user_id,
-        models.LeaveRequest.date == date,
-        models.LeaveRequest.status == "approved"
-    ).first() is not None
-    
-    
+    # Approved leave only, from the leave calendar's primary key
+    calendar = models.LeaveCalendar
+    return db.query(calendar.user_id).filter(calendar.date == date, calendar.user_id == user_id).first() is not None
+
+def get_leave_calendar(db: Session, start: date, end: date):
+    """``{day: set of user ids}`` on approved leave in ``start``..``end``, in one query."""
+    calendar = models.LeaveCalendar
+    days = {}
+    for day, user_id in db.execute(select(calendar.date, calendar.user_id).where(calendar.date.between(start, end))):
+        days.setdefault(day, set()).add(user_id)
+    return days
+
+def decide_leave_requests(db: Session, ids, status: str):
+    """Approve or reject the leave requests ``ids`` with one UPDATE.
+
+    Keeps the leave calendar and the summaries in step: a user/day enters
+    the calendar when its first request is approved and leaves it when no
+    approved request covers it any more. Returns ``(updated, unchanged,
+    not_found)`` id lists and the events to publish.
+    """
+    leave = models.LeaveRequest
+    calendar = models.LeaveCalendar
+    ids = list(dict.fromkeys(ids))
+    rows = db.execute(
+        select(leave.id, leave.user_id, leave.date, leave.status, models.User.role)
+        .join(models.User, models.User.id == leave.user_id)
+        .where(leave.id.in_(ids))
+    ).all()
+    found = {row.id for row in rows}
+    changed = [row for row in rows if row.status != status]
+    unchanged = [row.id for row in rows if row.status == status]
+    not_found = [leave_id for leave_id in ids if leave_id not in found]
+    if not changed:
+        db.rollback()
+        return [], unchanged, not_found, []
+
+    changed_ids = [row.id for row in changed]
+    db.execute(
+        update(leave).where(leave.id.in_(changed_ids), leave.status != status)
+        .values(status=status, decided_at=datetime.now()),
+        execution_options={"synchronize_session": False},
+    )
+
+    # (user, day) pairs whose approved coverage may have changed
+    pairs = {(row.user_id, row.date): row.role for row in changed if status == "approved" or row.status == "approved"}
+    if pairs:
+        user_ids = {user_id for user_id, _ in pairs}
+        days = [day for _, day in pairs]
+        in_calendar = set(db.execute(
+            select(calendar.user_id, calendar.date)
+            .where(calendar.user_id.in_(user_ids), calendar.date.between(min(days), max(days)))
+        ).tuples())
+        covered = set(db.execute(
+            select(leave.user_id, leave.date)
+            .where(leave.user_id.in_(user_ids), leave.date.between(min(days), max(days)), leave.status == "approved")
+        ).tuples())
+        added = [pair for pair in pairs if pair in covered and pair not in in_calendar]
+        removed = [pair for pair in pairs if pair in in_calendar and pair not in covered]
+        if added:
+            db.execute(insert(calendar), [{"user_id": user_id, "date": day} for user_id, day in added])
+        for chunk in _chunks(removed, 500):
+            db.execute(calendar.__table__.delete().where(
+                or_(*(and_(calendar.user_id == user_id, calendar.date == day) for user_id, day in chunk))
+            ))
+        for pair in added:
+            summaries.record_leave(db, pair[0], pairs[pair], pair[1])
+        for pair in removed:
+            summaries.record_leave(db, pair[0], pairs[pair], pair[1], delta=-1)
+    summaries.commit(db)
+    events = [("leave.decided", {"ids": changed_ids, "status": status})]
+    return changed_ids, unchanged, not_found, events
+
+def _calendar(db: Session, start: date, end: date):
+    """Recursive CTE with one ``day`` row per date in ``start``..``end``."""
+    dialect = db.get_bind().dialect.name
+    first = literal(start, Date) if dialect == "sqlite" else cast(literal(start, Date), Date)
+    calendar = select(first.label("day")).cte("calendar", recursive=True)
+    if dialect == "mysql":
+        next_day = func.date_add(calendar.c.day, text("INTERVAL 1 DAY"))
+    elif dialect == "postgresql":
+        next_day = calendar.c.day + 1
+    else:
+        next_day = func.date(calendar.c.day, "+1 day")
+    return calendar.union_all(select(next_day).where(calendar.c.day < end))
+
+def attendance_grid_query(db: Session, start: date, end: date, columns=None, ordered: bool = True):
+    """One row per user per day in ``start``..``end``, in a single statement.
+
+    Users are crossed with a calendar CTE and LEFT JOINed to that day's
+    attendance and approved leave, so nothing is shipped back as an IN list. By
+    default a row has ``user_id, name, role, day, clock_in, clock_out,
+    on_leave``; ``columns(user, day, attendance, on_leave)`` may return other
+    expressions over the same join (reports convert to numbers in SQL).
+    """
+    calendar = _calendar(db, start, end)
+    day = type_coerce(calendar.c.day, Date)
+    attendance = models.Attendance
+    leave = models.LeaveCalendar.__table__
+    on_leave = leave.c.user_id.isnot(None)
+    if columns is None:
+        selected = [
+            models.User.id.label("user_id"), models.User.name, models.User.role, day.label("day"),
+            attendance.clock_in, attendance.clock_out, on_leave.label("on_leave"),
+        ]
+    else:
+        selected = columns(models.User, day, attendance, on_leave)
+    stmt = (
+        select(*selected)
+        .select_from(calendar)
+        .join(models.User, true())
+        .outerjoin(attendance, and_(attendance.user_id == models.User.id, attendance.date == calendar.c.day))
+        .outerjoin(leave, and_(leave.c.user_id == models.User.id, leave.c.date == calendar.c.day))
+    )
+    if ordered:
+        stmt = stmt.order_by(calendar.c.day, models.User.id)
+    return stmt
+
+def export_row(row):
+    """Sheet row ``[Name, Role, Date, In, Out, Leave Status]`` for one grid row."""
+    clock_in = clock_out = ""
+    if not row.on_leave:
+        clock_in = row.clock_in or ""
+        clock_out = row.clock_out or ""
+    return [
+        row.name,
+        row.role,
+        row.day.strftime("%Y-%m-%d"),
+        clock_in,
+        clock_out,
+        "On Leave" if row.on_leave else "",
+    ]
+
+def iter_export_grid(db: Session, start: date, end: date):
+    """Stream the grid for ``start``..``end`` from a server-side cursor."""
+    stmt = attendance_grid_query(db, start, end)
+    return db.execute(stmt.execution_options(stream_results=True, yield_per=EXPORT_YIELD_PER))
+
+def iter_export_rows(db: Session, start: date, end: date):
+    """Sheet rows for every user on every day of ``start``..``end``, streamed.
+
+    Punches of archived months are filled in from the archive files.
+    """
+    archived = archive.punch_lookup(db, start, end)
+    for row in iter_export_grid(db, start, end):
+        values = export_row(row)
+        if archived is not None and row.clock_in is None and not row.on_leave:
+            punch = archived.get(row.user_id, row.day)
+            if punch is not None:
+                values[3], values[4] = punch[0] or "", punch[1] or ""
+        yield values
+
+def get_export_rows(db: Session, today: date):
+    """Rows for the attendance sheet plus a (user_id, date) key per row."""
+    export_data = []
+    export_keys = []
+    for row in iter_export_grid(db, today, today):
+        export_data.append(export_row(row))
+        export_keys.append((row.user_id, today))
+    return export_data, export_keys
+
+
 def get_users_by_role(db: Session, role: str = None, exclude_role: str = None):
     query = db.query(models.User)
     if role:
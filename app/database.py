@@ -1,10 +1,30 @@
+import itertools
+import logging
 import os
+import threading
+import time
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from config.settings import DB_URL
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from app.metrics import TimedQueuePool
+from config.settings import (
+    DB_URL,
+    DB_REPLICA_URLS,
+    DB_ASYNC_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT_SECONDS,
+    DB_POOL_RECYCLE_SECONDS,
+    DB_POOL_PRE_PING,
+    DB_REPLICA_RETRY_SECONDS,
+)
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 DB_URL = os.getenv("DB_URL")
@@ -12,7 +32,24 @@ DB_URL = os.getenv("DB_URL")
 if DB_URL is None:
     raise ValueError("DB_URL not found. Check your .env file!")
 
-engine = create_engine(DB_URL)
+
+def engine_options(url: str) -> dict:
+    """Pool settings from config; in-memory SQLite keeps its single-connection pool."""
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    url = make_url(url)
+    if url.database not in (None, "", ":memory:"):
+        if not url.get_dialect().is_async:
+            options["poolclass"] = TimedQueuePool  # Reports checkout wait to /metrics
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=DB_POOL_RECYCLE_SECONDS,
+        )
+    return options
+
+
+engine = create_engine(DB_URL, **engine_options(DB_URL))
 SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
 
@@ -21,4 +58,118 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+class ReadRouter:
+    """Picks a replica for read-only work, round robin, falling back to the primary.
+
+    A replica that fails to hand out a connection is skipped for
+    ``retry_seconds`` before being tried again.
+    """
+
+    def __init__(self, primary, replicas, retry_seconds: float = DB_REPLICA_RETRY_SECONDS):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.retry_seconds = retry_seconds
+        self._down_until = {}
+        self._next = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        self._lock = threading.Lock()
+
+    def candidates(self):
+        """Healthy replicas in round-robin order, then the primary."""
+        now = time.monotonic()
+        with self._lock:
+            start = next(self._next) if self._next else 0
+        count = len(self.replicas)
+        ordered = [self.replicas[(start + i) % count] for i in range(count)]
+        return [e for e in ordered if self._down_until.get(e, 0) <= now] + [self.primary]
+
+    def mark_down(self, replica):
+        self._down_until[replica] = time.monotonic() + self.retry_seconds
+
+    def session(self) -> Session:
+        for bind in self.candidates():
+            db = Session(bind=bind)
+            if bind is self.primary:
+                return db
+            try:
+                db.connection()  # Check out now so a dead replica is caught here
+                return db
+            except DBAPIError as e:
+                db.close()
+                self.mark_down(bind)
+                logger.warning(f"Read replica {bind.url.host or bind.url.database} unavailable: {str(e)}")
+
+
+read_router = ReadRouter(engine, [create_engine(url, **engine_options(url)) for url in DB_REPLICA_URLS])
+
+
+def read_session() -> Session:
+    return read_router.session()
+
+
+def get_read_db():
+    """``get_db`` for endpoints that only read; may lag the primary slightly."""
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC_URL:
+    # Optional: needs an async driver (aiomysql, asyncpg, aiosqlite)
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(DB_ASYNC_URL, **engine_options(DB_ASYNC_URL))
+    AsyncSessionLocal = async_sessionmaker(async_engine)
+
+
+async def run_read(func, *args):
+    """Run ``func(session, *args)`` for a read-only async endpoint.
+
+    Uses the async engine when ``DB_ASYNC_URL`` is set, so the query does not
+    occupy a threadpool slot; otherwise a routed read session in the threadpool.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            return await session.run_sync(func, *args)
+
+    def call():
+        db = read_session()
+        try:
+            return func(db, *args)
+        finally:
+            db.close()
+
+    return await run_in_threadpool(call)
+
+def upsert(db, model, values, index_elements, update, where=None):
+    """Build a dialect-aware ``INSERT ... ON CONFLICT/ON DUPLICATE KEY UPDATE``.
+
+    ``update`` receives the incoming row (``excluded``/``inserted``) and returns
+    a mapping of column name -> expression for the conflicting row. With
+    ``where``, a conflicting row is only updated when it holds, so with
+    RETURNING only inserted and actually updated rows come back. MySQL has no
+    such clause: there ``update`` has to make the assignments conditional.
+    """
+    dialect = db.get_bind().dialect.name
+    table = model.__table__
+    if dialect == "mysql":
+        if where is not None:
+            raise NotImplementedError("Conditional upserts need IF() assignments on MySQL")
+        stmt = mysql.insert(table).values(values)
+        return stmt.on_duplicate_key_update(**update(stmt.inserted))
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(table).values(values)
+        return stmt.on_conflict_do_update(index_elements=index_elements, set_=update(stmt.excluded), where=where)
+    raise NotImplementedError(f"Upsert is not supported for the {dialect} dialect")
+
+
+def supports_returning(db):
+    # MySQL (and ON DUPLICATE KEY UPDATE on MariaDB) cannot return the upserted row
+    return db.get_bind().dialect.name in ("sqlite", "postgresql")
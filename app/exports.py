@@ -0,0 +1,144 @@
+"""Streaming file exports of the attendance sheet rows (CSV, XLSX, Parquet).
+
+Each writer consumes the row iterator lazily and yields bytes as it goes, so
+a multi-million-row range never sits in memory. openpyxl and pyarrow are
+optional and only imported when their format is requested.
+"""
+import csv
+import io
+import os
+import tempfile
+from datetime import date, time
+from config.settings import EXPORT_FILE_CHUNK_ROWS
+
+HEADER = ["Name", "Role", "Date", "In", "Out", "Leave Status"]
+
+
+def _text(value):
+    if isinstance(value, time):
+        return value.strftime("%H:%M:%S")
+    return value if value is not None else ""
+
+
+def csv_chunks(rows, chunk_rows: int = EXPORT_FILE_CHUNK_ROWS):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    count = 0
+    for row in rows:
+        writer.writerow([_text(value) for value in row])
+        count += 1
+        if count % chunk_rows == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def xlsx_chunks(rows, chunk_size: int = 1 << 20):
+    # Write-only mode spools rows to temporary XML on disk; the finished file
+    # is then streamed back in chunks and removed
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("attendance")
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append([_text(value) for value in row])
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook.save(path)
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes to the caller in pieces."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def parquet_chunks(rows, chunk_rows: int = EXPORT_FILE_CHUNK_ROWS):
+    # One row group per chunk, written to a sink that is drained after each
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("name", pa.string()),
+        ("role", pa.string()),
+        ("date", pa.date32()),
+        ("clock_in", pa.string()),
+        ("clock_out", pa.string()),
+        ("leave_status", pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+
+    def row_group(batch):
+        columns = list(zip(*batch))
+        writer.write_table(pa.table([
+            pa.array(columns[0], pa.string()),
+            pa.array(columns[1], pa.string()),
+            pa.array([date.fromisoformat(day) for day in columns[2]], pa.date32()),
+            pa.array([_text(value) or None for value in columns[3]], pa.string()),
+            pa.array([_text(value) or None for value in columns[4]], pa.string()),
+            pa.array([value or None for value in columns[5]], pa.string()),
+        ], schema=schema))
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_rows:
+            row_group(batch)
+            batch = []
+            yield sink.drain()
+    if batch:
+        row_group(batch)
+    writer.close()
+    yield sink.drain()
+
+
+# format -> (writer, media type, optional module it needs)
+FORMATS = {
+    "csv": (csv_chunks, "text/csv", None),
+    "xlsx": (xlsx_chunks, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "openpyxl"),
+    "parquet": (parquet_chunks, "application/vnd.apache.parquet", "pyarrow"),
+}
+
+
+def missing_dependency(fmt: str):
+    """Name of the package ``fmt`` needs if it is not installed, else ``None``."""
+    module = FORMATS[fmt][2]
+    if module is None:
+        return None
+    import importlib.util
+    return module if importlib.util.find_spec(module) is None else None
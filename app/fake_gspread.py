@@ -0,0 +1,127 @@
+"""Offline stand-in for the slice of gspread that ``google_sheets`` uses.
+
+Enabled with ``GOOGLE_SHEETS_BACKEND=fake``. Every API-equivalent call is
+counted in ``Client.calls`` so export costs can be checked without network.
+"""
+import re
+from collections import Counter
+
+
+class WorksheetNotFound(Exception):
+    pass
+
+
+_A1_RANGE = re.compile(r"^([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?$")
+
+
+def _column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter) - 64)
+    return index
+
+
+class Worksheet:
+    def __init__(self, spreadsheet, sheet_id, title, rows, cols):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.cells = {}  # (row, col) -> value, both 1-based
+
+    def _count(self, name):
+        self.spreadsheet.client.calls[name] += 1
+
+    def _parse(self, a1):
+        start_col, start_row, end_col, end_row = _A1_RANGE.match(a1).groups()
+        start_row = int(start_row) if start_row else 1
+        if end_col is None:
+            end_col, end_row = start_col, start_row
+        else:
+            # An open-ended range like "A2:Z" runs to the last row
+            end_row = int(end_row) if end_row else self.row_count
+        return start_row, _column_index(start_col), end_row, _column_index(end_col)
+
+    def _write(self, a1, values):
+        start_row, start_col, _, _ = self._parse(a1)
+        for r, row in enumerate(values):
+            for c, value in enumerate(row):
+                if start_row + r > self.row_count:
+                    raise ValueError(f"Row {start_row + r} exceeds grid limits ({self.row_count})")
+                self.cells[(start_row + r, start_col + c)] = value
+
+    def update(self, range_name, values, **kwargs):
+        self._count("update")
+        self._write(range_name, values)
+
+    def batch_update(self, data, **kwargs):
+        self._count("batch_update")
+        for item in data:
+            self._write(item["range"], item["values"])
+
+    def batch_clear(self, ranges):
+        self._count("batch_clear")
+        for a1 in ranges:
+            start_row, start_col, end_row, end_col = self._parse(a1)
+            for key in [k for k in self.cells
+                        if start_row <= k[0] <= end_row and start_col <= k[1] <= end_col]:
+                del self.cells[key]
+
+    def append_rows(self, values, **kwargs):
+        self._count("append_rows")
+        last = max((row for row, _ in self.cells), default=0)
+        self._write(f"A{last + 1}", values)
+
+    def add_rows(self, rows):
+        self._count("add_rows")
+        self.row_count += rows
+
+    def get_all_values(self):
+        self._count("get_all_values")
+        last_row = max((row for row, _ in self.cells), default=0)
+        last_col = max((col for _, col in self.cells), default=0)
+        return [[self.cells.get((r, c), "") for c in range(1, last_col + 1)]
+                for r in range(1, last_row + 1)]
+
+
+class Spreadsheet:
+    def __init__(self, client, key):
+        self.client = client
+        self.id = key
+        self.worksheets = {}
+        self.format_requests = []
+
+    def worksheet(self, title):
+        self.client.calls["worksheet"] += 1
+        if title not in self.worksheets:
+            raise WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def add_worksheet(self, title, rows, cols):
+        self.client.calls["add_worksheet"] += 1
+        sheet = Worksheet(self, len(self.worksheets), title, rows, cols)
+        self.worksheets[title] = sheet
+        return sheet
+
+    def batch_update(self, body):
+        self.client.calls["spreadsheet_batch_update"] += 1
+        self.format_requests.extend(body.get("requests", []))
+
+
+class Client:
+    def __init__(self):
+        self.calls = Counter()
+        self.spreadsheets = {}
+
+    def open_by_key(self, key):
+        self.calls["open_by_key"] += 1
+        return self.spreadsheets.setdefault(key, Spreadsheet(self, key))
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+
+def authorize(credentials=None):
+    return Client()
@@ -1,113 +1,216 @@
-import os
-import json
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-import gspread
-from config import settings  # Import settings module
 import logging
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
-import os
+import threading
+from datetime import date, time
+from config import settings  # Import settings module
 
 logger = logging.getLogger(__name__)
 
-def export_to_sheet(data, spreadsheet_id, sheet_name):
-    try:
-        creds = service_account.Credentials.from_service_account_file(
-            settings.GOOGLE_CREDENTIALS_FILE,
-            scopes=['https://www.googleapis.com/auth/spreadsheets']
-        )
-        client = gspread.authorize(creds)
-        spreadsheet = client.open_by_key(spreadsheet_id)
+HEADER = ["Name", "Role", "Date", "In", "Out", "Leave Status"]
+COLUMNS = "ABCDEF"
+
+# Client, worksheet handles and the last exported snapshot live for the whole
+# process, so a warm export is a single values batch_update (or nothing at all).
+_lock = threading.Lock()
+_client = None
+_worksheets = {}
+_snapshots = {}
+
+
+class SheetSnapshot:
+    """What we last wrote: row key -> (sheet row number, cell values)."""
+
+    def __init__(self, capacity):
+        self.rows = {}
+        self.free_rows = []
+        self.next_row = 2  # Row 1 is the header
+        self.capacity = capacity
+
+    def allocate_row(self):
+        if self.free_rows:
+            return self.free_rows.pop()
+        row_number = self.next_row
+        self.next_row += 1
+        return row_number
+
+
+def _backend():
+    if settings.GOOGLE_SHEETS_BACKEND == "fake":
+        from app import fake_gspread
+        return fake_gspread
+    import gspread
+    return gspread
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        if settings.GOOGLE_SHEETS_BACKEND == "fake":
+            _client = _backend().Client()
+        else:
+            from google.oauth2 import service_account
+            creds = service_account.Credentials.from_service_account_file(
+                settings.GOOGLE_CREDENTIALS_FILE,
+                scopes=['https://www.googleapis.com/auth/spreadsheets']
+            )
+            _client = _backend().authorize(creds)
+    return _client
+
+
+def _format_new_sheet(spreadsheet, sheet):
+    # Applied once when the worksheet is created instead of on every export
+    spreadsheet.batch_update({
+        "requests": [
+            # Header formatting
+            {
+                "repeatCell": {
+                    "range": {"sheetId": sheet.id, "startRowIndex": 0, "endRowIndex": 1},
+                    "cell": {"userEnteredFormat": {"textFormat": {"bold": True}}},
+                    "fields": "userEnteredFormat.textFormat.bold"
+                }
+            },
+            # Center align leave status (column F)
+            {
+                "repeatCell": {
+                    "range": {"sheetId": sheet.id, "startColumnIndex": 5, "endColumnIndex": 6},
+                    "cell": {"userEnteredFormat": {"horizontalAlignment": "CENTER"}},
+                    "fields": "userEnteredFormat.horizontalAlignment"
+                }
+            },
+            # Format time columns (In and Out)
+            {
+                "repeatCell": {
+                    "range": {
+                        "sheetId": sheet.id,
+                        "startRowIndex": 1,
+                        "startColumnIndex": 3,  # In column (D)
+                        "endColumnIndex": 5    # Out column (E)
+                    },
+                    "cell": {"userEnteredFormat": {"numberFormat": {"type": "TIME"}}},
+                    "fields": "userEnteredFormat.numberFormat"
+                }
+            }
+        ]
+    })
+
 
-        # Get or create worksheet
+def _get_worksheet(spreadsheet_id, sheet_name, row_count):
+    key = (spreadsheet_id, sheet_name)
+    sheet = _worksheets.get(key)
+    if sheet is None:
+        spreadsheet = _get_client().open_by_key(spreadsheet_id)
         try:
             sheet = spreadsheet.worksheet(sheet_name)
-        except gspread.WorksheetNotFound:
+        except _backend().WorksheetNotFound:
             sheet = spreadsheet.add_worksheet(
                 title=sheet_name,
-                rows=max(100, len(data) + 10),
+                rows=max(100, row_count + 10),
                 cols=20
             )
+            _format_new_sheet(spreadsheet, sheet)
+        _worksheets[key] = sheet
+    return sheet
 
-        # Clear all formatting and data (except header)
-        sheet.batch_clear(["A2:Z"])  # clear values
-        spreadsheet.batch_update({
-            "requests": [
-                {
-                    "repeatCell": {
-                        "range": {
-                            "sheetId": sheet.id
-                        },
-                        "cell": {
-                            "userEnteredFormat": {}  # Clears formatting
-                        },
-                        "fields": "userEnteredFormat"
-                    }
-                },
-                {
-                    "updateSheetProperties": {
-                        "properties": {
-                            "sheetId": sheet.id,
-                            "gridProperties": {
-                                "frozenRowCount": 0
-                            }
-                        },
-                        "fields": "gridProperties.frozenRowCount"
-                    }
-                }
-            ]
-        })
-
-        # Update header to new column order
-        header = ["Name", "Role", "Date", "In", "Out", "Leave Status"]
-        sheet.update('A1:F1', [header])  # Update header range
-        
-        if data:
-            sheet.append_rows(data)
-            
-            # Formatting adjustments for new column positions
-            spreadsheet.batch_update({
-                "requests": [
-                    # Header formatting
-                    {
-                        "repeatCell": {
-                            "range": {"sheetId": sheet.id, "startRowIndex": 0, "endRowIndex": 1},
-                            "cell": {"userEnteredFormat": {"textFormat": {"bold": True}}},
-                            "fields": "userEnteredFormat.textFormat.bold"
-                        }
-                    },
-                    # Center align leave status (now in column F)
-                    {
-                        "repeatCell": {
-                            "range": {"sheetId": sheet.id, "startColumnIndex": 5, "endColumnIndex": 6},
-                            "cell": {"userEnteredFormat": {"horizontalAlignment": "CENTER"}},
-                            "fields": "userEnteredFormat.horizontalAlignment"
-                        }
-                    },
-                    # Format time columns (In and Out)
-                    {
-                        "repeatCell": {
-                            "range": {
-                                "sheetId": sheet.id,
-                                "startRowIndex": 1,
-                                "endRowIndex": len(data) + 1,
-                                "startColumnIndex": 3,  # In column (D)
-                                "endColumnIndex": 5    # Out column (E)
-                            },
-                            "cell": {
-                                "userEnteredFormat": {
-                                    "numberFormat": {
-                                        "type": "TIME"
-                                    }
-                                }
-                            },
-                            "fields": "userEnteredFormat.numberFormat"
-                        }
-                    }
-                ]
-            })
-        return True
-    except Exception as e:
-        logger.error(f"Export error: {str(e)}")
-        return False
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, time):
+        return value.strftime("%H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    return str(value)
+
+
+def _ensure_capacity(sheet, snapshot, last_row):
+    if last_row > snapshot.capacity:
+        extra = max(last_row - snapshot.capacity, 100)
+        sheet.add_rows(extra)
+        snapshot.capacity += extra
+
+
+def _full_rewrite(sheet, rows, keys):
+    """Cold start: we don't know what is on the sheet, so rewrite it once."""
+    snapshot = SheetSnapshot(sheet.row_count)
+    _ensure_capacity(sheet, snapshot, len(rows) + 1)
+    sheet.batch_clear(["A2:Z"])
+    for key, values in zip(keys, rows):
+        snapshot.rows[key] = (snapshot.allocate_row(), values)
+    sheet.batch_update(
+        [{"range": f"A1:F{len(rows) + 1}", "values": [HEADER] + rows}],
+        value_input_option="USER_ENTERED",
+    )
+    return snapshot
+
+
+def _diff_update(sheet, snapshot, rows, keys):
+    """Send only the cells that differ from the snapshot, in one batch_update."""
+    updates = []
+    incoming = set(keys)
+
+    # Rows that dropped out of the export are blanked and their slot reused
+    for key in [key for key in snapshot.rows if key not in incoming]:
+        row_number, _ = snapshot.rows.pop(key)
+        snapshot.free_rows.append(row_number)
+        updates.append({"range": f"A{row_number}:F{row_number}", "values": [[""] * len(HEADER)]})
+
+    for key, values in zip(keys, rows):
+        existing = snapshot.rows.get(key)
+        if existing is None:
+            row_number = snapshot.allocate_row()
+            updates.append({"range": f"A{row_number}:F{row_number}", "values": [values]})
+        else:
+            row_number, old_values = existing
+            col = 0
+            while col < len(HEADER):
+                if values[col] == old_values[col]:
+                    col += 1
+                    continue
+                end = col
+                while end + 1 < len(HEADER) and values[end + 1] != old_values[end + 1]:
+                    end += 1
+                updates.append({
+                    "range": f"{COLUMNS[col]}{row_number}:{COLUMNS[end]}{row_number}",
+                    "values": [values[col:end + 1]],
+                })
+                col = end + 1
+        snapshot.rows[key] = (row_number, values)
+
+    if updates:
+        _ensure_capacity(sheet, snapshot, snapshot.next_row - 1)
+        sheet.batch_update(updates, value_input_option="USER_ENTERED")
+    return len(updates)
+
+
+def export_to_sheet(data, spreadsheet_id, sheet_name, keys=None):
+    """Sync ``data`` rows (``HEADER`` column order) to the worksheet.
+
+    ``keys`` identifies each row across exports, e.g. ``(user_id, date)``;
+    it defaults to ``(name, date)``.
+    """
+    rows = [[_cell(value) for value in row] for row in data]
+    if keys is None:
+        keys = [(row[0], row[2]) for row in rows]
+    # Number repeated keys so each row still gets its own slot
+    occurrences = {}
+    unique_keys = []
+    for key in keys:
+        count = occurrences.get(key, 0)
+        occurrences[key] = count + 1
+        unique_keys.append((key, count))
+    keys = unique_keys
+    cache_key = (spreadsheet_id, sheet_name)
+    with _lock:
+        try:
+            sheet = _get_worksheet(spreadsheet_id, sheet_name, len(rows))
+            snapshot = _snapshots.get(cache_key)
+            if snapshot is None:
+                _snapshots[cache_key] = _full_rewrite(sheet, rows, keys)
+            else:
+                _diff_update(sheet, snapshot, rows, keys)
+            return True
+        except Exception as e:
+            # The sheet may now differ from the snapshot; start cold next time
+            _snapshots.pop(cache_key, None)
+            _worksheets.pop(cache_key, None)
+            logger.error(f"Export error: {str(e)}")
+            return False
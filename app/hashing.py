@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from starlette.concurrency import run_in_threadpool
+from app.auth import pwd_context
+from config.settings import PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_BULK_CHUNK
+
+logger = logging.getLogger(__name__)
+
+
+class HashingOverloaded(Exception):
+    """Raised when the password hashing queue is full; mapped to 503 in run.py."""
+
+
+# Worker-side functions (must stay module level so they can be pickled)
+
+def _hash(password):
+    return pwd_context.hash(password)
+
+
+def _hash_many(passwords):
+    return [pwd_context.hash(password) for password in passwords]
+
+
+def _verify(password, hashed_password):
+    """Verify and, if the stored hash uses outdated settings, return a new one."""
+    if not pwd_context.verify(password, hashed_password):
+        return False, None
+    if pwd_context.needs_update(hashed_password):
+        return True, pwd_context.hash(password)
+    return True, None
+
+
+class PasswordHasher:
+    """Runs bcrypt in a dedicated process pool with a bounded queue.
+
+    ``workers=0`` keeps the old behaviour of hashing on the request
+    threadpool, which is what the login benchmark compares against.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return self._executor
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HashingOverloaded()
+            self._pending += 1
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    async def _run(self, fn, *args):
+        self._acquire()
+        try:
+            if self.workers <= 0:
+                return await run_in_threadpool(fn, *args)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def hash_many(self, passwords, chunk_size: int = PASSWORD_HASH_BULK_CHUNK):
+        """Hash a bulk import's passwords across the pool, in input order.
+
+        Passwords go out in chunks, at most one per worker at a time, so a
+        login queued behind an import waits for a chunk, not the whole import.
+        """
+        passwords = list(passwords)
+        in_flight = asyncio.Semaphore(max(self.workers, 1))
+
+        async def run_chunk(chunk):
+            async with in_flight:
+                return await self._run(_hash_many, chunk)
+
+        chunks = [passwords[start:start + chunk_size] for start in range(0, len(passwords), chunk_size)]
+        hashed = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+        return [value for chunk in hashed for value in chunk]
+
+    async def verify(self, password: str, hashed_password: str):
+        """Return ``(valid, new_hash)``; ``new_hash`` is set when a rehash is due."""
+        return await self._run(_verify, password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
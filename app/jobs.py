@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from app import crud
+from app.database import read_session
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = "queued"  # queued -> running -> succeeded | failed
+        self.submitted_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """Runs one kind of job on a single background worker, coalescing submits.
+
+    While a job is running, the first submit queues one follow-up run and every
+    further submit returns that same queued job, so a burst of clicks costs at
+    most one extra run (which still picks up changes made during the first).
+    """
+
+    def __init__(self, func, name, max_history=100):
+        self.func = func
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._jobs = OrderedDict()
+        self._queued = None
+        self._lock = threading.Lock()
+
+    def submit(self, on_complete=None):
+        with self._lock:
+            if self._queued is not None:
+                return self._queued
+            job = Job(uuid.uuid4().hex)
+            self._queued = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_history:
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job, on_complete)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, on_complete):
+        with self._lock:
+            if self._queued is job:
+                self._queued = None
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+        try:
+            job.result = self.func()
+            job.status = "succeeded"
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            job.status = "failed"
+        job.finished_at = datetime.utcnow()
+        if on_complete is not None:
+            try:
+                on_complete(job)
+            except Exception as e:
+                logger.error(f"Job {job.id} completion callback failed: {str(e)}")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_sheet_export():
+    """Export today's attendance to Google Sheets (runs on the export worker)."""
+    from app import google_sheets  # Loaded on first export, not by every web worker
+
+    today = date.today()
+    db = read_session()
+    try:
+        export_data, export_keys = crud.get_export_rows(db, today)
+    finally:
+        db.close()
+    success = google_sheets.export_to_sheet(
+        export_data,
+        spreadsheet_id=os.getenv("SPREADSHEET_ID"),
+        sheet_name="attendance",
+        keys=export_keys
+    )
+    if not success:
+        raise RuntimeError("Export failed")
+    return {"rows": len(export_data), "date": today.isoformat()}
+
+
+export_queue = JobQueue(run_sheet_export, name="export")
+
+
+def run_archive():
+    """Move closed months of attendance to the archive (runs on the archive worker)."""
+    from app import archive
+
+    return archive.run()
+
+
+archive_queue = JobQueue(run_archive, name="archive")
@@ -0,0 +1,228 @@
+"""Per-route request and SQL metrics, exported in Prometheus text format.
+
+``MetricsMiddleware`` opens a ``RequestStats`` for every HTTP request. The
+SQLAlchemy hooks below (registered on every ``Engine``) and ``TimedQueuePool``
+add to it through a context variable, which the threadpool copies into sync
+endpoints and dependencies. When the request finishes its numbers go into the
+per-route series served at ``/metrics``. A statement shape that repeats more
+than ``METRICS_N_PLUS_ONE_THRESHOLD`` times in one request is logged as a
+likely N+1.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from config.settings import METRICS_DEBUG_HEADER, METRICS_N_PLUS_ONE_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Literals that only change the values, not the shape, of a statement
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)|\bIN\s*\((?:\s*%s\s*,?)+\)|\bIN\s*\(__\[POSTCOMPILE_\w+\]\)", re.I)
+
+
+def statement_shape(statement: str) -> str:
+    return _IN_LISTS.sub("IN (...)", _LITERALS.sub("?", statement))
+
+
+class RequestStats:
+    __slots__ = ("started", "sql_count", "sql_seconds", "pool_wait_seconds", "shapes")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.shapes = Counter()
+
+    def server_timing(self) -> str:
+        elapsed = (time.perf_counter() - self.started) * 1000
+        return (
+            f'db;dur={self.sql_seconds * 1000:.2f};desc="{self.sql_count} queries", '
+            f"pool;dur={self.pool_wait_seconds * 1000:.2f}, app;dur={elapsed:.2f}"
+        )
+
+
+_current = ContextVar("request_stats", default=None)
+
+
+def current_stats():
+    return _current.get()
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class Registry:
+    """Per-route series; everything is updated once per finished request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}  # (method, route) -> Histogram
+        self.pool_wait = {}  # (method, route) -> Histogram
+        self.responses = Counter()  # (method, route, status)
+        self.statements = Counter()  # (method, route)
+        self.statement_seconds = Counter()  # (method, route)
+        self.n_plus_one = Counter()  # (method, route)
+
+    def record(self, method: str, route: str, status: int, elapsed: float, stats: RequestStats, repeated: int):
+        key = (method, route)
+        with self._lock:
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(elapsed)
+            self.pool_wait.setdefault(key, Histogram(POOL_WAIT_BUCKETS)).observe(stats.pool_wait_seconds)
+            self.responses[(method, route, status)] += 1
+            self.statements[key] += stats.sql_count
+            self.statement_seconds[key] += stats.sql_seconds
+            if repeated:
+                self.n_plus_one[key] += repeated
+
+    def clear(self):
+        with self._lock:
+            self.__init__()
+
+    def render(self) -> str:
+        lines = []
+
+        def histogram(name, help_text, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route), hist in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(method=method, route=route, le='+Inf')} {hist.count}")
+                lines.append(f"{name}_sum{_labels(method=method, route=route)} {hist.total:.6f}")
+                lines.append(f"{name}_count{_labels(method=method, route=route)} {hist.count}")
+
+        def counter(name, help_text, series, label_names=("method", "route")):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_labels(**dict(zip(label_names, key)))} {value:g}")
+
+        with self._lock:
+            histogram("http_request_duration_seconds", "Request latency by route.", self.latency)
+            counter("http_responses_total", "Responses by route and status.", self.responses,
+                    ("method", "route", "status"))
+            counter("db_statements_total", "SQL statements issued while serving the route.", self.statements)
+            counter("db_statement_seconds_total", "Time spent executing SQL for the route.", self.statement_seconds)
+            histogram("db_pool_checkout_wait_seconds", "Time per request spent waiting for pooled connections.",
+                      self.pool_wait)
+            counter("db_n_plus_one_total", "Statement shapes repeated past the N+1 threshold.", self.n_plus_one)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None or not conn.info.get("query_started"):
+        return
+    stats.sql_seconds += time.perf_counter() - conn.info["query_started"].pop()
+    stats.sql_count += 1
+    stats.shapes[statement] += 1
+
+
+class TimedQueuePool(QueuePool):
+    """``QueuePool`` that charges checkout wait to the current request."""
+
+    def _do_get(self):
+        stats = _current.get()
+        if stats is None:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            stats.pool_wait_seconds += time.perf_counter() - start
+
+
+def _route_name(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _repeated_shapes(stats: RequestStats, method: str, route: str) -> int:
+    if not stats.shapes:
+        return 0
+    shapes = Counter()
+    for statement, count in stats.shapes.items():
+        shapes[statement_shape(statement)] += count
+    repeated = 0
+    for shape, count in shapes.items():
+        if count > METRICS_N_PLUS_ONE_THRESHOLD:
+            repeated += 1
+            logger.warning(f"Possible N+1 in {method} {route}: {count} x {shape[:300]}")
+    return repeated
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware so streaming responses are timed to their last byte."""
+
+    def __init__(self, app, debug_header: bool = METRICS_DEBUG_HEADER):
+        self.app = app
+        self.debug_header = debug_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.debug_header:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", stats.server_timing().encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            method, route = scope["method"], _route_name(scope)
+            if route != "/metrics":
+                elapsed = time.perf_counter() - stats.started
+                registry.record(method, route, status, elapsed, stats, _repeated_shapes(stats, method, route))
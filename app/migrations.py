@@ -0,0 +1,179 @@
+"""Versioned, forward-only schema migrations.
+
+Startup reads ``MAX(version)`` from ``schema_version`` and only does work when
+it is behind ``MIGRATIONS``. Every migration checks before it creates, so a
+half-applied step, or two workers racing on a rolling deploy, is harmless.
+Append new steps to the end of ``MIGRATIONS``; never renumber or edit old ones.
+
+    python -m app.migrations           # apply pending migrations
+    python -m app.migrations status
+"""
+import argparse
+import logging
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import models
+from app.database import Base
+
+logger = logging.getLogger(__name__)
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _create_tables(conn, *models_):
+    Base.metadata.create_all(conn, tables=[model.__table__ for model in models_], checkfirst=True)
+
+
+def _create_indexes(conn, model, *names):
+    existing = {index["name"] for index in inspect(conn).get_indexes(model.__tablename__)}
+    for index in model.__table__.indexes:
+        if index.name in names and index.name not in existing:
+            index.create(conn)
+
+
+def _add_columns(conn, model, *names):
+    """Add the model's ``names`` columns missing from its table; returns those added."""
+    existing = {column["name"] for column in inspect(conn).get_columns(model.__tablename__)}
+    added = []
+    for name in names:
+        if name in existing:
+            continue
+        column = model.__table__.c[name]
+        ddl = f"ALTER TABLE {model.__tablename__} ADD COLUMN {name} {column.type.compile(dialect=conn.dialect)}"
+        if column.server_default is not None:
+            ddl += f" DEFAULT '{column.server_default.arg}'"
+        if not column.nullable:
+            ddl += " NOT NULL"
+        conn.execute(text(ddl))
+        added.append(name)
+    return added
+
+
+def _baseline(conn):
+    # Databases created by the old create_all-on-startup already have these
+    _create_tables(conn, models.User, models.Attendance, models.LeaveRequest)
+
+
+def _lookup_indexes(conn):
+    _create_indexes(conn, models.User, "ix_users_qr_code")
+    # Older databases may hold duplicate punches; keep the first row of each day
+    removed = conn.execute(text(
+        "DELETE FROM attendances WHERE id NOT IN "
+        "(SELECT id FROM (SELECT MIN(id) AS id FROM attendances GROUP BY user_id, date) AS keep)"
+    )).rowcount
+    if removed:
+        logger.warning(f"Removed {removed} duplicate attendance rows before adding the unique index")
+    _create_indexes(conn, models.Attendance, "ux_attendances_user_id_date")
+    _create_indexes(conn, models.LeaveRequest, "ix_leave_requests_user_id_date", "ix_leave_requests_date_id")
+
+
+def _scan_receipts(conn):
+    _create_tables(conn, models.ScanReceipt)
+
+
+def _summary_tables(conn):
+    from app import summaries
+
+    _create_tables(conn, models.AttendanceDailySummary, models.AttendanceMonthlySummary)
+    first, last = conn.execute(select(func.min(models.Attendance.date), func.max(models.Attendance.date))).one()
+    if first is not None:
+        # Backfill from existing attendance; the session joins this transaction
+        summaries.rebuild(Session(bind=conn), first, last)
+
+
+def _data_versions(conn):
+    _create_tables(conn, models.DataVersion)
+    table = models.DataVersion.__table__
+    if conn.execute(select(table.c.name).where(table.c.name == "users")).first() is None:
+        conn.execute(table.insert().values(name="users", version=0))
+
+
+def _leave_approval(conn):
+    if "status" in _add_columns(conn, models.LeaveRequest, "status", "decided_at"):
+        # Until now every request counted as leave, so existing ones stay in effect
+        conn.execute(text("UPDATE leave_requests SET status = 'approved'"))
+    if not inspect(conn).has_table(models.LeaveCalendar.__tablename__):
+        _create_tables(conn, models.LeaveCalendar)
+        leave = models.LeaveRequest
+        conn.execute(models.LeaveCalendar.__table__.insert().from_select(
+            ["date", "user_id"],
+            select(leave.date, leave.user_id).where(leave.status == "approved").distinct(),
+        ))
+
+
+def _attendance_archive(conn):
+    _create_indexes(conn, models.Attendance, "ix_attendances_date_user_id")
+    _create_tables(conn, models.ArchivedMonth)
+
+
+MIGRATIONS = [
+    (1, "Baseline users, attendances and leave_requests tables", _baseline),
+    (2, "Lookup indexes for QR scans, punches and leave pagination", _lookup_indexes),
+    (3, "Kiosk scan receipts", _scan_receipts),
+    (4, "Attendance summary tables", _summary_tables),
+    (5, "Data version stamps for in-memory indexes", _data_versions),
+    (6, "Leave approval status and the on-leave calendar", _leave_approval),
+    (7, "Attendance (date, user_id) index and archived months", _attendance_archive),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn) -> int:
+    if not inspect(conn).has_table(schema_version.name):
+        return 0
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def migrate(engine) -> int:
+    """Apply pending migrations and return the resulting schema version."""
+    with engine.connect() as conn:
+        version = current_version(conn)
+    if version >= LATEST_VERSION:
+        return version
+
+    schema_version.create(engine, checkfirst=True)
+    for number, description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        logger.info(f"Applying schema migration {number}: {description}")
+        try:
+            with engine.begin() as conn:
+                apply(conn)
+                conn.execute(schema_version.insert().values(
+                    version=number, description=description, applied_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            with engine.connect() as conn:
+                if current_version(conn) < number:
+                    raise
+            # Another worker recorded the same step first
+            logger.info(f"Schema migration {number} already applied by another process")
+        version = number
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or inspect schema migrations")
+    parser.add_argument("command", nargs="?", choices=["upgrade", "status"], default="upgrade")
+    args = parser.parse_args()
+
+    from app.database import engine
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "status":
+        with engine.connect() as conn:
+            print(f"schema version {current_version(conn)} (latest {LATEST_VERSION})")
+    else:
+        print(f"schema version {migrate(engine)}")
+
+
+if __name__ == "__main__":
+    main()
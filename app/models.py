@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Time
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, ForeignKey, Time, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import date
@@ -11,7 +11,7 @@ class User(Base):
     name = Column(String(100))  # Add length
     email = Column(String(100), unique=True, index=True)  # Add length
     password = Column(String(255))  # Add length
-    qr_code = Column(String(50))  # Add length
+    qr_code = Column(String(50), index=True)  # Add length
     role = Column(String(20))  # Add length
     
     attendances = relationship("Attendance", back_populates="user")
@@ -31,6 +31,40 @@ class Attendance(Base):
     
     user = relationship("User", back_populates="attendances")
 
+    # One row per user per day; also the conflict target of the punch upserts.
+    # (date, user_id) serves the per-day scans (today's sheet, archival).
+    __table_args__ = (
+        Index("ux_attendances_user_id_date", "user_id", "date", unique=True),
+        Index("ix_attendances_date_user_id", "date", "user_id"),
+    )
+
+class ArchivedMonth(Base):
+    # Closed months moved out of attendances into Parquet files by app/archive.py
+    __tablename__ = "archived_months"
+
+    month = Column(Date, primary_key=True)  # First day of the month
+    path = Column(String(255), nullable=False)
+    rows = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, nullable=False)
+
+class ScanReceipt(Base):
+    # Kiosk scans already applied, so a replayed batch is answered from here
+    __tablename__ = "scan_receipts"
+
+    idempotency_key = Column(String(64), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    status = Column(String(20), nullable=False)
+    detail = Column(String(255), nullable=True)
+    processed_at = Column(DateTime, nullable=False)
+
+class DataVersion(Base):
+    # Bumped in the same transaction as a change, so every worker can tell
+    # whether its in-memory copy of that data is current with one PK read
+    __tablename__ = "data_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
 class LeaveRequest(Base):
     __tablename__ = "leave_requests"
     
@@ -39,5 +73,45 @@ class LeaveRequest(Base):
     user_name = Column(String(100))  # Add this field to store the name
     date = Column(Date, nullable=False)
     reason = Column(String(255), nullable=True)
+    status = Column(String(20), nullable=False, default="pending", server_default="pending")  # pending, approved, rejected
+    decided_at = Column(DateTime, nullable=True)
     
-    user = relationship("User", back_populates="leave_requests")
\ No newline at end of file
+    user = relationship("User", back_populates="leave_requests")
+
+    # Keyset pagination walks (date, id), per user or across everyone
+    __table_args__ = (
+        Index("ix_leave_requests_user_id_date", "user_id", "date"),
+        Index("ix_leave_requests_date_id", "date", "id"),
+    )
+
+
+class LeaveCalendar(Base):
+    # One row per user per day of approved leave, kept in step with leave
+    # decisions; "who is on leave on these days" is one primary-key range scan
+    __tablename__ = "leave_calendar"
+
+    date = Column(Date, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+
+# Summary tables, maintained incrementally by app/summaries.py
+class AttendanceDailySummary(Base):
+    __tablename__ = "attendance_daily_summary"
+
+    date = Column(Date, primary_key=True)
+    role = Column(String(20), primary_key=True)
+    present_count = Column(Integer, nullable=False, default=0)
+    late_count = Column(Integer, nullable=False, default=0)
+    leave_count = Column(Integer, nullable=False, default=0)
+    worked_seconds = Column(BigInteger, nullable=False, default=0)
+
+class AttendanceMonthlySummary(Base):
+    __tablename__ = "attendance_monthly_summary"
+
+    month = Column(Date, primary_key=True)  # First day of the month
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    role = Column(String(20))
+    days_present = Column(Integer, nullable=False, default=0)
+    late_days = Column(Integer, nullable=False, default=0)
+    leave_days = Column(Integer, nullable=False, default=0)
+    worked_seconds = Column(BigInteger, nullable=False, default=0)
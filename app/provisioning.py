@@ -0,0 +1,90 @@
+"""Parsing and checking of bulk user uploads for ``/admin/users/bulk``.
+
+An upload is either a JSON array of objects or CSV with a header row, both
+with the fields ``name``, ``email``, ``password`` and optionally ``role``
+(default ``user``) and ``qr_code`` (default the ``0000`` placeholder that
+``/register`` also assigns). Every row gets a line in the report: rows that
+cannot be created are reported and skipped, the rest are inserted together.
+"""
+import csv
+import io
+import json
+from app import shifts
+
+# Built-in roles plus every role SHIFT_RULES gives a shift of its own
+ROLES = ("user", "admin", "kiosk") + tuple(role for role in shifts.RULES if role not in ("user", "admin", "kiosk"))
+PLACEHOLDER_QR = "0000"  # Shared by self-registered users, so never a duplicate
+
+
+class UploadError(ValueError):
+    """The upload as a whole could not be read; mapped to 400 in run.py."""
+
+
+def parse_upload(body: bytes, content_type: str):
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise UploadError("Upload must be UTF-8")
+    if "csv" in (content_type or ""):
+        return list(csv.DictReader(io.StringIO(text)))
+    try:
+        rows = json.loads(text)
+    except ValueError:
+        raise UploadError("Body must be a JSON array of users or CSV (Content-Type: text/csv)")
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise UploadError("Body must be a JSON array of users")
+    return rows
+
+
+def _field(row, name, default=""):
+    value = row.get(name)
+    return str(value).strip() if value not in (None, "") else default
+
+
+def check_rows(rows):
+    """Validate rows and drop duplicates within the upload.
+
+    Returns ``(report, candidates)``: one report entry per row, with
+    ``status`` left as ``None`` for candidates, which are ``(index, user)``
+    pairs still to be checked against the database.
+    """
+    report, candidates = [], []
+    seen_emails, seen_qr_codes = {}, {}
+    for index, row in enumerate(rows):
+        user = {
+            "name": _field(row, "name"),
+            "email": _field(row, "email"),
+            "password": _field(row, "password"),
+            "role": _field(row, "role", "user"),
+            "qr_code": _field(row, "qr_code", PLACEHOLDER_QR),
+        }
+        entry = {"row": index, "email": user["email"], "status": None, "user_id": None, "detail": None}
+        report.append(entry)
+        missing = [name for name in ("name", "email", "password") if not user[name]]
+        if missing:
+            entry.update(status="invalid", detail=f"Missing {', '.join(missing)}")
+        elif user["role"] not in ROLES:
+            entry.update(status="invalid", detail=f"Unknown role '{user['role']}'")
+        elif user["email"] in seen_emails:
+            entry.update(status="duplicate_email", detail=f"Same email as row {seen_emails[user['email']]}")
+        elif user["qr_code"] in seen_qr_codes:
+            entry.update(status="duplicate_qr", detail=f"Same QR code as row {seen_qr_codes[user['qr_code']]}")
+        else:
+            seen_emails[user["email"]] = index
+            if user["qr_code"] != PLACEHOLDER_QR:
+                seen_qr_codes[user["qr_code"]] = index
+            candidates.append((index, user))
+    return report, candidates
+
+
+def drop_registered(report, candidates, taken_emails, taken_qr_codes):
+    """Mark candidates whose email or QR code is already in use; return the rest."""
+    remaining = []
+    for index, user in candidates:
+        if user["email"] in taken_emails:
+            report[index].update(status="duplicate_email", detail="Email already registered")
+        elif user["qr_code"] in taken_qr_codes:
+            report[index].update(status="duplicate_qr", detail="QR code already assigned")
+        else:
+            remaining.append((index, user))
+    return remaining
@@ -0,0 +1,244 @@
+"""Opt-in write-behind buffer for API clock-in/clock-out (``PUNCH_WRITE_BEHIND``).
+
+A punch is acknowledged once it is in an append-only journal on local disk.
+Concurrent punches share fsyncs (group commit): whoever finds the journal
+unsynced syncs everything written so far, and writers arriving meanwhile
+wait for the next sync. A flusher thread writes journaled punches to the
+database every ``PUNCH_FLUSH_INTERVAL_MS`` or ``PUNCH_FLUSH_MAX_EVENTS``
+punches, as one transaction of multi-row upserts, and publishes their events.
+
+Each worker process owns ``punches-<pid>.log`` in ``PUNCH_JOURNAL_DIR`` and
+holds a lock on it. At startup, journals whose owner is gone are replayed.
+Replays are exactly-once because every punch key is stored as a scan receipt.
+"""
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import date, datetime
+from app import crud, schemas
+from app.database import SessionLocal
+from config.settings import (
+    PUNCH_JOURNAL_DIR,
+    PUNCH_FLUSH_INTERVAL_MS,
+    PUNCH_FLUSH_MAX_EVENTS,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows: single worker, nothing to lock against
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _try_lock(file) -> bool:
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _read_journal(path):
+    punches = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # Torn last line from a crash mid-write: never acknowledged
+            record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+            punches.append(record)
+    return punches
+
+
+class PunchBuffer:
+    def __init__(self, journal_dir: str = PUNCH_JOURNAL_DIR, flush_interval: float = PUNCH_FLUSH_INTERVAL_MS / 1000.0,
+                 max_events: int = PUNCH_FLUSH_MAX_EVENTS, on_events=None):
+        self.journal_dir = journal_dir
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        self.on_events = on_events  # Called with the events of every flushed batch
+        self._cond = threading.Condition()
+        self._file = None
+        self._written = 0  # Punches appended to the journal
+        self._synced = 0  # Punches covered by an fsync
+        self._syncing = False
+        self._pending = []  # Journaled but not yet in the database
+        self._accepted = {}  # (user_id, day) -> kinds acknowledged by this worker
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self.flushes = 0
+        self.fsyncs = 0
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self.running:
+            return
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self._replay_orphans()
+        path = os.path.join(self.journal_dir, f"punches-{os.getpid()}.log")
+        self._file = open(path, "a", encoding="utf-8")
+        _try_lock(self._file)
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="punch-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+        path = self._file.name
+        self._file.close()
+        self._file = None
+        if not self._pending:
+            os.remove(path)
+
+    def _replay_orphans(self):
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, "punches-*.log"))):
+            with open(path, "a+", encoding="utf-8") as f:
+                if not _try_lock(f):
+                    continue  # A live worker owns it
+                punches = _read_journal(path)
+                if punches:
+                    logger.info(f"Replaying {len(punches)} journaled punches from {path}")
+                # Sliced like flush(): a journal that grew while the database was
+                # down must not become one huge transaction. If a slice fails the
+                # file stays, and receipts skip the slices already written
+                for start in range(0, len(punches), self.max_events):
+                    self._write_batch(punches[start:start + self.max_events])
+            os.remove(path)
+
+    def submit(self, user, kind: str):
+        """Journal a punch for ``user`` and return once it is durable.
+
+        Raises ``ValueError`` for a punch this worker already acknowledged
+        today; anything else is decided against the database at flush time.
+        """
+        timestamp = datetime.now().replace(microsecond=0)
+        day_key = (user.id, timestamp.date())
+        record = {
+            "key": uuid.uuid4().hex,
+            "user_id": user.id,
+            "name": user.name,
+            "role": user.role,
+            "kind": kind,
+            "timestamp": timestamp.isoformat(),
+        }
+        line = json.dumps(record) + "\n"
+        with self._cond:
+            accepted = self._accepted.setdefault(day_key, set())
+            if kind in accepted:
+                raise ValueError("Already clocked in today" if kind == "clock_in" else "Already clocked out today")
+            accepted.add(kind)
+            self._file.write(line)
+            self._written += 1
+            ticket = self._written
+            self._pending.append({**record, "timestamp": timestamp})
+            self._wait_synced(ticket)
+            if len(self._pending) >= self.max_events:
+                self._wakeup.set()
+        return record
+
+    def _wait_synced(self, ticket):
+        # Called with the condition held
+        while self._synced < ticket:
+            if self._syncing:
+                self._cond.wait()
+                continue
+            self._syncing = True
+            target = self._written
+            self._file.flush()
+            fd = self._file.fileno()
+            self._cond.release()
+            try:
+                os.fsync(fd)
+            finally:
+                self._cond.acquire()
+                self._syncing = False
+            self._synced = max(self._synced, target)
+            self.fsyncs += 1
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Punch flush failed, will retry: {str(e)}")
+                if self._stopping:
+                    return  # The journal is kept and replayed on the next start
+            if self._stopping:
+                if not self._pending:
+                    return
+                self._wakeup.set()  # Keep draining
+
+    def flush(self):
+        with self._cond:
+            batch = self._pending[:self.max_events]
+        if not batch:
+            return 0
+        self._write_batch(batch)
+        with self._cond:
+            del self._pending[:len(batch)]
+            if not self._pending and self._synced == self._written:
+                # Everything journaled is in the database: start the journal over
+                self._file.seek(0)
+                self._file.truncate()
+            today = date.today()
+            self._accepted = {key: kinds for key, kinds in self._accepted.items() if key[1] >= today}
+        return len(batch)
+
+    def _write_batch(self, punches):
+        db = SessionLocal()
+        try:
+            _, events = crud.apply_buffered_punches(db, punches)
+        finally:
+            db.close()
+        self.flushes += 1
+        if self.on_events is not None and events:
+            self.on_events(events)
+
+    def outcome(self, key: str):
+        """The punch's stored result, a "queued" result while it is buffered, or ``None`` if unknown.
+
+        Only this worker's buffer is searched: a punch still buffered by
+        another worker is unknown here until it is flushed.
+        """
+        with self._cond:
+            for punch in self._pending:
+                if punch["key"] == key:
+                    return schemas.ScanResult(idempotency_key=key, status="queued", user_id=punch["user_id"])
+        # Punches leave the buffer only after their receipt is committed
+        db = SessionLocal()
+        try:
+            receipts = crud.get_scan_receipts(db, [key])
+        finally:
+            db.close()
+        return receipts.get(key)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "journaled": self._written,
+                "fsyncs": self.fsyncs,
+                "flushes": self.flushes,
+            }
+
+
+punch_buffer = PunchBuffer()
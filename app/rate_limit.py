@@ -0,0 +1,242 @@
+"""Token-bucket rate limits for login, registration and clock-in/out.
+
+Each limit is "<requests>/<seconds>": a bucket per key (client IP or account)
+holds up to ``requests`` tokens, refills at ``requests / seconds`` per second,
+and every request takes one. Checks run before any database access or
+password hashing, so a rejected request costs one dict lookup.
+
+``InProcessStore`` (default) keeps buckets in this worker only, split over
+lock-striped shards so concurrent requests rarely wait on each other.
+``SQLiteStore`` is a stand-in for a shared store such as Redis: every local
+worker updates the same SQLite file, so limits hold across ``uvicorn
+--workers N``. Any object with ``take(key, capacity, rate)`` can be plugged in.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config.settings import (
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_SQLITE_PATH,
+    RATE_LIMIT_SHARDS,
+    RATE_LIMIT_MAX_KEYS,
+    RATE_LIMIT_LOGIN_IP,
+    RATE_LIMIT_LOGIN_ACCOUNT,
+    RATE_LIMIT_REGISTER_IP,
+    RATE_LIMIT_REGISTER_ACCOUNT,
+    RATE_LIMIT_PUNCH_IP,
+    RATE_LIMIT_PUNCH_ACCOUNT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimited(Exception):
+    """Mapped to 429 with Retry-After in run.py."""
+
+    def __init__(self, limit: str, retry_after: float):
+        super().__init__(f"Rate limit {limit} exceeded")
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+class Limit:
+    __slots__ = ("capacity", "period", "rate")
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period  # Tokens per second
+
+    def __repr__(self):
+        return f"{self.capacity}/{self.period:g}"
+
+
+def parse_limit(spec: str):
+    """``"5/60"`` -> ``Limit(5, 60)``; empty or zero means no limit."""
+    if not spec or not spec.strip():
+        return None
+    try:
+        capacity, period = spec.split("/")
+        capacity, period = int(capacity), float(period)
+    except ValueError:
+        raise ValueError(f"Invalid rate limit {spec!r}, expected '<requests>/<seconds>'")
+    if capacity <= 0 or period <= 0:
+        return None
+    return Limit(capacity, period)
+
+
+def _refill(tokens, updated, now, capacity, rate):
+    """Tokens left after taking one, and seconds to wait when there are none."""
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class _Shard:
+    __slots__ = ("lock", "buckets")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()  # key -> (tokens, updated); least recently used first
+
+
+class InProcessStore:
+    blocking = False
+
+    def __init__(self, shards: int = RATE_LIMIT_SHARDS, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self._shards = [_Shard() for _ in range(max(shards, 1))]
+        self._max_per_shard = max(max_keys // len(self._shards), 1)
+        self.evictions = 0
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        """Take a token from ``key``'s bucket; returns 0, or the seconds until one is available."""
+        shard = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        with shard.lock:
+            bucket = shard.buckets.get(key)
+            if bucket is None:
+                tokens, retry_after = capacity - 1, 0.0
+            else:
+                tokens, retry_after = _refill(bucket[0], bucket[1], now, capacity, rate)
+                shard.buckets.move_to_end(key)
+            shard.buckets[key] = (tokens, now)
+            if len(shard.buckets) > self._max_per_shard:
+                # A forgotten bucket starts full again, so only idle keys should go
+                shard.buckets.popitem(last=False)
+                self.evictions += 1
+        return retry_after
+
+    def clear(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard.buckets.clear()
+
+    def stats(self):
+        return {
+            "backend": "memory",
+            "keys": sum(len(shard.buckets) for shard in self._shards),
+            "shards": len(self._shards),
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteStore:
+    """Buckets in a SQLite file shared by the workers of one host.
+
+    Each ``take`` is one ``BEGIN IMMEDIATE`` transaction, which serializes
+    updates across processes. If the file cannot be written the request is
+    allowed: a broken limiter must not lock everyone out.
+    """
+
+    blocking = True
+    PRUNE_EVERY = 1000  # Takes between deletes of idle buckets
+
+    def __init__(self, path: str, retain_seconds: float):
+        self.path = path
+        self.retain_seconds = retain_seconds  # Idle this long, a bucket is full again and can go
+        self._local = threading.local()
+        self._takes = 0
+        self.errors = 0
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) WITHOUT ROWID"
+            )
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        now = time.time()  # Shared between processes, so wall clock rather than monotonic
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    tokens, retry_after = capacity - 1, 0.0
+                else:
+                    tokens, retry_after = _refill(row[0], row[1], now, capacity, rate)
+                conn.execute(
+                    "INSERT INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                    (key, tokens, now),
+                )
+                self._takes += 1
+                if self._takes % self.PRUNE_EVERY == 0:
+                    conn.execute("DELETE FROM rate_buckets WHERE updated < ?", (now - self.retain_seconds,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.error(f"Rate limit store failed, allowing request: {str(e)}")
+            return 0.0
+        return retry_after
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute("DELETE FROM rate_buckets")
+
+    def stats(self):
+        try:
+            keys = self._connection().execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+        except sqlite3.Error:
+            keys = None
+        return {"backend": "sqlite", "path": self.path, "keys": keys, "errors": self.errors}
+
+
+class RateLimiter:
+    def __init__(self, store, limits, enabled: bool = True):
+        self.store = store
+        self.limits = {name: limit for name, limit in limits.items() if limit is not None}
+        self.enabled = enabled
+        self.rejected = {name: 0 for name in self.limits}
+
+    def hit(self, name: str, key):
+        """Count a request against limit ``name`` for ``key``; raises ``RateLimited`` when over."""
+        limit = self.limits.get(name)
+        if not self.enabled or limit is None:
+            return
+        retry_after = self.store.take(f"{name}:{key}", limit.capacity, limit.rate)
+        if retry_after:
+            self.rejected[name] += 1
+            raise RateLimited(name, retry_after)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "limits": {name: repr(limit) for name, limit in self.limits.items()},
+            "rejected": dict(self.rejected),
+            "store": self.store.stats(),
+        }
+
+
+def create_limiter():
+    limits = {
+        "login_ip": parse_limit(RATE_LIMIT_LOGIN_IP),
+        "login_account": parse_limit(RATE_LIMIT_LOGIN_ACCOUNT),
+        "register_ip": parse_limit(RATE_LIMIT_REGISTER_IP),
+        "register_account": parse_limit(RATE_LIMIT_REGISTER_ACCOUNT),
+        "punch_ip": parse_limit(RATE_LIMIT_PUNCH_IP),
+        "punch_account": parse_limit(RATE_LIMIT_PUNCH_ACCOUNT),
+    }
+    if RATE_LIMIT_BACKEND == "sqlite":
+        longest = max((limit.period for limit in limits.values() if limit is not None), default=0)
+        store = SQLiteStore(RATE_LIMIT_SQLITE_PATH, retain_seconds=longest)
+    else:
+        store = InProcessStore()
+    return RateLimiter(store, limits, enabled=RATE_LIMIT_ENABLED)
+
+
+rate_limiter = create_limiter()
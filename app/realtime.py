@@ -0,0 +1,289 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from collections import deque
+from contextlib import closing
+from fastapi import WebSocket
+from fastapi.encoders import jsonable_encoder
+from config.settings import (
+    BROADCAST_BACKEND,
+    BROADCAST_SQLITE_PATH,
+    BROADCAST_POLL_INTERVAL_MS,
+    WS_SEND_QUEUE_SIZE,
+    WS_SEND_TIMEOUT_SECONDS,
+    WS_REPLAY_LOG_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessBus:
+    """Default backend: delivers to this process only."""
+
+    def __init__(self):
+        self._callback = None
+        # Seeded from the clock so sequence numbers keep increasing across restarts
+        self._seq = time.time_ns() // 1000
+
+    async def start(self, callback):
+        self._callback = callback
+
+    async def publish(self, message: str):
+        if self._callback is not None:
+            self._seq += 1
+            self._callback(self._seq, message)
+
+    async def stop(self):
+        self._callback = None
+
+
+class SQLiteBus:
+    """Multi-process stand-in for a real pub/sub server.
+
+    Every worker appends to and polls the same SQLite file, so a broadcast made
+    by one ``uvicorn --workers N`` process reaches clients of all of them.
+    Publishers also receive their own messages through the poll, which keeps
+    delivery order identical in every worker, and the row id doubles as the
+    shared event sequence number.
+    """
+
+    RETAIN_SECONDS = 60
+
+    def __init__(self, path: str, poll_interval: float):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._callback = None
+        self._task = None
+        self._last_id = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _setup(self):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS bus_messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL, message TEXT NOT NULL)"
+            )
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM bus_messages").fetchone()[0]
+
+    def _insert(self, message):
+        with closing(self._connect()) as conn:
+            conn.execute("INSERT INTO bus_messages (created, message) VALUES (?, ?)", (time.time(), message))
+            conn.execute("DELETE FROM bus_messages WHERE created < ?", (time.time() - self.RETAIN_SECONDS,))
+
+    def _fetch(self, after_id):
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT id, message FROM bus_messages WHERE id > ? ORDER BY id", (after_id,)
+            ).fetchall()
+
+    async def start(self, callback):
+        self._callback = callback
+        self._last_id = await asyncio.to_thread(self._setup)
+        self._task = asyncio.create_task(self._poll())
+
+    async def publish(self, message: str):
+        await asyncio.to_thread(self._insert, message)
+
+    async def _poll(self):
+        while True:
+            try:
+                for message_id, message in await asyncio.to_thread(self._fetch, self._last_id):
+                    self._last_id = message_id
+                    self._callback(message_id, message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Broadcast bus poll failed: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+class Connection:
+    __slots__ = ("websocket", "queue", "pending", "task")
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=queue_size)  # [identity, message] slots; message None once superseded
+        self.pending = {}  # Event identity -> its queued, unsent slot, for coalescing
+        self.task = None
+
+
+def event_identity(event: dict, body: str):
+    """What a newer event replaces: the same attendance record, otherwise an identical event.
+
+    ``body`` is the event as published, before its seq is added.
+    """
+    data = event.get("data")
+    if event["type"].startswith("attendance.") and isinstance(data, dict):
+        return (event["type"], data.get("user_id"), data.get("date"))
+    return body
+
+
+class ConnectionManager:
+    """Fans events out to WebSocket clients without letting one stall the rest.
+
+    Each connection owns a bounded queue drained by its own writer task.
+    An event still waiting in a queue is superseded by a newer one with the
+    same identity (``event_identity``), which is queued behind it so seqs keep
+    increasing; the writer skips the old one. A client whose queue is full,
+    or whose send times out or fails, is dropped.
+
+    Events are JSON objects ``{"type", "seq", "data"}``. The last
+    ``replay_size`` of them are kept so a client reconnecting with
+    ``/ws?since=<seq>`` receives what it missed instead of reloading; if they
+    are no longer in the log it gets a single ``{"type": "resync"}``.
+    """
+
+    def __init__(self, bus, queue_size: int = WS_SEND_QUEUE_SIZE, send_timeout: float = WS_SEND_TIMEOUT_SECONDS,
+                 replay_size: int = WS_REPLAY_LOG_SIZE):
+        self.bus = bus
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.connections = {}
+        self.replay_log = deque(maxlen=replay_size)  # (seq, serialized event)
+        self.last_seq = 0
+        self.listeners = []  # callback(seq, event_type) for every event, e.g. response cache versions
+        self.dropped = 0
+        self.coalesced = 0
+        self._loop = None
+        self._started = False
+
+    @property
+    def active_connections(self):
+        return list(self.connections)
+
+    async def start(self):
+        if self._started and self._loop.is_closed():
+            # The loop we were bound to is gone (e.g. app restarted in-process)
+            self._started = False
+        if not self._started:
+            self._started = True
+            self._loop = asyncio.get_running_loop()
+            await self.bus.start(self.deliver)
+
+    async def stop(self):
+        if self._started:
+            self._started = False
+            await self.bus.stop()
+
+    async def connect(self, websocket: WebSocket, since: int = None):
+        await self.start()
+        await websocket.accept()
+        connection = Connection(websocket, self.queue_size + len(self.replay_log))
+        if since is not None:
+            self._queue_replay(connection, since)
+        connection.task = asyncio.create_task(self._writer(connection))
+        self.connections[websocket] = connection
+
+    def _queue_replay(self, connection: Connection, since: int):
+        oldest = self.replay_log[0][0] if self.replay_log else self.last_seq + 1
+        if since > self.last_seq or since < oldest - 1:
+            # Unknown position or events already evicted: client must reload
+            connection.queue.put_nowait([None, json.dumps({"type": "resync", "seq": self.last_seq})])
+            return
+        for seq, message in self.replay_log:
+            if seq > since:
+                connection.queue.put_nowait([None, message])
+
+    def disconnect(self, websocket: WebSocket):
+        connection = self.connections.pop(websocket, None)
+        if connection is not None and connection.task is not None:
+            connection.task.cancel()
+
+    async def publish(self, event_type: str, data=None):
+        """Publish an event to every client of every worker."""
+        await self.start()
+        await self.bus.publish(json.dumps({"type": event_type, "data": jsonable_encoder(data)}))
+
+    def publish_threadsafe(self, event_type: str, data=None):
+        """``publish`` for code running outside the event loop (threadpool, jobs)."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            logger.warning(f"Event {event_type} dropped: event loop not running")
+            return
+        asyncio.run_coroutine_threadsafe(self.publish(event_type, data), loop)
+
+    def deliver(self, seq: int, body: str):
+        """Sequence an event from the bus and queue it for every local client."""
+        event = json.loads(body)
+        identity = event_identity(event, body)
+        event["seq"] = seq
+        message = json.dumps(event)
+        self.last_seq = seq
+        self.replay_log.append((seq, message))
+        for listener in self.listeners:
+            listener(seq, event["type"])
+        for websocket, connection in list(self.connections.items()):
+            slot = [identity, message]
+            try:
+                connection.queue.put_nowait(slot)
+            except asyncio.QueueFull:
+                self._drop(websocket, "send queue full")
+                continue
+            superseded = connection.pending.get(identity)
+            if superseded is not None:
+                superseded[1] = None
+                self.coalesced += 1
+            connection.pending[identity] = slot
+
+    async def _writer(self, connection: Connection):
+        websocket = connection.websocket
+        try:
+            while True:
+                identity, message = await connection.queue.get()
+                if message is None:
+                    continue  # Superseded by a newer event queued behind it
+                if identity is not None:
+                    connection.pending.pop(identity, None)
+                await asyncio.wait_for(websocket.send_text(message), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._drop(websocket, str(e) or type(e).__name__)
+
+    def _drop(self, websocket: WebSocket, reason: str):
+        connection = self.connections.pop(websocket, None)
+        if connection is None:
+            return
+        self.dropped += 1
+        logger.info(f"Dropping WebSocket client: {reason}")
+        if connection.task is not None and connection.task is not asyncio.current_task():
+            connection.task.cancel()
+        asyncio.ensure_future(self._close(websocket))
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)  # Try again later
+        except Exception:
+            pass
+
+    def stats(self):
+        return {
+            "connections": len(self.connections),
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "last_seq": self.last_seq,
+            "replay_log": len(self.replay_log),
+        }
+
+
+def create_bus(backend: str = BROADCAST_BACKEND):
+    if backend == "sqlite":
+        return SQLiteBus(BROADCAST_SQLITE_PATH, BROADCAST_POLL_INTERVAL_MS / 1000.0)
+    if backend == "memory":
+        return InProcessBus()
+    raise ValueError(f"Unknown BROADCAST_BACKEND: {backend}")
+
+
+manager = ConnectionManager(create_bus())
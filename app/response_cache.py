@@ -0,0 +1,89 @@
+"""Serialized responses for dashboard polls, revalidated with ETags.
+
+Each cached resource ("attendance", "leave") has a version. It changes when
+this worker writes the resource and again when the write's broadcast event
+(``attendance.*``, ``leave.*``) arrives, which is also how writes made by
+other workers reach it; the event's sequence number becomes the version.
+Responses are cached as bytes under (key, version), so a poll between two
+writes is answered without SQL or serialization, and a client repeating the
+ETag gets a bodyless 304.
+
+The ETag is a hash of the body, so it stays valid across workers and
+restarts. Entries also expire after ``RESPONSE_CACHE_TTL_SECONDS``, which
+bounds staleness when events cannot reach a worker (several workers on the
+in-memory broadcast bus) or a replica lags.
+"""
+import hashlib
+import itertools
+import secrets
+import threading
+from fastapi import Response
+from app.cache import TTLCache
+from config.settings import RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_SIZE
+
+RESOURCES = ("attendance", "leave")  # Event type prefixes that invalidate
+
+
+class ResourceVersions:
+    def __init__(self, cache: TTLCache):
+        self.cache = cache
+        self._versions = {}
+        self._local = itertools.count(1)
+        self._worker = secrets.token_hex(4)  # Local versions never collide with another process's
+        self._lock = threading.Lock()
+
+    def get(self, resource: str) -> str:
+        return self._versions.get(resource, "0")
+
+    def _set(self, resource: str, version: str):
+        with self._lock:
+            self._versions[resource] = version
+        self.cache.invalidate_tag(resource)
+
+    def touch(self, event_type: str):
+        """A write in this worker, before its event has gone round the bus."""
+        resource = event_type.partition(".")[0]
+        if resource in RESOURCES:
+            self._set(resource, f"{self._worker}.{next(self._local)}")
+
+    def on_event(self, seq: int, event_type: str):
+        resource = event_type.partition(".")[0]
+        if resource in RESOURCES:
+            self._set(resource, str(seq))
+
+    def stats(self):
+        return dict(self._versions)
+
+
+response_cache = TTLCache(RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_SIZE)
+versions = ResourceVersions(response_cache)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison: W/"x" matches "x"
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def cached_response(if_none_match: str, resource: str, key, build) -> Response:
+    """Answer from the cache or ``build() -> (body bytes, headers)``, honoring If-None-Match.
+
+    The version is read before ``build`` runs, so a write that lands while it
+    queries leaves the entry under a version that is already outdated.
+    """
+    cache_key = (key, versions.get(resource))
+    entry = response_cache.get(cache_key)
+    if entry is None:
+        body, headers = build()
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        entry = (etag, body, headers)
+        response_cache.set(cache_key, entry, tag=resource)
+    etag, body, headers = entry
+    # Clients may keep the body but must revalidate before every use
+    headers = {**headers, "ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
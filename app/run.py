@@ -1,23 +1,37 @@
-from datetime import date, datetime, timezone
-from fastapi import FastAPI, Depends, Form, HTTPException, Query, status
-from jose import JWTError
-from sqlalchemy import text
+from datetime import date, timezone
+from fastapi import FastAPI, Depends, Form, Header, HTTPException, Query, Request, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from app import models, schemas, crud, google_sheets, auth
-from app.database import Base, engine, SessionLocal
-from app.database import Base, engine, get_db
-from app.auth import create_access_token, decode_token
+from app import models, schemas, crud, auth, summaries, reports, migrations, exports, provisioning
+from app.database import engine, SessionLocal
+from app.database import engine, get_db, get_read_db, read_session, run_read
+from app.auth import create_access_token, decode_token, verified_tokens
 from fastapi.middleware.cors import CORSMiddleware
-from app import models, schemas, crud, google_sheets, auth
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app import models, schemas, crud, auth
 from app.auth import get_password_hash
 from app.models import User
+from app.user_index import user_index
+from app.hashing import hasher, HashingOverloaded
+from app.rate_limit import rate_limiter, RateLimited
+from app.jobs import export_queue, archive_queue
+from app.realtime import manager
+from app.response_cache import cached_response, response_cache, versions as response_versions
+from app.metrics import MetricsMiddleware, registry as metrics_registry
+from app.punch_buffer import punch_buffer
+from config.settings import PASSWORD_HASH_RETRY_AFTER_SECONDS, SCAN_BATCH_MAX_SIZE, SCHEMA_AUTO_MIGRATE
+from config.settings import PUNCH_WRITE_BEHIND, EXPORT_FILE_MAX_DAYS, USER_BULK_MAX_ROWS
+from config.settings import LEAVE_PAGE_SIZE, LEAVE_PAGE_MAX_SIZE, LEAVE_STREAM_BATCH_SIZE
+from config.settings import LEAVE_DECISION_MAX_IDS, LEAVE_CALENDAR_MAX_DAYS, REPORT_MAX_DAYS
 from dotenv import load_dotenv
 import os
+import json
+import math
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import List
+from typing import List, Optional
 
-Base.metadata.create_all(bind=engine)
 load_dotenv()
 app = FastAPI()
 
@@ -28,35 +42,81 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
+manager.listeners.append(response_versions.on_event)
 
 @app.on_event("startup")
 def on_startup():
-    # Disable foreign key checks
-    with engine.connect() as connection:
-        connection.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
-    
-    # Drop all tables
-    Base.metadata.drop_all(bind=engine)
-    
-    # Re-enable foreign key checks
-    with engine.connect() as connection:
-        connection.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
-    
-    # Create new tables
-    Base.metadata.create_all(bind=engine)
-    
+    # Cheap when the schema is current: one read of schema_version
+    if SCHEMA_AUTO_MIGRATE:
+        migrations.migrate(engine)
+    else:
+        with engine.connect() as connection:
+            version = migrations.current_version(connection)
+        if version < migrations.LATEST_VERSION:
+            raise RuntimeError(
+                f"Database schema is at version {version}, expected {migrations.LATEST_VERSION}; "
+                "run `python -m app.migrations`"
+            )
+
     create_default_admin()
     verify_google_credentials()
-    
+    if PUNCH_WRITE_BEHIND:
+        # Replays journals left by crashed workers before accepting punches
+        punch_buffer.on_events = publish_events
+        punch_buffer.start()
+
+@app.on_event("startup")
+async def start_broadcast():
+    await manager.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await run_in_threadpool(punch_buffer.stop)  # Drains buffered punches
+    hasher.shutdown()
+    export_queue.shutdown()
+    archive_queue.shutdown()
+    await manager.stop()
+
+@app.exception_handler(HashingOverloaded)
+async def hashing_overloaded_handler(request, exc):
+    # Shed load instead of queueing logins behind a saturated hashing pool
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many login attempts in progress, retry shortly"},
+        headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+    )
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request, exc):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests, retry later"},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+async def check_rate_limit(name: str, key):
+    # The shared SQLite store does file I/O, keep it off the event loop
+    if rate_limiter.store.blocking:
+        await run_in_threadpool(rate_limiter.hit, name, key)
+    else:
+        rate_limiter.hit(name, key)
+
+def limit_by_ip(name: str):
+    # Route-level dependency: runs before authentication, the body and the DB
+    async def dependency(request: Request):
+        await check_rate_limit(name, request.client.host if request.client else "unknown")
+    return dependency
+
 @app.get('/' ,tags = ['Home'])
 async def root():
     return{"Welcome!!"}
     
     
-def verify_google_credentials():    
-    from app import google_sheets
+def verify_google_credentials():
+    # Only reports the settings; the Sheets client is created on first export
     print("\n--- Environment Variables ---")
     print(f"GOOGLE_CREDENTIALS_FILE: {os.getenv('GOOGLE_CREDENTIALS_FILE')}")
     print(f"SPREADSHEET_ID: {os.getenv('SPREADSHEET_ID')}")
@@ -85,34 +145,18 @@ def create_default_admin():
         db.close()
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        token_data = decode_token(token)
-        if not token_data or not token_data.email:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        user = crud.get_user_by_email(db, token_data.email)
-        if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
-    except JWTError:  # Add this import at the top: from jose import JWTError
+def get_current_user(token: str = Depends(oauth2_scheme)):
+    # The token is checked against the verified-token LRU, but the user is
+    # looked up in the versioned user index on every request, so a role change
+    # or deletion made by any worker applies here within USER_INDEX_CHECK_SECONDS
+    token_data = decode_token(token)
+    if not token_data or not token_data.email:
         raise HTTPException(status_code=401, detail="Invalid token")
+    snapshot = user_index.by_email(token_data.email)
+    if snapshot is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return snapshot
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
-
-manager = ConnectionManager()
 
 
 def get_leave_requests(
@@ -131,16 +175,17 @@ def get_leave_requests(
 
 # Add WebSocket endpoint
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, since: Optional[int] = None):
+    # Clients pass the last seq they processed to receive only what they missed
+    await manager.connect(websocket, since=since)
     try:
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
         manager.disconnect(websocket)
         
-@app.post("/register", response_model=schemas.UserOut, tags=['User'])
-def register(
+@app.post("/register", response_model=schemas.UserOut, tags=['User'], dependencies=[Depends(limit_by_ip("register_ip"))])
+async def register(
     name: str = Form(...),
     email: str = Form(...),
     password: str = Form(...),
@@ -154,52 +199,71 @@ def register(
         role="user",       # Default role
         qr_code="0000"     # Default QR code
     )
+    await check_rate_limit("register_account", email.strip().lower())
     
-    db_user = crud.get_user_by_email(db, email)
-    if db_user:
+    if await run_in_threadpool(crud.email_registered, db, email):
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    return crud.create_user(db, user_data)
-
-@app.post("/token", response_model=schemas.Token ,tags = ['User'])
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-    access_token = create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer"}
+    hashed_password = await hasher.hash(password)
+    return await run_in_threadpool(crud.create_user, db, user_data, hashed_password)
 
-@app.post("/attendance/clock-in", response_model=schemas.AttendanceOut, tags=['Attendance'])
-def clock_in(
+@app.post("/admin/users/bulk", response_model=schemas.BulkUserReport, tags=['Admin'])
+async def bulk_create_users(
+    request: Request,
     db: Session = Depends(get_db),
     user: models.User = Depends(get_current_user)
 ):
-    today = date.today()
-    
-    # Check if attendance already exists
-    attendance = db.query(models.Attendance).filter(
-        models.Attendance.user_id == user.id,
-        models.Attendance.date == today
-    ).first()
-    
-    if attendance:
-        if attendance.clock_in:
-            raise HTTPException(status_code=400, detail="Already clocked in today")
-    else:
-        # Create new attendance record
-        attendance = models.Attendance(
-            user_id=user.id,
-            user_name=user.name,
-            date=today
-        )
-        db.add(attendance)
-    
-    # Set clock-in time and format as string
-    now = datetime.now().time()
-    attendance.clock_in = now
-    db.commit()
-    db.refresh(attendance)
-    
+    """
+    Create many users from a JSON array or CSV upload (Content-Type: text/csv)
+    - Fields: name, email, password, role (default user), qr_code (default 0000)
+    - role is user, admin, kiosk or a role with a rule in SHIFT_RULES
+    - Rows that are invalid or clash with an existing email/QR code are skipped
+      and reported; the rest are created in one transaction
+    """
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    try:
+        rows = provisioning.parse_upload(await request.body(), request.headers.get("content-type"))
+    except provisioning.UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(rows) > USER_BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {USER_BULK_MAX_ROWS} users per upload")
+
+    report, candidates = provisioning.check_rows(rows)
+    emails = [new["email"] for _, new in candidates]
+    qr_codes = [new["qr_code"] for _, new in candidates if new["qr_code"] != provisioning.PLACEHOLDER_QR]
+    taken_emails, taken_qr_codes = await run_in_threadpool(crud.find_registered, db, emails, qr_codes)
+    candidates = provisioning.drop_registered(report, candidates, taken_emails, taken_qr_codes)
+
+    hashes = await hasher.hash_many([new["password"] for _, new in candidates])
+    new_users = [{**new, "password": hashed} for (_, new), hashed in zip(candidates, hashes)]
+    try:
+        ids = await run_in_threadpool(crud.bulk_create_users, db, new_users)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Users were registered concurrently; nothing was created, retry the upload")
+    for index, new in candidates:
+        report[index].update(status="created", user_id=ids.get(new["email"]))
+    return {"created": len(candidates), "skipped": len(report) - len(candidates), "results": report}
+
+@app.post("/token", response_model=schemas.Token ,tags = ['User'], dependencies=[Depends(limit_by_ip("login_ip"))])
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    # Before the lookup and bcrypt, so a guessing burst costs neither
+    await check_rate_limit("login_account", form_data.username.strip().lower())
+    credentials = await run_in_threadpool(crud.get_login_credentials, db, form_data.username)
+    if not credentials:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    user_id, email, hashed_password = credentials
+    valid, new_hash = await hasher.verify(form_data.password, hashed_password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Transparently upgrade hashes created with an older cost setting
+        await run_in_threadpool(crud.update_password_hash, db, user_id, new_hash)
+    access_token = create_access_token(data={"sub": email})
+    return {"access_token": access_token, "token_type": "bearer"}
+
+def attendance_out(attendance):
     # Format response with time as strings
     return {
         "user_id": attendance.user_id,
@@ -209,36 +273,108 @@ def clock_in(
         "clock_out": attendance.clock_out.strftime("%H:%M:%S") if attendance.clock_out else None
     }
 
-@app.post("/attendance/clock-out", response_model=schemas.AttendanceOut, tags=['Attendance'])
+def publish_events(events):
+    for event_type, record in events:
+        # Drop cached responses now; the event updates other workers' versions
+        response_versions.touch(event_type)
+        manager.publish_threadsafe(event_type, record)
+
+def queue_punch(user, kind: str):
+    # Write-behind: 202 once the punch is in the local journal
+    try:
+        record = punch_buffer.submit(user, kind)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    queued = schemas.QueuedPunch(
+        punch_id=record["key"],
+        status="queued",
+        user_id=user.id,
+        user_name=user.name,
+        kind=kind,
+        timestamp=record["timestamp"],
+    )
+    return JSONResponse(status_code=202, content=queued.model_dump(mode="json"))
+
+# Documents the write-behind answer next to the usual 200
+QUEUED_PUNCH_RESPONSES = {202: {"model": schemas.QueuedPunch, "description": "Journaled with PUNCH_WRITE_BEHIND on"}}
+
+@app.post("/attendance/clock-in", response_model=schemas.AttendanceOut, responses=QUEUED_PUNCH_RESPONSES,
+          tags=['Attendance'], dependencies=[Depends(limit_by_ip("punch_ip"))])
+def clock_in(
+    db: Session = Depends(get_db),
+    user: models.User = Depends(get_current_user)
+):
+    rate_limiter.hit("punch_account", user.id)
+    if punch_buffer.running:
+        return queue_punch(user, "clock_in")
+    # Single upsert; raises 400 if already clocked in today
+    record = attendance_out(crud.clock_in(db, user))
+    publish_events([("attendance.clock_in", record)])
+    return record
+
+@app.post("/attendance/clock-out", response_model=schemas.AttendanceOut, responses=QUEUED_PUNCH_RESPONSES,
+          tags=['Attendance'], dependencies=[Depends(limit_by_ip("punch_ip"))])
 def clock_out(
     db: Session = Depends(get_db),
     user: models.User = Depends(get_current_user)
 ):
-    today = date.today()
-    attendance = db.query(models.Attendance).filter(
-        models.Attendance.user_id == user.id,
-        models.Attendance.date == today
-    ).first()
-    
-    if not attendance:
-        raise HTTPException(status_code=400, detail="You haven't clocked in today")
-    if attendance.clock_out:
-        raise HTTPException(status_code=400, detail="Already clocked out today")
-    
-    # Set clock-out time and format as string
-    now = datetime.now().time()
-    attendance.clock_out = now
-    db.commit()
-    db.refresh(attendance)
-    
-    # Format response with time as strings
-    return {
-        "user_id": attendance.user_id,
-        "user_name": attendance.user_name,
-        "date": attendance.date,
-        "clock_in": attendance.clock_in.strftime("%H:%M:%S") if attendance.clock_in else None,
-        "clock_out": attendance.clock_out.strftime("%H:%M:%S") if attendance.clock_out else None
-    }
+    rate_limiter.hit("punch_account", user.id)
+    if punch_buffer.running:
+        return queue_punch(user, "clock_out")
+    # Single conditional update; raises 400 if not clocked in or already out
+    record = attendance_out(crud.clock_out(db, user))
+    publish_events([("attendance.clock_out", record)])
+    return record
+
+@app.get("/attendance/today", response_model=List[schemas.AttendanceOut], tags=['Attendance'])
+def today_attendance(
+    if_none_match: Optional[str] = Header(None),
+    user: models.User = Depends(get_current_user)
+):
+    """
+    Today's clock-ins and clock-outs
+    - Admins see everyone, other users their own record
+    - Send the ETag back in If-None-Match to get 304 while nothing changed
+    """
+    owner_id = None if user.role == "admin" else user.id
+    def build():
+        # Only a cache miss checks out a read connection
+        db = read_session()
+        try:
+            rows = [attendance_out(attendance) for attendance in crud.get_today_attendance(db, owner_id)]
+        finally:
+            db.close()
+        return json.dumps(rows, default=str).encode(), {}
+    return cached_response(if_none_match, "attendance", ("today", date.today(), owner_id), build)
+
+@app.get("/attendance/punches/{punch_id}", response_model=schemas.ScanResult, tags=['Attendance'])
+def punch_status(punch_id: str, user: models.User = Depends(get_current_user)):
+    """Outcome of a write-behind punch; status is "queued" until it is written"""
+    receipt = punch_buffer.outcome(punch_id)
+    if receipt is None or (receipt.user_id != user.id and user.role != "admin"):
+        raise HTTPException(status_code=404, detail="Punch not found")
+    return schemas.ScanResult(
+        idempotency_key=punch_id, status=receipt.status, user_id=receipt.user_id, detail=receipt.detail
+    )
+
+@app.post("/attendance/scans/batch", response_model=List[schemas.ScanResult], tags=['Attendance'])
+def ingest_scan_batch(
+    scans: List[schemas.ScanIn],
+    db: Session = Depends(get_db),
+    user: models.User = Depends(get_current_user)
+):
+    """
+    Upload buffered kiosk scans
+    - Safe to resend: scans whose idempotency_key was already processed are
+      answered from the stored result with replayed=true
+    """
+    if user.role not in ("admin", "kiosk"):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if len(scans) > SCAN_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {SCAN_BATCH_MAX_SIZE} scans per batch")
+    results, events = crud.apply_scan_batch(db, scans)
+    publish_events(events)
+    return results
 
 @app.post("/create-leave", response_model=schemas.LeaveRequestOut, tags=['Leave Requests'])
 def create_leave_request(
@@ -255,81 +391,265 @@ def create_leave_request(
         reason=reason
     )
     db.add(db_leave_request)
+    # Pending until an admin approves it; the summaries count it from then on
     db.commit()
     db.refresh(db_leave_request)
+    publish_events([("leave.created", schemas.LeaveRequestOut.model_validate(db_leave_request).model_dump())])
     return db_leave_request
 
 @app.get("/Get-leave-lists", response_model=List[schemas.LeaveRequestOut], tags=['Leave Requests'])
 def get_leave_requests(
+    if_none_match: Optional[str] = Header(None),
     all: bool = Query(False, description="Return all requests (admin only)"),
-    db: Session = Depends(get_db),
+    user_id: Optional[int] = Query(None, description="Only this user's requests (admin only)"),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=LEAVE_PAGE_MAX_SIZE),
+    leave_status: Optional[str] = Query(None, alias="status", pattern="^(pending|approved|rejected)$"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
     user: models.User = Depends(get_current_user)
 ):
-    if user.role == "admin" and all:
-        leave_requests = db.query(models.LeaveRequest).all()
+    """
+    Get leave requests, ordered by date
+    - Regular users: only their own requests
+    - Admins: all requests if 'all=true' parameter provided, or one user's with user_id
+    - JSON pages hold `limit` rows (default LEAVE_PAGE_SIZE); the next page's
+      cursor is returned in the X-Next-Cursor header
+    - format=ndjson streams every matching row (or `limit` rows) from a
+      server-side cursor instead
+    - status filters by pending, approved or rejected
+    - JSON pages carry an ETag; If-None-Match answers 304 while nothing changed
+    """
+    if user.role != "admin":
+        owner_id = user.id
+    elif user_id is not None:
+        owner_id = user_id
     else:
-        leave_requests = db.query(models.LeaveRequest).filter(
-            models.LeaveRequest.user_id == user.id
-        ).all()
+        owner_id = None if all else user.id
     
-    return leave_requests
+    if format == "ndjson":
+        stmt = crud.leave_requests_page_query(owner_id, date_from, date_to, cursor, limit, leave_status)
+        return StreamingResponse(stream_leave_requests(stmt), media_type="application/x-ndjson")
+    
+    page_size = limit or LEAVE_PAGE_SIZE
+    def build():
+        stmt = crud.leave_requests_page_query(owner_id, date_from, date_to, cursor, page_size + 1, leave_status)
+        db = read_session()
+        try:
+            rows = db.execute(stmt).all()
+        finally:
+            db.close()
+        headers = {}
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            headers["X-Next-Cursor"] = crud.encode_leave_cursor(rows[-1])
+        return json.dumps([leave_out(row) for row in rows]).encode(), headers
+    key = ("leave-list", owner_id, date_from, date_to, cursor, page_size, leave_status)
+    return cached_response(if_none_match, "leave", key, build)
 
-@app.post("/admin/export", tags=['Admin'])
-async def export_attendance(
+@app.post("/admin/leave/decisions", response_model=schemas.LeaveDecisionResult, tags=['Leave Requests'])
+def decide_leave_requests(
+    decision: schemas.LeaveDecision,
     db: Session = Depends(get_db),
     user: models.User = Depends(get_current_user)
 ):
+    """
+    Approve or reject many leave requests at once
+    - Only approved leave shows as "On Leave" in exports, reports and summaries
+    - Rejecting an approved request withdraws it
+    """
     if user.role != "admin":
         raise HTTPException(status_code=403, detail="Forbidden")
+    if decision.status not in ("approved", "rejected"):
+        raise HTTPException(status_code=400, detail="status must be 'approved' or 'rejected'")
+    if len(decision.ids) > LEAVE_DECISION_MAX_IDS:
+        raise HTTPException(status_code=413, detail=f"At most {LEAVE_DECISION_MAX_IDS} requests per decision")
+    try:
+        updated, unchanged, not_found, events = crud.decide_leave_requests(db, decision.ids, decision.status)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Conflicting decision in progress; retry")
+    publish_events(events)
+    return {"status": decision.status, "updated": updated, "unchanged": unchanged, "not_found": not_found}
+
+@app.get("/leave/calendar", tags=['Leave Requests'])
+def leave_calendar(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    db: Session = Depends(get_read_db),
+    user: models.User = Depends(get_current_user)
+):
+    """
+    Who is on approved leave on each day of a range: {"YYYY-MM-DD": [user ids]}
+    - Regular users only see their own days
+    """
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (date_to - date_from).days >= LEAVE_CALENDAR_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"At most {LEAVE_CALENDAR_MAX_DAYS} days per request")
+    days = crud.get_leave_calendar(db, date_from, date_to)
+    if user.role != "admin":
+        days = {day: {user.id} for day, user_ids in days.items() if user.id in user_ids}
+    return {day.isoformat(): sorted(user_ids) for day, user_ids in sorted(days.items())}
+
+def leave_out(row):
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "user_name": row.user_name,
+        "date": row.date.isoformat(),
+        "reason": row.reason,
+        "status": row.status,
+    }
+
+def stream_leave_requests(stmt):
+    # Own session: the request's session is closed before the body is streamed
+    db = read_session()
+    try:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=LEAVE_STREAM_BATCH_SIZE))
+        for row in result:
+            yield json.dumps(leave_out(row)) + "\n"
+    finally:
+        db.close()
+
+@app.get("/reports/summary", tags=['Reports'])
+async def summary_report(
+    month: str = Query(..., pattern=r"^\d{4}-\d{2}$", description="YYYY-MM"),
+    per_user: bool = Query(False, description="Include one row per user"),
+    user: models.User = Depends(get_current_user)
+):
+    """
+    Hours worked, late arrivals, leave and absences per role for a month
+    - Served from the summary tables; rebuild with `python -m app.summaries rebuild`
+    """
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return await run_read(summaries.monthly_report, date.fromisoformat(month + "-01"), per_user)
+
+@app.get("/reports/hours", tags=['Reports'])
+async def hours_report(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    user: models.User = Depends(get_current_user)
+):
+    """
+    Worked hours, overtime, late arrivals and leave days per employee
+    - Lateness and overtime follow the shift rule of each user's role
+    - At most REPORT_MAX_DAYS days per report
+    """
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (date_to - date_from).days >= REPORT_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"At most {REPORT_MAX_DAYS} days per report")
+    return await run_read(reports.hours_report, date_from, date_to)
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/cache-stats", tags=['Admin'])
+def cache_stats(user: models.User = Depends(get_current_user)):
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return {
+        "verified_tokens": verified_tokens.stats(),
+        "user_index": user_index.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "responses": {**response_cache.stats(), "versions": response_versions.stats()},
+    }
+
+@app.post("/admin/export", status_code=202, tags=['Admin'])
+async def export_attendance(
+    user: models.User = Depends(get_current_user)
+):
+    """
+    Queue an export of today's attendance to Google Sheets
+    - Clicks while an export is in flight collapse into a single follow-up run
+    - Poll GET /admin/export/{job_id}; clients are notified over /ws when it completes
+    """
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    await manager.start()
     
-    today = date.today()
-    
-    # Get all users
-    users = db.query(models.User).all()
-    user_ids = [user.id for user in users]
-    
-    # Get today's attendance records
-    attendances = db.query(models.Attendance).filter(
-        models.Attendance.date == today,
-        models.Attendance.user_id.in_(user_ids)
-    ).all()
-    attendance_map = {att.user_id: att for att in attendances}
-    
-    # Get today's leave requests
-    leaves_today = db.query(models.LeaveRequest).filter(
-        models.LeaveRequest.date == today,
-        models.LeaveRequest.user_id.in_(user_ids)
-    ).all()
-    leave_user_ids = {leave.user_id for leave in leaves_today}
-    
-    export_data = []
-    for user in users:
-        att = attendance_map.get(user.id)
-        is_on_leave = user.id in leave_user_ids
-        
-        clock_in = ""
-        clock_out = ""
-        if not is_on_leave and att:
-            # Already formatted as strings in the response
-            clock_in = att.clock_in if att.clock_in else ""
-            clock_out = att.clock_out if att.clock_out else ""
-        
-        export_data.append([
-            user.name,
-            user.role,
-            today.strftime("%Y-%m-%d"),
-            clock_in,
-            clock_out,
-            "On Leave" if is_on_leave else ""
-        ])
+    def notify(job):
+        if job.status == "succeeded":
+            manager.publish_threadsafe("export.completed", {"job_id": job.id, **job.result})
     
-    success = google_sheets.export_to_sheet(
-        export_data,
-        spreadsheet_id=os.getenv("SPREADSHEET_ID"),
-        sheet_name="attendance"
+    job = export_queue.submit(on_complete=notify)
+    return {"job_id": job.id, "status": job.status}
+
+@app.post("/admin/archive", status_code=202, tags=['Admin'])
+def archive_attendance(user: models.User = Depends(get_current_user)):
+    """
+    Queue archival of closed months (older than ATTENDANCE_HOT_MONTHS) to Parquet
+    - Reports and file exports keep reading archived months; poll GET /admin/archive/{job_id}
+    """
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    missing = exports.missing_dependency("parquet")
+    if missing:
+        raise HTTPException(status_code=501, detail=f"Archiving needs the {missing} package")
+    job = archive_queue.submit()
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/admin/archive/{job_id}", tags=['Admin'])
+def archive_status(job_id: str, user: models.User = Depends(get_current_user)):
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    job = archive_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/admin/export/file", tags=['Admin'])
+def export_file(
+    format: str = Query("csv", pattern="^(csv|xlsx|parquet)$"),
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    user: models.User = Depends(get_current_user)
+):
+    """
+    Download the attendance sheet rows for a date range
+    - One row per user per day: Name, Role, Date, In, Out, Leave Status
+    - Streamed while it is read; xlsx needs openpyxl and parquet needs pyarrow
+    """
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (date_to - date_from).days >= EXPORT_FILE_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"At most {EXPORT_FILE_MAX_DAYS} days per export")
+    missing = exports.missing_dependency(format)
+    if missing:
+        raise HTTPException(status_code=501, detail=f"{format} export needs the {missing} package")
+    writer, media_type, _ = exports.FORMATS[format]
+    filename = f"attendance_{date_from.isoformat()}_{date_to.isoformat()}.{format}"
+    return StreamingResponse(
+        stream_export_file(writer, date_from, date_to),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
-    
-    if success:
-        await manager.broadcast("attendance_updated")
-        return {"status": "Exported to Google Sheets"}
-    raise HTTPException(500, "Export failed")
\ No newline at end of file
+
+def stream_export_file(writer, date_from, date_to):
+    # Own session, like stream_leave_requests
+    db = read_session()
+    try:
+        yield from writer(crud.iter_export_rows(db, date_from, date_to))
+    finally:
+        db.close()
+
+@app.get("/admin/export/{job_id}", tags=['Admin'])
+def export_status(
+    job_id: str,
+    user: models.User = Depends(get_current_user)
+):
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    job = export_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, validator
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime, date
 from pydantic import field_validator, ConfigDict
 
@@ -27,10 +27,23 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    exp: Optional[int] = None  # Expiry as a UNIX timestamp
 
 class AttendanceCreate(BaseModel):
     qr_code: str
 
+class ScanIn(BaseModel):
+    qr_code: str
+    timestamp: datetime
+    idempotency_key: str
+
+class ScanResult(BaseModel):
+    idempotency_key: str
+    status: str  # clock_in, clock_out, ignored, unknown_qr, ambiguous_qr (or queued for buffered punches)
+    user_id: Optional[int] = None
+    detail: Optional[str] = None
+    replayed: bool = False  # True when answered from an earlier upload
+
 class AttendanceOut(BaseModel):
     user_id: int
     user_name: str
@@ -40,6 +53,15 @@ class AttendanceOut(BaseModel):
     class Config:
         from_attributes = True
         
+class QueuedPunch(BaseModel):
+    """202 body of clock-in/out with PUNCH_WRITE_BEHIND; poll /attendance/punches/{punch_id}"""
+    punch_id: str
+    status: str  # Always "queued"
+    user_id: int
+    user_name: str
+    kind: str  # clock_in or clock_out
+    timestamp: datetime
+
 class LeaveRequestCreate(BaseModel):
     date: date
     reason: str = None
@@ -48,6 +70,28 @@ class LeaveRequestOut(LeaveRequestCreate):
     id: int
     user_id: int
     user_name: str  # Now this will come directly from query
+    status: str = "pending"
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+class BulkUserResult(BaseModel):
+    row: int  # Position in the upload, from 0
+    email: str
+    status: str  # created, invalid, duplicate_email, duplicate_qr
+    user_id: Optional[int] = None
+    detail: Optional[str] = None
+
+class BulkUserReport(BaseModel):
+    created: int
+    skipped: int
+    results: List[BulkUserResult]
+
+class LeaveDecision(BaseModel):
+    ids: List[int]
+    status: str  # approved or rejected
+
+class LeaveDecisionResult(BaseModel):
+    status: str
+    updated: List[int]  # Requests whose status changed
+    unchanged: List[int]  # Already had this status
+    not_found: List[int]
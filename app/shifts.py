@@ -0,0 +1,45 @@
+import json
+from config.settings import WORKDAY_START, LATE_GRACE_MINUTES, STANDARD_SHIFT_HOURS, SHIFT_RULES
+
+
+def _seconds(clock: str) -> int:
+    hours, minutes = clock.split(":")[:2]
+    return int(hours) * 3600 + int(minutes) * 60
+
+
+class ShiftRule:
+    """When a role's shift starts, how late is tolerated and how long it lasts.
+
+    Shifts must end by midnight: punches are stored per calendar day, so a
+    clock-out after midnight would open the next day instead of closing this one.
+    """
+    __slots__ = ("start_seconds", "grace_seconds", "standard_seconds")
+
+    def __init__(self, start: str, grace_minutes: int, hours: float):
+        self.start_seconds = _seconds(start)
+        self.grace_seconds = int(grace_minutes) * 60
+        self.standard_seconds = int(float(hours) * 3600)
+        if self.start_seconds + self.standard_seconds > 24 * 3600:
+            raise ValueError(f"Shift starting {start} for {hours}h crosses midnight, which is not supported")
+
+    @property
+    def late_after_seconds(self):
+        return self.start_seconds + self.grace_seconds
+
+
+DEFAULT_RULE = ShiftRule(WORKDAY_START, LATE_GRACE_MINUTES, STANDARD_SHIFT_HOURS)
+
+# SHIFT_RULES = '{"evening": {"start": "14:00", "grace_minutes": 10, "hours": 8}}'
+# Missing keys fall back to the defaults above.
+RULES = {
+    role: ShiftRule(
+        rule.get("start", WORKDAY_START),
+        rule.get("grace_minutes", LATE_GRACE_MINUTES),
+        rule.get("hours", STANDARD_SHIFT_HOURS),
+    )
+    for role, rule in json.loads(SHIFT_RULES or "{}").items()
+}
+
+
+def rule_for(role: str) -> ShiftRule:
+    return RULES.get(role, DEFAULT_RULE)
@@ -0,0 +1,309 @@
+"""Daily (per role) and monthly (per user) attendance summaries.
+
+The ``record_*`` functions collect deltas on the session whenever a punch is
+written or leave is approved or withdrawn, so reports never have to scan the
+raw tables. ``commit`` applies them after the caller's transaction, merged
+with those of concurrent commits: the per-role daily row every punch touches
+is then locked by one small upsert per burst, not by every punch
+transaction. A crash in between loses those deltas; ``rebuild`` recomputes
+them.
+``rebuild`` recomputes a date range from scratch for backfills:
+
+    python -m app.summaries rebuild --from 2026-01-01 --to 2026-01-31
+"""
+import argparse
+import logging
+import threading
+from collections import defaultdict
+from datetime import date, time, timedelta
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.orm import Session
+from app import models
+from app.database import upsert
+from app.shifts import rule_for
+
+logger = logging.getLogger(__name__)
+
+DAILY_COUNTERS = ("present_count", "late_count", "leave_count", "worked_seconds")
+MONTHLY_COUNTERS = ("days_present", "late_days", "leave_days", "worked_seconds")
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def is_late(role: str, clock_in: time) -> bool:
+    seconds = clock_in.hour * 3600 + clock_in.minute * 60 + clock_in.second
+    return seconds > rule_for(role).late_after_seconds
+
+
+def worked_seconds(clock_in: time, clock_out: time) -> int:
+    if clock_in is None or clock_out is None:
+        return 0
+    seconds = (clock_out.hour * 3600 + clock_out.minute * 60 + clock_out.second) - \
+        (clock_in.hour * 3600 + clock_in.minute * 60 + clock_in.second)
+    return max(seconds, 0)
+
+
+def _bump(db: Session, model, keys: dict, counters, deltas: dict, attributes: dict = None):
+    """Add ``deltas`` to a summary row, creating it at zero if missing.
+
+    ``attributes`` are plain columns overwritten with the latest value.
+    """
+    table = model.__table__
+    attributes = attributes or {}
+    values = {**keys, **attributes, **{name: deltas.get(name, 0) for name in counters}}
+
+    def add_deltas(new):
+        changes = {name: table.c[name] + new[name] for name in deltas}
+        changes.update({name: new[name] for name in attributes})
+        return changes
+
+    db.execute(upsert(db, model, values, index_elements=list(keys), update=add_deltas))
+
+
+def _merge(pending: dict, key, deltas: dict, attributes: dict):
+    entry = pending.setdefault(key, ({}, {}))
+    for name, value in deltas.items():
+        entry[0][name] = entry[0].get(name, 0) + value
+    entry[1].update(attributes)
+
+
+def _record(db: Session, user_id: int, role: str, day: date, daily: dict, monthly: dict):
+    role = role or ""
+    pending = db.info.setdefault("summary_deltas", {})
+    _merge(pending, ("daily", day, role), daily, {})
+    _merge(pending, ("monthly", month_start(day), user_id), monthly, {"role": role})
+
+
+_backlog = {}  # Deltas committed by any session of this process, not yet applied
+_backlog_lock = threading.Lock()
+_apply_lock = threading.Lock()
+
+
+def commit(db: Session):
+    """Commit the caller's transaction, then get the deltas it collected applied.
+
+    Deltas join a process-wide backlog. Whichever committing thread finds no
+    other one applying it takes the whole backlog, merged per summary row,
+    and applies it in key order (so concurrent processes lock rows alike) in
+    a second short transaction on its session. A burst of punches therefore
+    costs a handful of summary transactions instead of one per punch.
+    """
+    global _backlog
+    db.commit()
+    pending = db.info.pop("summary_deltas", None)
+    if pending:
+        with _backlog_lock:
+            for key, (deltas, attributes) in pending.items():
+                _merge(_backlog, key, deltas, attributes)
+    # Checked again after releasing, so deltas added meanwhile are not stranded
+    while _backlog and _apply_lock.acquire(blocking=False):
+        try:
+            with _backlog_lock:
+                batch, _backlog = _backlog, {}
+            _apply(db, batch)
+        finally:
+            _apply_lock.release()
+
+
+def _apply(db: Session, batch: dict):
+    try:
+        for key in sorted(batch):
+            deltas, attributes = batch[key]
+            if not any(deltas.values()):
+                continue  # e.g. leave approved and withdrawn in one transaction
+            kind, period, owner = key
+            if kind == "daily":
+                _bump(db, models.AttendanceDailySummary, {"date": period, "role": owner}, DAILY_COUNTERS, deltas)
+            else:
+                _bump(db, models.AttendanceMonthlySummary, {"month": period, "user_id": owner},
+                      MONTHLY_COUNTERS, deltas, attributes=attributes)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        # The punches are committed; only the summaries are behind
+        logger.error(f"Summary update failed, run `python -m app.summaries rebuild`: {str(e)}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("summary_deltas", None)
+
+
+def record_clock_in(db: Session, user_id: int, role: str, day: date, clock_in: time):
+    late = int(is_late(role, clock_in))
+    _record(db, user_id, role, day,
+            {"present_count": 1, "late_count": late},
+            {"days_present": 1, "late_days": late})
+
+
+def record_clock_out(db: Session, user_id: int, role: str, day: date, clock_in: time, clock_out: time):
+    seconds = worked_seconds(clock_in, clock_out)
+    _record(db, user_id, role, day, {"worked_seconds": seconds}, {"worked_seconds": seconds})
+
+
+def record_leave(db: Session, user_id: int, role: str, day: date, delta: int = 1):
+    _record(db, user_id, role, day, {"leave_count": delta}, {"leave_days": delta})
+
+
+def rebuild(db: Session, start: date, end: date):
+    """Recompute the summaries for ``start``..``end`` (whole months for the monthly table)."""
+    first_month, last_month = month_start(start), month_start(end)
+    month_end = (last_month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+    daily = defaultdict(lambda: dict.fromkeys(DAILY_COUNTERS, 0))
+    monthly = defaultdict(lambda: dict.fromkeys(MONTHLY_COUNTERS, 0))
+    roles = {}
+
+    def add(user_id, role, day, daily_deltas, monthly_deltas):
+        role = role or ""
+        roles[user_id] = role
+        if start <= day <= end:
+            for name, value in daily_deltas.items():
+                daily[(day, role)][name] += value
+        for name, value in monthly_deltas.items():
+            monthly[(month_start(day), user_id)][name] += value
+
+    archived_months = set()
+    if inspect(db.connection()).has_table(models.ArchivedMonth.__tablename__):  # Not yet during migration 4
+        from app import archive
+
+        archived_months = {month for month, _ in archive.archived_months(db, first_month, month_end)}
+
+    attendance = models.Attendance
+    rows = db.execute(
+        select(attendance.user_id, models.User.role, attendance.date, attendance.clock_in, attendance.clock_out)
+        .join(models.User, models.User.id == attendance.user_id)
+        .where(attendance.date.between(first_month, month_end))
+        .execution_options(yield_per=5000)
+    )
+    late_uploads = set()  # Hot rows of archived months; they replace the archived punch
+    for user_id, role, day, clock_in, clock_out in rows:
+        if month_start(day) in archived_months:
+            late_uploads.add((user_id, day))
+        late = int(clock_in is not None and is_late(role, clock_in))
+        seconds = worked_seconds(clock_in, clock_out)
+        present = int(clock_in is not None)
+        add(user_id, role, day,
+            {"present_count": present, "late_count": late, "worked_seconds": seconds},
+            {"days_present": present, "late_days": late, "worked_seconds": seconds})
+
+    if archived_months:
+        user_roles = dict(db.execute(select(models.User.id, models.User.role)).all())
+        for user_id, day, clock_in, clock_out in archive.iter_punches(db, first_month, month_end):
+            if user_id not in user_roles or (user_id, day) in late_uploads:
+                continue
+            late = int(clock_in is not None and is_late(user_roles[user_id], clock_in))
+            seconds = worked_seconds(clock_in, clock_out)
+            present = int(clock_in is not None)
+            add(user_id, user_roles[user_id], day,
+                {"present_count": present, "late_count": late, "worked_seconds": seconds},
+                {"days_present": present, "late_days": late, "worked_seconds": seconds})
+
+    # Approved leave only, one day per user however many requests cover it
+    if inspect(db.connection()).has_table(models.LeaveCalendar.__tablename__):
+        leave = models.LeaveCalendar
+        leave_days = select(leave.user_id, leave.date)
+    else:
+        # Migration 4 runs before leave approval (6), which marks every existing request approved
+        leave = models.LeaveRequest
+        leave_days = select(leave.user_id, leave.date).distinct()
+    leave_days = leave_days.where(leave.date.between(first_month, month_end)).subquery()
+    rows = db.execute(
+        select(leave_days.c.user_id, models.User.role, leave_days.c.date)
+        .join(models.User, models.User.id == leave_days.c.user_id)
+        .execution_options(yield_per=5000)
+    )
+    for user_id, role, day in rows:
+        add(user_id, role, day, {"leave_count": 1}, {"leave_days": 1})
+
+    summary = models.AttendanceDailySummary
+    db.execute(delete(summary).where(summary.date.between(start, end)))
+    db.execute(delete(models.AttendanceMonthlySummary).where(
+        models.AttendanceMonthlySummary.month.between(first_month, last_month)
+    ))
+    if daily:
+        db.execute(summary.__table__.insert(), [
+            {"date": day, "role": role, **counters} for (day, role), counters in daily.items()
+        ])
+    if monthly:
+        db.execute(models.AttendanceMonthlySummary.__table__.insert(), [
+            {"month": month, "user_id": user_id, "role": roles[user_id], **counters}
+            for (month, user_id), counters in monthly.items()
+        ])
+    db.commit()
+    return {"days": len(daily), "user_months": len(monthly)}
+
+
+def monthly_report(db: Session, month: date, per_user: bool = False):
+    """Totals per role for one month, read from the summary tables only."""
+    month = month_start(month)
+    month_end = (month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    summary = models.AttendanceDailySummary
+    by_role = {}
+    for row in db.execute(
+        select(
+            summary.role,
+            func.count(summary.date).label("days"),
+            func.sum(summary.present_count).label("present"),
+            func.sum(summary.late_count).label("late"),
+            func.sum(summary.leave_count).label("leave"),
+            func.sum(summary.worked_seconds).label("worked_seconds"),
+        )
+        .where(summary.date.between(month, month_end))
+        .group_by(summary.role)
+    ):
+        by_role[row.role] = {
+            "role": row.role,
+            "days_with_activity": row.days,
+            "present": int(row.present or 0),
+            "late_arrivals": int(row.late or 0),
+            "leave": int(row.leave or 0),
+            "worked_hours": round((row.worked_seconds or 0) / 3600, 2),
+        }
+
+    # Absences: headcount on every day that had activity, minus present and on leave
+    for role, headcount in db.execute(
+        select(models.User.role, func.count(models.User.id)).group_by(models.User.role)
+    ):
+        totals = by_role.get(role or "")
+        if totals is not None:
+            totals["headcount"] = headcount
+            totals["absences"] = max(headcount * totals["days_with_activity"] - totals["present"] - totals["leave"], 0)
+
+    report = {"month": month.strftime("%Y-%m"), "by_role": list(by_role.values())}
+    if per_user:
+        monthly = models.AttendanceMonthlySummary
+        report["by_user"] = [
+            {
+                "user_id": row.user_id,
+                "role": row.role,
+                "days_present": row.days_present,
+                "late_days": row.late_days,
+                "leave_days": row.leave_days,
+                "worked_hours": round(row.worked_seconds / 3600, 2),
+            }
+            for row in db.execute(select(monthly).where(monthly.month == month)).scalars()
+        ]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain attendance summary tables")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = sub.add_parser("rebuild", help="Recompute summaries for a date range")
+    rebuild_parser.add_argument("--from", dest="start", type=date.fromisoformat, required=True)
+    rebuild_parser.add_argument("--to", dest="end", type=date.fromisoformat, required=True)
+    args = parser.parse_args()
+
+    from app.database import SessionLocal
+    db = SessionLocal()
+    try:
+        print(rebuild(db, args.start, args.end))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
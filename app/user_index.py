@@ -0,0 +1,183 @@
+"""In-process email / QR code -> user index.
+
+Built lazily from the users table on first lookup; after that, lookups are
+dict reads with no database round-trip. Every committed change to a user's
+name, email, role or QR code bumps the ``users`` row of ``data_versions`` in
+the same transaction. The writing worker applies its own changes to its
+index after commit (write-through); other workers compare the stamp at most
+every ``USER_INDEX_CHECK_SECONDS``, and on a miss, and rebuild if it moved.
+"""
+import logging
+import threading
+import time
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session, object_session
+from app import models
+from app.cache import UserSnapshot
+from app.database import engine
+from config.settings import USER_INDEX_CHECK_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_versions = models.DataVersion.__table__
+_INDEXED = ("name", "email", "role", "qr_code")
+
+
+def _read_version(conn):
+    return conn.execute(select(_versions.c.version).where(_versions.c.name == "users")).scalar() or 0
+
+
+class UserIndex:
+    def __init__(self, check_interval: float = USER_INDEX_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self.version = None
+        self._by_id = None  # id -> (UserSnapshot, qr_code)
+        self._by_email = {}
+        self._by_qr = {}  # qr_code -> tuple of UserSnapshot; QR codes are not unique
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self.checks = 0
+
+    def by_email(self, email: str):
+        """The ``UserSnapshot`` registered with ``email``, or ``None``."""
+        self._ensure_fresh()
+        user = self._by_email.get(email)
+        if user is None and self._check():
+            user = self._by_email.get(email)
+        return user
+
+    def by_qr(self, qr_code: str):
+        """Every ``UserSnapshot`` holding ``qr_code`` (empty when unknown)."""
+        return self.by_qr_codes([qr_code]).get(qr_code, ())
+
+    def by_qr_codes(self, qr_codes):
+        """``{qr_code: (UserSnapshot, ...)}`` for the known codes in ``qr_codes``."""
+        self._ensure_fresh()
+        found = {qr_code: self._by_qr[qr_code] for qr_code in qr_codes if qr_code in self._by_qr}
+        if len(found) < len(set(qr_codes)) and self._check():
+            found = {qr_code: self._by_qr[qr_code] for qr_code in qr_codes if qr_code in self._by_qr}
+        return found
+
+    def _ensure_fresh(self):
+        if self._by_id is None:
+            self.rebuild()
+        elif time.monotonic() - self._checked_at >= self.check_interval:
+            self._check()
+
+    def _check(self) -> bool:
+        """Rebuild if another worker changed users; returns whether it did."""
+        self.checks += 1
+        self._checked_at = time.monotonic()  # Before the read, so concurrent lookups do not all check
+        with engine.connect() as conn:
+            version = _read_version(conn)
+        if version == self.version:
+            return False
+        self.rebuild()
+        return True
+
+    def rebuild(self):
+        with self._lock, engine.connect() as conn:
+            # Stamp first: a change committed in between makes the next check rebuild again
+            version = _read_version(conn)
+            by_id, by_email, by_qr = {}, {}, {}
+            for user_id, name, email, role, qr_code in conn.execute(select(
+                models.User.id, models.User.name, models.User.email, models.User.role, models.User.qr_code
+            )):
+                user = UserSnapshot(user_id, name, email, role)
+                by_id[user_id] = (user, qr_code)
+                if email is not None:
+                    by_email[email] = user
+                if qr_code is not None:
+                    by_qr[qr_code] = by_qr.get(qr_code, ()) + (user,)
+            self._by_id, self._by_email, self._by_qr = by_id, by_email, by_qr
+            self.version = version
+            self._checked_at = time.monotonic()
+            self.rebuilds += 1
+        logger.info(f"User index rebuilt: {len(by_id)} users at version {version}")
+
+    def apply(self, base_version, version, changes):
+        """Apply committed ``(user_id, snapshot or None, qr_code)`` changes.
+
+        ``base_version`` is the stamp before the transaction's first bump. If
+        it is not the version this index holds, some other change is missing
+        as well, so the index is left to rebuild on its next check.
+        """
+        with self._lock:
+            if self._by_id is None:
+                return
+            for user_id, user, qr_code in changes:
+                self._remove(user_id)
+                if user is not None:
+                    self._by_id[user_id] = (user, qr_code)
+                    if user.email is not None:
+                        self._by_email[user.email] = user
+                    if qr_code is not None:
+                        self._by_qr[qr_code] = self._by_qr.get(qr_code, ()) + (user,)
+            if base_version == self.version:
+                self.version = version
+            else:
+                self._checked_at = 0.0
+
+    def _remove(self, user_id):
+        old = self._by_id.pop(user_id, None)
+        if old is None:
+            return
+        user, qr_code = old
+        if self._by_email.get(user.email) is user:
+            del self._by_email[user.email]
+        holders = tuple(other for other in self._by_qr.get(qr_code, ()) if other is not user)
+        if holders:
+            self._by_qr[qr_code] = holders
+        else:
+            self._by_qr.pop(qr_code, None)
+
+    def stats(self):
+        return {
+            "users": len(self._by_id or ()),
+            "version": self.version,
+            "rebuilds": self.rebuilds,
+            "checks": self.checks,
+        }
+
+
+user_index = UserIndex()
+
+
+def record_changes(session: Session, connection, changes):
+    """Bump the users stamp inside the current transaction and queue ``changes``
+    for the index once it commits. Bulk writes that bypass the ORM call this."""
+    connection.execute(update(_versions).where(_versions.c.name == "users").values(version=_versions.c.version + 1))
+    version = _read_version(connection)
+    pending = session.info.get("user_index")
+    if pending is None:
+        pending = session.info["user_index"] = {"base": version - 1, "changes": []}
+    pending["version"] = version
+    pending["changes"].extend(changes)
+
+
+@event.listens_for(models.User, "after_insert")
+@event.listens_for(models.User, "after_update")
+def _user_written(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in _INDEXED):
+        return  # e.g. a password rehash
+    user = UserSnapshot(target.id, target.name, target.email, target.role)
+    record_changes(object_session(target), connection, [(target.id, user, target.qr_code)])
+
+
+@event.listens_for(models.User, "after_delete")
+def _user_deleted(mapper, connection, target):
+    record_changes(object_session(target), connection, [(target.id, None, None)])
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    pending = session.info.pop("user_index", None)
+    if pending is not None:
+        user_index.apply(pending["base"], pending["version"], pending["changes"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("user_index", None)
@@ -0,0 +1,122 @@
+"""WebSocket fan-out benchmark with 10k simulated sockets.
+
+Compares the old sequential ``await send_text`` loop with ``ConnectionManager``
+when a small share of clients are slow or dead. Messages are clock-in events
+for ``--records`` attendance records; with fewer records than messages, a
+newer event for a record still queued for a client replaces the older one
+(``coalesced``).
+
+    python -m benchmarks.bench_broadcast --sockets 10000 --messages 20 --records 5
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import configure
+
+
+class FakeWebSocket:
+    def __init__(self, delay=0.0, dead=False):
+        self.delay = delay
+        self.dead = dead
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        if self.dead:
+            raise ConnectionResetError("client went away")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+
+    async def close(self, code=1000):
+        pass
+
+
+def make_sockets(count, slow_every, dead_every, slow_delay):
+    sockets = []
+    for i in range(count):
+        if dead_every and i % dead_every == 0:
+            sockets.append(FakeWebSocket(dead=True))
+        elif slow_every and i % slow_every == 1:
+            sockets.append(FakeWebSocket(delay=slow_delay))
+        else:
+            sockets.append(FakeWebSocket())
+    return sockets
+
+
+async def sequential(sockets, messages):
+    """The previous implementation: one await per socket, aborting on error."""
+    start = time.perf_counter()
+    errors = 0
+    for i in range(messages):
+        for websocket in sockets:
+            try:
+                await websocket.send_text(f"message {i}")
+            except Exception:
+                errors += 1
+    return time.perf_counter() - start, errors
+
+
+async def managed(sockets, messages, records, send_timeout):
+    from app.realtime import ConnectionManager, InProcessBus
+
+    manager = ConnectionManager(InProcessBus(), queue_size=messages + 1, send_timeout=send_timeout)
+    for websocket in sockets:
+        await manager.connect(websocket)
+    healthy = [ws for ws in sockets if not ws.dead and not ws.delay]
+
+    start = time.perf_counter()
+    for i in range(messages):
+        await manager.publish("attendance.clock_in", {"user_id": i % records, "date": "2026-01-01", "i": i})
+    publish_elapsed = time.perf_counter() - start
+    # Every record's latest event reaches every healthy client, older ones may be coalesced away
+    expected = min(messages, records)
+    while any(ws.received < expected or manager.connections[ws].queue.qsize() for ws in healthy):
+        await asyncio.sleep(0.001)
+    delivered_elapsed = time.perf_counter() - start
+    stats = manager.stats()
+
+    for websocket in list(manager.connections):
+        manager.disconnect(websocket)
+    await asyncio.sleep(0)
+    return publish_elapsed, delivered_elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--records", type=int, default=None, help="Distinct attendance records (default: --messages)")
+    parser.add_argument("--slow-every", type=int, default=1000, help="Every Nth socket is slow")
+    parser.add_argument("--dead-every", type=int, default=500, help="Every Nth socket is dead")
+    parser.add_argument("--slow-delay", type=float, default=0.05)
+    args = parser.parse_args()
+    configure()
+
+    sockets = make_sockets(args.sockets, args.slow_every, args.dead_every, args.slow_delay)
+    seq_elapsed, seq_errors = asyncio.run(sequential(sockets, args.messages))
+
+    sockets = make_sockets(args.sockets, args.slow_every, args.dead_every, args.slow_delay)
+    publish_elapsed, delivered_elapsed, stats = asyncio.run(
+        managed(sockets, args.messages, args.records or args.messages, send_timeout=1.0)
+    )
+
+    print(json.dumps({
+        "sockets": args.sockets,
+        "messages": args.messages,
+        "records": args.records or args.messages,
+        "sequential": {"elapsed_s": round(seq_elapsed, 3), "send_errors": seq_errors},
+        "managed": {
+            "publish_s": round(publish_elapsed, 4),
+            "all_healthy_delivered_s": round(delivered_elapsed, 3),
+            **stats,
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
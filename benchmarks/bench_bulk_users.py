@@ -0,0 +1,87 @@
+"""Provisioning N users: one ``/register`` call each vs. one ``/admin/users/bulk`` upload.
+
+Both paths hash through the password hashing pool, so the gap is the
+per-request lookup, commit and refresh that the bulk path replaces with
+set-based duplicate checks and chunked inserts. With real bcrypt costs the
+bulk time is dominated by hashing and scales with ``--workers``.
+
+    python -m benchmarks.bench_bulk_users --users 2000 --rounds 4
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+from benchmarks.common import configure, create_schema, seed_users
+
+
+async def provision(users, concurrency):
+    import httpx
+    from app.auth import create_access_token
+    from app.hashing import hasher
+    from app.run import app
+
+    admin = {"Authorization": f"Bearer {create_access_token({'sub': 'user0@bench.local'})}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def register(i):
+            async with semaphore:
+                r = await client.post("/register", data={
+                    "name": f"Reg {i}", "email": f"reg{i}@bench.local", "password": "pass123",
+                })
+                return r.status_code
+
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(register(i) for i in range(users)))
+        register_s = time.perf_counter() - start
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["name", "email", "password", "qr_code"])
+        for i in range(users):
+            writer.writerow([f"Bulk {i}", f"bulk{i}@bench.local", "pass123", f"BULK{i:06d}"])
+        start = time.perf_counter()
+        r = await client.post("/admin/users/bulk", content=buffer.getvalue(),
+                              headers={**admin, "Content-Type": "text/csv"})
+        bulk_s = time.perf_counter() - start
+        report = r.json()
+    hasher.shutdown()
+    return {
+        "users": users,
+        "register_s": round(register_s, 3),
+        "register_ok": statuses.count(200),
+        "bulk_s": round(bulk_s, 3),
+        "bulk_created": report["created"],
+        "speedup": round(register_s / bulk_s, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    configure(
+        BCRYPT_ROUNDS=args.rounds,
+        PASSWORD_HASH_WORKERS=args.workers,
+        PASSWORD_HASH_MAX_PENDING=args.users + 1,
+    )
+    with contextlib.redirect_stdout(sys.stderr):
+        create_schema()
+        seed_users(1, role="admin")
+        result = asyncio.run(provision(args.users, args.concurrency))
+    print(json.dumps({**result, "rounds": args.rounds, "workers": args.workers}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
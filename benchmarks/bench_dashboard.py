@@ -0,0 +1,78 @@
+"""Dashboard polls of ``/attendance/today`` and ``/Get-leave-lists``: uncached vs. cached vs. 304.
+
+``uncached`` clears the response cache before every poll (the old cost: query
+plus serialization), ``cached`` is a repeat poll answered from the cached
+bytes, and ``not_modified`` sends the ETag back and gets an empty 304. Both
+cached cases should run no SQL; ``sql_per_poll`` counts statements.
+
+    python -m benchmarks.bench_dashboard --users 1000 --polls 300
+"""
+import argparse
+import contextlib
+import json
+import statistics
+import sys
+import time
+
+from benchmarks.common import configure, create_schema, seed_users
+from benchmarks.bench_micro import seed_today
+
+
+def poll(client, url, headers, polls, before=None):
+    from sqlalchemy import event
+    from app.database import engine
+
+    statements = []
+    count = lambda *args: statements.append(1)
+    event.listen(engine, "before_cursor_execute", count)
+    samples = []
+    try:
+        for _ in range(polls):
+            if before is not None:
+                before()
+            start = time.perf_counter()
+            response = client.get(url, headers=headers)
+            samples.append((time.perf_counter() - start) * 1000)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "polls_per_sec": round(len(samples) / (sum(samples) / 1000), 1),
+        "sql_per_poll": round(len(statements) / polls, 2),
+        "status": response.status_code,
+        "bytes": len(response.content),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--polls", type=int, default=300)
+    args = parser.parse_args()
+
+    configure(BCRYPT_ROUNDS=4)
+    with contextlib.redirect_stdout(sys.stderr):
+        create_schema()
+        seed_users(args.users, role="admin")
+        seed_today(args.users)
+
+    from fastapi.testclient import TestClient
+    from app.auth import create_access_token
+    from app.response_cache import response_cache
+    from app.run import app
+
+    auth = {"Authorization": f"Bearer {create_access_token({'sub': 'user0@bench.local'})}"}
+    results = {"users": args.users, "polls": args.polls}
+    with contextlib.redirect_stdout(sys.stderr), TestClient(app) as client:
+        for name, url in (("today", "/attendance/today"), ("leave_list", "/Get-leave-lists?all=true&limit=500")):
+            etag = client.get(url, headers=auth).headers["etag"]
+            results[name] = {
+                "uncached": poll(client, url, auth, args.polls, before=response_cache.clear),
+                "cached": poll(client, url, auth, args.polls),
+                "not_modified": poll(client, url, {**auth, "If-None-Match": etag}, args.polls),
+            }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""File export throughput and memory: rows/sec and peak Python heap per format.
+
+Streams ``--users`` x ``--days`` sheet rows through each writer and discards
+the bytes, the way ``/admin/export/file`` hands them to the client. Peak heap
+should stay flat as ``--days`` grows. tracemalloc is on while timing, so
+rows/sec is only comparable between runs of this script.
+
+    python -m benchmarks.bench_export_file --users 1000 --days 365
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import configure, create_schema, seed_users
+from benchmarks.bench_hours import seed_attendance
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--formats", nargs="+", default=["csv", "xlsx", "parquet"])
+    args = parser.parse_args()
+
+    configure(BCRYPT_ROUNDS=4)
+    with contextlib.redirect_stdout(sys.stderr):
+        create_schema()
+        seed_users(args.users)
+        start, end = seed_attendance(args.users * args.days, args.users)
+
+    from app import crud, exports
+    from app.database import SessionLocal
+
+    results = {"users": args.users, "days": args.days, "rows": args.users * args.days}
+    for fmt in args.formats:
+        missing = exports.missing_dependency(fmt)
+        if missing:
+            results[fmt] = {"skipped": f"{missing} not installed"}
+            continue
+        writer = exports.FORMATS[fmt][0]
+        db = SessionLocal()
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        size = 0
+        try:
+            for chunk in writer(crud.iter_export_rows(db, start, end)):
+                size += len(chunk)
+        finally:
+            db.close()
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[fmt] = {
+            "elapsed_s": round(elapsed, 3),
+            "rows_per_sec": round(results["rows"] / elapsed, 1),
+            "bytes": size,
+            "peak_heap_mb": round(peak / 2**20, 2),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Payroll-hours benchmark: NumPy engine vs. a naive ORM loop.
+
+    python -m benchmarks.bench_hours --rows 1000000 --users 1000
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import configure, create_schema, seed_users
+
+
+def seed_attendance(rows, users):
+    from app.database import engine
+    from app import models
+
+    days = -(-rows // users)
+    first_day = date(2020, 1, 1)
+    rng = random.Random(42)
+    table = models.Attendance.__table__
+    batch = []
+    with engine.begin() as conn:
+        for d in range(days):
+            day = first_day + timedelta(days=d)
+            for user_id in range(1, users + 1):
+                if len(batch) >= 50000:
+                    conn.execute(table.insert(), batch)
+                    batch = []
+                start = 8 * 3600 + rng.randint(0, 7200)
+                end = start + rng.randint(6 * 3600, 10 * 3600)
+                batch.append({
+                    "user_id": user_id,
+                    "user_name": f"User {user_id - 1}",
+                    "date": day,
+                    "clock_in": _as_time(start),
+                    "clock_out": _as_time(end) if rng.random() > 0.02 else None,
+                })
+        if batch:
+            conn.execute(table.insert(), batch)
+    return first_day, first_day + timedelta(days=days - 1)
+
+
+def _as_time(seconds):
+    from datetime import time as dtime
+    return dtime(seconds // 3600, (seconds % 3600) // 60, seconds % 60)
+
+
+def naive_report(db, start, end):
+    """What the reports looked like before: ORM objects and Python arithmetic."""
+    from sqlalchemy.orm import joinedload
+    from app import models
+    from app.shifts import rule_for
+
+    totals = {}
+    query = (
+        db.query(models.Attendance)
+        .options(joinedload(models.Attendance.user))
+        .filter(models.Attendance.date.between(start, end))
+    )
+    for att in query:
+        rule = rule_for(att.user.role)
+        entry = totals.setdefault(att.user_id, {"days_present": 0, "worked": 0, "overtime": 0, "late": 0})
+        if att.clock_in is None:
+            continue
+        clock_in = att.clock_in.hour * 3600 + att.clock_in.minute * 60 + att.clock_in.second
+        entry["days_present"] += 1
+        if clock_in > rule.late_after_seconds:
+            entry["late"] += 1
+        if att.clock_out is not None:
+            clock_out = att.clock_out.hour * 3600 + att.clock_out.minute * 60 + att.clock_out.second
+            worked = max(clock_out - clock_in, 0)
+            entry["worked"] += worked
+            entry["overtime"] += max(worked - rule.standard_seconds, 0)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    configure()
+    create_schema()
+    seed_users(args.users)
+    seed_start = time.perf_counter()
+    start, end = seed_attendance(args.rows, args.users)
+    seed_elapsed = time.perf_counter() - seed_start
+
+    from app.database import SessionLocal
+    from app import reports
+
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        engine_result = reports.hours_report(db, start, end)
+        engine_elapsed = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        naive_result = naive_report(db, start, end)
+        naive_elapsed = time.perf_counter() - t0
+    finally:
+        db.close()
+
+    # Sanity check that both paths agree
+    mismatches = sum(
+        1 for row in engine_result["users"]
+        if naive_result[row["user_id"]]["days_present"] != row["days_present"]
+        or naive_result[row["user_id"]]["late"] != row["late_arrivals"]
+    )
+    print(json.dumps({
+        "rows": args.rows,
+        "users": args.users,
+        "seed_s": round(seed_elapsed, 2),
+        "numpy_engine_s": round(engine_elapsed, 3),
+        "naive_orm_loop_s": round(naive_elapsed, 3),
+        "speedup": round(naive_elapsed / engine_elapsed, 1) if engine_elapsed else None,
+        "mismatched_users": mismatches,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Login burst benchmark: bcrypt on the request threadpool vs. the hashing pool.
+
+Fires a burst of concurrent ``/token`` requests while another task keeps polling
+``/Get-leave-lists`` as an already logged-in user, and reports logins/sec plus
+the latency percentiles of the polling requests.
+
+    python -m benchmarks.bench_login --logins 200 --rounds 12
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import configure, create_schema, seed_users, summarize
+
+
+async def _burst(logins, concurrency):
+    import httpx
+    from app.run import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        resp = await client.post("/token", data={"username": "user0@bench.local", "password": "pass123"})
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+        done = asyncio.Event()
+        other_latencies = []
+
+        async def poll():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/Get-leave-lists", headers=headers)
+                other_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+
+        semaphore = asyncio.Semaphore(concurrency)
+        statuses = {}
+
+        async def login(i):
+            async with semaphore:
+                r = await client.post(
+                    "/token",
+                    data={"username": f"user{i % 50}@bench.local", "password": "pass123"},
+                )
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+        poller = asyncio.create_task(poll())
+        start = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await poller
+
+    return {
+        "logins": logins,
+        "elapsed_s": round(elapsed, 3),
+        "logins_per_sec": round(statuses.get(200, 0) / elapsed, 1),
+        "statuses": statuses,
+        "other_endpoints": summarize(other_latencies),
+    }
+
+
+def run_mode(args):
+    configure(
+        BCRYPT_ROUNDS=args.rounds,
+        PASSWORD_HASH_WORKERS=args.workers,
+        PASSWORD_HASH_MAX_PENDING=args.logins + 1,
+    )
+    create_schema()
+    seed_users(50)
+    result = asyncio.run(_burst(args.logins, args.concurrency))
+    from app.hashing import hasher
+    hasher.shutdown()
+    result["workers"] = args.workers
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Run a single mode in-process (0 = threadpool hashing)")
+    args = parser.parse_args()
+
+    if args.workers is not None:
+        run_mode(args)
+        return
+
+    # Each mode needs a fresh interpreter because settings are read at import time
+    results = {}
+    for label, workers in (("threadpool", 0), ("process_pool", os.cpu_count() or 2)):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_login",
+             "--logins", str(args.logins), "--concurrency", str(args.concurrency),
+             "--rounds", str(args.rounds), "--workers", str(workers)],
+            check=True, capture_output=True, text=True,
+        )
+        results[label] = json.loads(out.stdout.strip().splitlines()[-1])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
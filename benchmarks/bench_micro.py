@@ -0,0 +1,109 @@
+"""Micro-benchmarks for hot helpers: tokens, user lookups, crud queries and export assembly.
+
+Each case is repeated for at least ``--min-time`` seconds and reported as
+operations per second and microseconds per operation.
+
+    python -m benchmarks.bench_micro --users 1000
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import configure, create_schema, seed_users
+
+
+def measure(func, min_time):
+    func()  # Warm up caches and compiled statements
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        for _ in range(10):
+            func()
+        calls += 10
+        elapsed = time.perf_counter() - start
+    return {"ops_per_sec": round(calls / elapsed, 1), "us_per_op": round(elapsed / calls * 1e6, 2)}
+
+
+def seed_today(users):
+    from app.database import SessionLocal
+    from app import models
+
+    today = date.today()
+    db = SessionLocal()
+    try:
+        db.bulk_insert_mappings(models.Attendance, [
+            {"user_id": user_id, "user_name": f"User {user_id - 1}", "date": today,
+             "clock_in": datetime(2000, 1, 1, 9, user_id % 60).time()}
+            for user_id in range(1, users + 1) if user_id % 10
+        ])
+        leave_days = [
+            (user_id, today - timedelta(days=day))
+            for user_id in range(1, users + 1) for day in range(0, 20, 2) if user_id % 10 == 0 or day
+        ]
+        db.bulk_insert_mappings(models.LeaveRequest, [
+            {"user_id": user_id, "user_name": f"User {user_id - 1}", "date": day, "reason": "Bench", "status": "approved"}
+            for user_id, day in leave_days
+        ])
+        db.bulk_insert_mappings(models.LeaveCalendar, [{"user_id": user_id, "date": day} for user_id, day in leave_days])
+        db.commit()
+    finally:
+        db.close()
+    return today
+
+
+def run(users, min_time):
+    from app import auth, crud, google_sheets
+    from app.database import SessionLocal
+    from app.user_index import user_index
+
+    today = seed_today(users)
+    email = f"user{users // 2}@bench.local"
+    token = auth.create_access_token({"sub": email})
+    db = SessionLocal()
+    results = {}
+    try:
+        results["create_access_token"] = measure(lambda: auth.create_access_token({"sub": email}), min_time)
+        results["decode_token"] = measure(lambda: auth.decode_token(token), min_time)
+        results["crud_get_user_by_email"] = measure(lambda: crud.get_user_by_email(db, email), min_time)
+        results["user_index_by_email"] = measure(lambda: user_index.by_email(email), min_time)
+        results["user_index_by_qr"] = measure(lambda: crud.get_user_by_qr(db, f"QR{users // 2:06d}"), min_time)
+        results["crud_leave_page"] = measure(
+            lambda: db.execute(crud.leave_requests_page_query(users // 2, None, None, None, 100)).all(), min_time
+        )
+        results["leave_calendar_30_days"] = measure(
+            lambda: crud.get_leave_calendar(db, today - timedelta(days=29), today), min_time
+        )
+        results["export_rows"] = measure(lambda: crud.get_export_rows(db, today), min_time)
+
+        export_data, export_keys = crud.get_export_rows(db, today)
+
+        def assemble_and_diff():
+            # Unchanged data: measures row assembly and the snapshot diff only
+            google_sheets.export_to_sheet(export_data, "bench", "attendance", keys=export_keys)
+
+        results["sheet_export_unchanged"] = measure(assemble_and_diff, min_time)
+    finally:
+        db.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--min-time", type=float, default=0.5)
+    args = parser.parse_args()
+
+    configure(GOOGLE_SHEETS_BACKEND="fake", BCRYPT_ROUNDS=4)
+    with contextlib.redirect_stdout(sys.stderr):
+        create_schema()
+        seed_users(args.users)
+        results = run(args.users, args.min_time)
+    print(json.dumps({"users": args.users, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Clock-in burst: one commit per punch vs. the write-behind journal.
+
+Every seeded user clocks in concurrently through ``/attendance/clock-in``.
+Reports acknowledged punches/sec, request latency, the number of database
+commits, and for write-behind the journal fsyncs and the time until every
+punch is in the database.
+
+    python -m benchmarks.bench_punches --users 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import configure, create_schema, lifespan, seed_users, summarize
+
+
+async def burst(users, concurrency):
+    import httpx
+    from sqlalchemy import event, func, select
+    from app.auth import create_access_token
+    from app.database import SessionLocal, engine
+    from app.punch_buffer import punch_buffer
+    from app.run import app
+    from app import models
+
+    commits = 0
+
+    def count_commit(conn):
+        nonlocal commits
+        commits += 1
+
+    headers = [
+        {"Authorization": f"Bearer {create_access_token({'sub': f'user{i}@bench.local'})}"} for i in range(users)
+    ]
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for i in range(users):
+                # Warm the verified-token cache so only the punch itself is measured
+                await client.get(f"/attendance/punches/warmup{i}", headers=headers[i])
+
+            event.listen(engine, "commit", count_commit)
+            semaphore = asyncio.Semaphore(concurrency)
+            latencies, statuses = [], {}
+
+            async def punch(i):
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post("/attendance/clock-in", headers=headers[i])
+                    latencies.append(time.perf_counter() - start)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(punch(i) for i in range(users)))
+            acked = time.perf_counter() - start
+            while punch_buffer.running and punch_buffer.stats()["pending"]:
+                await asyncio.sleep(0.001)
+            durable = time.perf_counter() - start
+            event.remove(engine, "commit", count_commit)
+            fsyncs = punch_buffer.stats()["fsyncs"]
+
+    db = SessionLocal()
+    try:
+        rows = db.execute(select(func.count(models.Attendance.id))).scalar()
+    finally:
+        db.close()
+    return {
+        "requests": summarize(latencies, acked),
+        "statuses": statuses,
+        "acked_punches_per_sec": round(users / acked, 1),
+        "all_in_db_s": round(durable, 3),
+        "db_commits": commits,
+        "journal_fsyncs": fsyncs,
+        "attendance_rows": rows,
+    }
+
+
+def run_mode(args):
+    configure(
+        BCRYPT_ROUNDS=4,
+        PUNCH_WRITE_BEHIND="true" if args.mode == "write_behind" else "false",
+        PUNCH_JOURNAL_DIR=tempfile.mkdtemp(prefix="punch-journal-"),
+        GOOGLE_SHEETS_BACKEND="fake",
+    )
+    with contextlib.redirect_stdout(sys.stderr):
+        create_schema()
+        seed_users(args.users)
+        result = asyncio.run(burst(args.users, args.concurrency))
+    print(json.dumps({"mode": args.mode, **result}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--mode", choices=["direct", "write_behind"], help="Run a single mode in-process")
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    # Fresh interpreter per mode: settings are read at import time
+    results = {}
+    for mode in ("direct", "write_behind"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_punches", "--users", str(args.users),
+             "--concurrency", str(args.concurrency), "--mode", mode],
+            check=True, capture_output=True, text=True, env=os.environ.copy(),
+        )
+        results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Cost of rate limiting: bucket checks per second and rejected vs. accepted ``/token`` latency.
+
+``store_*`` time ``take()`` on each backend over ``--keys`` distinct keys,
+with ``--threads`` threads sharing the in-process store. ``login_*`` post to
+``/token`` in-process: accepted logins pay the user lookup and bcrypt, a
+login over the account limit is answered before either.
+
+    python -m benchmarks.bench_rate_limit --checks 200000
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.common import configure, create_schema, seed_users
+
+
+def store_rate(store, checks, keys, threads):
+    per_thread = checks // threads
+
+    def work(offset):
+        for i in range(per_thread):
+            store.take(f"login_ip:10.0.{(offset + i) % keys // 256}.{(offset + i) % 256}", 1000, 1000 / 60)
+
+    workers = [threading.Thread(target=work, args=(n * 7919,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return {"checks_per_sec": round(per_thread * threads / elapsed, 1), "us_per_check": round(elapsed / (per_thread * threads) * 1e6, 2)}
+
+
+def login_latency(logins):
+    from fastapi.testclient import TestClient
+    from app.run import app
+
+    def timed(attempts):
+        samples, statuses = [], set()
+        for username, password in attempts:
+            start = time.perf_counter()
+            statuses.add(client.post("/token", data={"username": username, "password": password}).status_code)
+            samples.append((time.perf_counter() - start) * 1000)
+        return {"median_ms": round(statistics.median(samples), 3), "statuses": sorted(statuses)}
+
+    with TestClient(app) as client:
+        # One login per account, so none of them reaches the account limit
+        accepted = timed([(f"user{i}@bench.local", "pass123") for i in range(logins)])
+        for _ in range(5):
+            client.post("/token", data={"username": "guessed@bench.local", "password": "wrong"})
+        rejected = timed([("guessed@bench.local", "wrong")] * logins)
+    return {"login_accepted": accepted, "login_rejected": rejected}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checks", type=int, default=200000)
+    parser.add_argument("--keys", type=int, default=10000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+
+    configure(BCRYPT_ROUNDS=args.rounds, PASSWORD_HASH_WORKERS=1)
+    # configure() turns limits off for the load tests; this one measures them
+    os.environ.update(RATE_LIMIT_ENABLED="true", RATE_LIMIT_LOGIN_IP="", RATE_LIMIT_LOGIN_ACCOUNT="5/3600")
+    from app.rate_limit import InProcessStore, SQLiteStore
+
+    results = {"checks": args.checks, "keys": args.keys, "threads": args.threads}
+    results["store_memory"] = store_rate(InProcessStore(), args.checks, args.keys, 1)
+    results["store_memory_threads"] = store_rate(InProcessStore(), args.checks, args.keys, args.threads)
+    sqlite_path = os.path.join(tempfile.mkdtemp(prefix="attendance-bench-"), "rate_limits.db")
+    results["store_sqlite"] = store_rate(SQLiteStore(sqlite_path, 60), args.checks // 20, args.keys, 1)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        create_schema()
+        seed_users(args.logins)
+        results.update(login_latency(args.logins))
+    print(json.dumps({**results, "rounds": args.rounds}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Shift-change load test: the burst of traffic when a shift starts.
+
+Boots the app in-process against a throwaway SQLite file (or ``--db-url``, an
+empty MySQL-compatible database), seeds users and leave history, then runs
+the phases one after another:
+
+1. every user logs in (``/token``)
+2. every user clocks in
+3. every user loads their leave list
+4. every user opens a ``/ws`` subscription
+5. one more punch is broadcast to all subscribers
+
+Throughput and p50/p95/p99 latency are reported per phase as JSON.
+
+    python -m benchmarks.bench_shift_change --users 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import configure, create_schema, lifespan, seed_users, summarize
+
+
+class AsgiWebSocket:
+    """Minimal in-process WebSocket client speaking ASGI to the app."""
+
+    def __init__(self, app, path="/ws"):
+        self.app = app
+        self.path = path
+        self.incoming = asyncio.Queue()
+        self.accepted = asyncio.Event()
+        self.events = []
+        self.task = None
+
+    async def connect(self):
+        scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws",
+            "path": self.path, "raw_path": self.path.encode(), "query_string": b"",
+            "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 0), "server": ("bench", 80),
+            "subprotocols": [], "state": {},
+        }
+        self.task = asyncio.create_task(self.app(scope, self.incoming.get, self._send))
+        await self.incoming.put({"type": "websocket.connect"})
+        await self.accepted.wait()
+
+    async def _send(self, message):
+        if message["type"] == "websocket.accept":
+            self.accepted.set()
+        elif message["type"] == "websocket.send":
+            self.events.append(json.loads(message["text"]))
+
+    async def close(self):
+        await self.incoming.put({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+
+def seed_leave(users, per_user):
+    from app.database import SessionLocal
+    from app import models
+
+    first_day = date.today() - timedelta(days=per_user * 2)
+    db = SessionLocal()
+    try:
+        db.bulk_insert_mappings(models.LeaveRequest, [
+            {"user_id": user_id, "user_name": f"User {user_id - 1}",
+             "date": first_day + timedelta(days=i * 2), "reason": "Bench"}
+            for user_id in range(1, users + 1) for i in range(per_user)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def timed_phase(count, concurrency, call):
+    """Run ``call(i)`` for i in range(count) with bounded concurrency."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            status = await call(i)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    elapsed = time.perf_counter() - start
+    return {**summarize(latencies, elapsed), "statuses": statuses}
+
+
+async def shift_change(users, concurrency):
+    import httpx
+    from app.run import app
+
+    results = {}
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            tokens = {}
+
+            async def login(i):
+                response = await client.post(
+                    "/token", data={"username": f"user{i}@bench.local", "password": "pass123"}
+                )
+                if response.status_code == 200:
+                    tokens[i] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+                return response.status_code
+
+            async def clock_in(i):
+                return (await client.post("/attendance/clock-in", headers=tokens[i])).status_code
+
+            async def leave_list(i):
+                return (await client.get("/Get-leave-lists", headers=tokens[i])).status_code
+
+            results["login"] = await timed_phase(users, concurrency, login)
+            results["clock_in"] = await timed_phase(users, concurrency, clock_in)
+            results["leave_list"] = await timed_phase(users, concurrency, leave_list)
+
+            sockets = [AsgiWebSocket(app) for _ in range(users)]
+
+            async def subscribe(i):
+                await sockets[i].connect()
+                return 101
+
+            results["ws_subscribe"] = await timed_phase(users, concurrency, subscribe)
+
+            start = time.perf_counter()
+            status = (await client.post("/attendance/clock-out", headers=tokens[0])).status_code
+            while not all(any(e["type"] == "attendance.clock_out" for e in s.events) for s in sockets):
+                await asyncio.sleep(0.001)
+            results["ws_fanout"] = {
+                "subscribers": users,
+                "punch_status": status,
+                "all_delivered_ms": round((time.perf_counter() - start) * 1000, 3),
+            }
+            for socket in sockets:
+                await socket.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--leave-per-user", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost for the seeded passwords")
+    parser.add_argument("--db-url", help="Empty database to use instead of a temporary SQLite file")
+    args = parser.parse_args()
+
+    configure(
+        BCRYPT_ROUNDS=args.rounds,
+        PASSWORD_HASH_MAX_PENDING=args.users + 1,
+        GOOGLE_SHEETS_BACKEND="fake",
+    )
+    if args.db_url:
+        os.environ["DB_URL"] = args.db_url
+
+    # The app prints during startup; keep stdout for the JSON result
+    with contextlib.redirect_stdout(sys.stderr):
+        create_schema()
+        seed_users(args.users)
+        seed_leave(args.users, args.leave_per_user)
+        results = asyncio.run(shift_change(args.users, args.concurrency))
+
+    print(json.dumps({
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "database": os.environ["DB_URL"].split("://")[0],
+        **results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Startup-time benchmark: import, startup events and the first request.
+
+Each sample is a fresh interpreter, so module import costs are real. The first
+run migrates an empty database; the remaining runs restart against the same,
+already-current schema, like a rolling deploy.
+
+    python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import configure
+
+HEAVY_MODULES = ("gspread", "google.oauth2", "googleapiclient", "numpy")
+
+
+def child():
+    start = time.perf_counter()
+    from app.run import app
+    imported = time.perf_counter()
+
+    from fastapi.testclient import TestClient
+    client = TestClient(app)
+    client_ready = time.perf_counter()
+    client.__enter__()  # Runs the startup handlers
+    started = time.perf_counter()
+    response = client.get("/")
+    first_request = time.perf_counter()
+    client.__exit__(None, None, None)
+
+    print(json.dumps({
+        "import_s": imported - start,
+        "startup_s": started - client_ready,
+        "first_request_s": first_request - started,
+        "total_s": first_request - start - (client_ready - imported),
+        "status": response.status_code,
+        "heavy_modules": [name for name in HEAVY_MODULES if name in sys.modules],
+    }))
+
+
+def run_once():
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+        check=True, capture_output=True, text=True, env=os.environ.copy(),
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    configure(GOOGLE_SHEETS_BACKEND="fake")
+    cold = run_once()
+    warm = [run_once() for _ in range(max(args.runs - 1, 1))]
+
+    phases = ("import", "startup", "first_request", "total")
+
+    def ms(value):
+        return round(value * 1000, 1)
+
+    print(json.dumps({
+        "python": sys.version.split()[0],
+        "cold_first_boot_ms": {phase: ms(cold[f"{phase}_s"]) for phase in phases},
+        "warm_restart_median_ms": {
+            phase: ms(statistics.median(sample[f"{phase}_s"] for sample in warm)) for phase in phases
+        },
+        "heavy_modules_loaded": sorted({name for sample in [cold, *warm] for name in sample["heavy_modules"]}),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
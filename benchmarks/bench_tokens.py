@@ -0,0 +1,61 @@
+"""Tokens/sec for issuing and verifying access tokens: python-jose vs. app.auth.
+
+``jose_*`` is what login and every authenticated request did before: a full
+``jose.jwt`` encode/decode with the secret re-encoded each call. ``decode_cold``
+verifies distinct tokens so every call misses the verified-token LRU;
+``decode_warm`` repeats tokens that are already in it.
+
+    python -m benchmarks.bench_tokens --tokens 20000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import configure
+
+
+def rate(func, items):
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    elapsed = time.perf_counter() - start
+    return {"tokens_per_sec": round(len(items) / elapsed, 1), "us_per_token": round(elapsed / len(items) * 1e6, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=2, help="Keys in the keyring (the first signs)")
+    args = parser.parse_args()
+
+    configure(
+        JWT_KEYS=",".join(f"k{i}:bench-secret-{i}" for i in range(args.keys)),
+        VERIFIED_TOKEN_CACHE_SIZE=args.tokens,
+    )
+    from jose import jwt
+    from app import auth
+    from config.settings import ALGORITHM, SECRET_KEY
+
+    subjects = [{"sub": f"user{i}@bench.local"} for i in range(args.tokens)]
+
+    def jose_encode(data):
+        to_encode = {**data, "exp": datetime.utcnow() + timedelta(minutes=60)}
+        return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+    results = {"tokens": args.tokens, "keys": args.keys}
+    results["jose_encode"] = rate(jose_encode, subjects)
+    jose_tokens = [jose_encode(data) for data in subjects]
+    results["jose_decode"] = rate(lambda token: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]), jose_tokens)
+
+    results["create"] = rate(auth.create_access_token, subjects)
+    tokens = [auth.create_access_token(data) for data in subjects]
+    auth.verified_tokens.clear()
+    results["decode_cold"] = rate(auth.decode_token, tokens)
+    results["decode_warm"] = rate(auth.decode_token, tokens)
+    results["verified_tokens"] = auth.verified_tokens.stats()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
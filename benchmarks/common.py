@@ -0,0 +1,85 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks run the FastAPI app in-process against a throwaway SQLite file, so
+``configure()`` must be called before anything from ``app`` is imported.
+"""
+import asyncio
+import os
+import tempfile
+from contextlib import asynccontextmanager
+
+
+def configure(**env):
+    """Point the app at a fresh SQLite database and apply setting overrides."""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="attendance-bench-"), "bench.db")
+    os.environ["DB_URL"] = f"sqlite:///{db_path}"
+    # Load tests come from one client address; bench_rate_limit turns limits back on
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    for key, value in env.items():
+        os.environ[key] = str(value)
+    return db_path
+
+
+def create_schema():
+    from app.database import engine
+    from app import migrations
+    migrations.migrate(engine)
+
+
+def seed_users(count, password="pass123", role="user"):
+    """Insert ``count`` users sharing one password hash; returns their emails."""
+    from app.auth import get_password_hash
+    from app.database import SessionLocal
+    from app import models
+
+    hashed = get_password_hash(password)
+    emails = [f"user{i}@bench.local" for i in range(count)]
+    db = SessionLocal()
+    try:
+        db.bulk_insert_mappings(models.User, [
+            {"name": f"User {i}", "email": email, "password": hashed, "qr_code": f"QR{i:06d}", "role": role}
+            for i, email in enumerate(emails)
+        ])
+        db.commit()
+    finally:
+        db.close()
+    return emails
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples, elapsed=None):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    result = {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+    }
+    if elapsed:
+        result["per_sec"] = round(len(samples) / elapsed, 1)
+    return result
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Run the app's startup/shutdown handlers; ``httpx.ASGITransport`` does not."""
+    incoming, outgoing = asyncio.Queue(), asyncio.Queue()
+    task = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}},
+                                   incoming.get, outgoing.put))
+    await incoming.put({"type": "lifespan.startup"})
+    message = await outgoing.get()
+    if message["type"] != "lifespan.startup.complete":
+        raise RuntimeError(f"App startup failed: {message.get('message')}")
+    try:
+        yield app
+    finally:
+        await incoming.put({"type": "lifespan.shutdown"})
+        await outgoing.get()
+        await task
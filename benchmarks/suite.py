@@ -0,0 +1,137 @@
+"""Run the benchmark suite, save the results as JSON and compare with a baseline.
+
+Every benchmark runs in its own interpreter (settings are read at import
+time) and prints one JSON document. The combined file records the commit it
+was measured on, so results from two commits can be compared:
+
+    python -m benchmarks.suite --output bench-main.json
+    python -m benchmarks.suite --output bench-pr.json --compare bench-main.json --tolerance 0.15
+
+With ``--compare`` the exit status is 1 when a metric is worse than the
+baseline by more than the tolerance. Keys ending in ``_ms`` or ``_s`` are
+lower-is-better, keys containing ``per_sec`` higher-is-better; counts,
+settings and seeding times are not compared.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+# name -> module and arguments sized to finish in a few seconds each
+SUITE = {
+    "shift_change": ("benchmarks.bench_shift_change", ["--users", "100", "--concurrency", "50"]),
+    "micro": ("benchmarks.bench_micro", ["--users", "1000"]),
+    "startup": ("benchmarks.bench_startup", ["--runs", "3"]),
+    "hours": ("benchmarks.bench_hours", ["--rows", "20000", "--users", "200"]),
+    "broadcast": ("benchmarks.bench_broadcast", ["--sockets", "2000", "--messages", "10"]),
+    "login": ("benchmarks.bench_login", ["--logins", "50", "--concurrency", "25", "--rounds", "8"]),
+    "bulk_users": ("benchmarks.bench_bulk_users", ["--users", "500", "--rounds", "4"]),
+    "tokens": ("benchmarks.bench_tokens", ["--tokens", "5000"]),
+    "rate_limit": ("benchmarks.bench_rate_limit", ["--checks", "50000", "--logins", "10", "--rounds", "8"]),
+    "dashboard": ("benchmarks.bench_dashboard", ["--users", "500", "--polls", "100"]),
+    "punches": ("benchmarks.bench_punches", ["--users", "200", "--concurrency", "50"]),
+    "export_file": ("benchmarks.bench_export_file", ["--users", "200", "--days", "20"]),
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(module, args):
+    completed = subprocess.run([sys.executable, "-m", module, *args], capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{module} failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout)
+
+
+def flatten(data, prefix=""):
+    """{"a": {"p95_ms": 1}} -> {"a.p95_ms": 1}, numbers only."""
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def direction(metric):
+    name = metric.rsplit(".", 1)[-1]
+    if name.startswith("seed"):
+        return 0  # Fixture setup, not the code under test
+    if "per_sec" in name:
+        return 1  # Higher is better
+    if name.endswith("_ms") or name.endswith("_s"):
+        return -1
+    return 0
+
+
+def compare(current, baseline, tolerance):
+    """Return (regressions, report lines) for metrics present in both runs."""
+    now, before = flatten(current["results"]), flatten(baseline["results"])
+    regressions, lines = [], []
+    for metric in sorted(now.keys() & before.keys()):
+        sign = direction(metric)
+        if sign == 0 or not before[metric]:
+            continue
+        change = (now[metric] - before[metric]) / before[metric]
+        worse = -change * sign
+        flag = ""
+        if worse > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(metric)
+        lines.append(f"{metric:60} {before[metric]:>12g} -> {now[metric]:>12g} ({change:+.1%}){flag}")
+    return regressions, lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="Write the combined results to this file")
+    parser.add_argument("--only", nargs="+", choices=sorted(SUITE), help="Run a subset")
+    parser.add_argument("--compare", help="Baseline results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or SUITE:
+        module, bench_args = SUITE[name]
+        print(f"running {name} ...", file=sys.stderr)
+        results[name] = run_benchmark(module, bench_args)
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions, lines = compare(report, baseline, args.tolerance)
+        print(f"\nCompared with {baseline.get('commit')} (tolerance {args.tolerance:.0%}):", file=sys.stderr)
+        for line in lines:
+            print(line, file=sys.stderr)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
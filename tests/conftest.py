@@ -0,0 +1,53 @@
+"""Tests run the app in-process against a throwaway SQLite file.
+
+Settings are read at import time, so the environment is set up here, before
+anything from ``app`` is imported.
+"""
+import itertools
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="attendance-tests-")
+os.environ.update(
+    DB_URL=f"sqlite:///{os.path.join(_tmp, 'test.db')}",
+    BCRYPT_ROUNDS="4",
+    PASSWORD_HASH_WORKERS="0",
+    RATE_LIMIT_ENABLED="false",
+    GOOGLE_SHEETS_BACKEND="fake",
+    SPREADSHEET_ID="test-sheet",
+    PUNCH_JOURNAL_DIR=os.path.join(_tmp, "punch_journal"),
+    ATTENDANCE_ARCHIVE_DIR=os.path.join(_tmp, "archive"),
+    SHIFT_RULES='{"evening": {"start": "14:00"}}',
+)
+
+import pytest
+
+_emails = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.run import app
+
+    with TestClient(app) as client:  # Startup applies the migrations
+        yield client
+
+
+@pytest.fixture
+def make_user(client):
+    """Create a user and return ``(user_id, auth headers)``."""
+    from app import models
+    from app.auth import create_access_token
+    from app.database import SessionLocal
+
+    def make(role="user", qr_code="0000"):
+        email = f"user{next(_emails)}@test.local"
+        with SessionLocal() as db:
+            user = models.User(name=email.split("@")[0], email=email, password="-", qr_code=qr_code, role=role)
+            db.add(user)
+            db.commit()
+            user_id = user.id
+        return user_id, {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+    return make
@@ -0,0 +1,49 @@
+import itertools
+from datetime import date, datetime
+
+_keys = itertools.count()
+
+
+def upload(client, headers, *scans):
+    body = [
+        {"qr_code": qr_code, "timestamp": timestamp.isoformat(), "idempotency_key": f"archive-test-{next(_keys)}"}
+        for qr_code, timestamp in scans
+    ]
+    response = client.post("/attendance/scans/batch", headers=headers, json=body)
+    assert response.status_code == 200
+    return [result["status"] for result in response.json()]
+
+
+def by_user(client, headers, user_id):
+    report = client.get("/reports/summary", headers=headers, params={"month": "2026-01", "per_user": "true"}).json()
+    return next(row for row in report["by_user"] if row["user_id"] == user_id)
+
+
+def test_late_upload_for_an_archived_month_counts_each_day_once(client, make_user):
+    from app import archive, summaries
+    from app.database import SessionLocal
+
+    _, admin = make_user(role="admin")
+    done_id, _ = make_user(qr_code="archive-done")
+    open_id, _ = make_user(qr_code="archive-open")
+    assert upload(client, admin,
+                  ("archive-done", datetime(2026, 1, 5, 9, 0)), ("archive-done", datetime(2026, 1, 5, 17, 0)),
+                  ("archive-open", datetime(2026, 1, 5, 9, 0))) == ["clock_in", "clock_out", "clock_in"]
+    with SessionLocal() as db:
+        assert archive.archive_month(db, date(2026, 1, 1)) >= 2
+
+    # Kiosk buffered these while offline: repeats of the archived day, and the missing clock-out
+    assert upload(client, admin,
+                  ("archive-done", datetime(2026, 1, 5, 9, 1)), ("archive-done", datetime(2026, 1, 5, 18, 0)),
+                  ("archive-open", datetime(2026, 1, 5, 17, 30))) == ["ignored", "ignored", "clock_out"]
+
+    hours = client.get("/reports/hours", headers=admin, params={"from": "2026-01-01", "to": "2026-01-31"}).json()
+    totals = {row["user_id"]: row for row in hours["users"]}
+    assert (totals[done_id]["days_present"], totals[done_id]["worked_hours"]) == (1, 8.0)
+    assert (totals[open_id]["days_present"], totals[open_id]["worked_hours"]) == (1, 8.5)
+
+    live = [by_user(client, admin, user_id) for user_id in (done_id, open_id)]
+    assert [row["days_present"] for row in live] == [1, 1]
+    with SessionLocal() as db:
+        summaries.rebuild(db, date(2026, 1, 1), date(2026, 1, 31))
+    assert [by_user(client, admin, user_id) for user_id in (done_id, open_id)] == live
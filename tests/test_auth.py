@@ -0,0 +1,40 @@
+from sqlalchemy import update
+
+
+def change_in_other_worker(user_id, **values):
+    """Write the way another worker does: Core statements, no events in this process."""
+    from app import models
+    from app.database import engine
+
+    versions = models.DataVersion.__table__
+    with engine.begin() as conn:
+        conn.execute(update(models.User).where(models.User.id == user_id).values(**values))
+        conn.execute(update(versions).where(versions.c.name == "users").values(version=versions.c.version + 1))
+
+
+def test_demotion_by_another_worker_applies_after_the_index_check(client, make_user, monkeypatch):
+    from app.user_index import user_index
+
+    user_id, headers = make_user(role="admin")
+    assert client.get("/admin/cache-stats", headers=headers).status_code == 200
+
+    change_in_other_worker(user_id, role="user")
+    monkeypatch.setattr(user_index, "check_interval", 0)
+
+    assert client.get("/admin/cache-stats", headers=headers).status_code == 403
+
+
+def test_deleted_user_is_rejected(client, make_user, monkeypatch):
+    from app import models
+    from app.database import SessionLocal
+    from app.user_index import user_index
+
+    user_id, headers = make_user()
+    assert client.get("/attendance/today", headers=headers).status_code == 200
+
+    with SessionLocal() as db:
+        db.delete(db.get(models.User, user_id))
+        db.commit()
+    monkeypatch.setattr(user_index, "check_interval", 0)
+
+    assert client.get("/attendance/today", headers=headers).status_code == 401
@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from sqlalchemy import func, select
+
+
+def test_parallel_clock_ins_record_one_punch(client, make_user):
+    from app import models
+    from app.database import SessionLocal
+
+    user_id, headers = make_user()
+    with ThreadPoolExecutor(8) as pool:
+        statuses = list(pool.map(lambda _: client.post("/attendance/clock-in", headers=headers).status_code, range(8)))
+
+    assert statuses.count(200) == 1
+    assert statuses.count(400) == 7
+    with SessionLocal() as db:
+        rows = db.execute(select(func.count()).select_from(models.Attendance).where(
+            models.Attendance.user_id == user_id, models.Attendance.date == date.today()
+        )).scalar()
+    assert rows == 1
+    assert days_present(user_id) == 1
+
+
+def days_present(user_id):
+    from app import models
+    from app.database import SessionLocal
+
+    summary = models.AttendanceMonthlySummary
+    with SessionLocal() as db:
+        return db.execute(select(summary.days_present).where(
+            summary.user_id == user_id, summary.month == date.today().replace(day=1)
+        )).scalar()
+
+
+def test_repeat_clock_in_within_the_same_second_is_rejected(client, make_user):
+    user_id, headers = make_user()
+    first = client.post("/attendance/clock-in", headers=headers)
+    second = client.post("/attendance/clock-in", headers=headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 400
+    assert second.json()["detail"] == "Already clocked in today"
+    assert days_present(user_id) == 1
+
+
+def test_concurrent_scan_batches_count_one_clock_in(client, make_user):
+    user_id, _ = make_user(qr_code="QR-CONCURRENT")
+    _, kiosk = make_user(role="kiosk")
+    timestamp = datetime.now().replace(microsecond=0).isoformat()
+
+    def upload(n):
+        scans = [{"idempotency_key": f"concurrent-{n}", "qr_code": "QR-CONCURRENT", "timestamp": timestamp}]
+        return client.post("/attendance/scans/batch", headers=kiosk, json=scans).json()[0]["status"]
+
+    with ThreadPoolExecutor(4) as pool:
+        statuses = list(pool.map(upload, range(4)))
+
+    assert statuses.count("clock_in") == 1
+    assert days_present(user_id) == 1
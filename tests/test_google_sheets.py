@@ -0,0 +1,47 @@
+from datetime import date, time
+
+
+def test_warm_export_sends_only_the_changed_ranges_in_one_batch_update(monkeypatch):
+    from app import google_sheets
+
+    rows = [
+        ["Ann", "user", date(2026, 1, 5), time(8, 0), None, "Present"],
+        ["Bob", "user", date(2026, 1, 5), time(8, 5), None, "Present"],
+        ["Cy", "user", date(2026, 1, 5), None, None, "Absent"],
+    ]
+    assert google_sheets.export_to_sheet(rows, "test-sheet", "warm-diff")
+    sheet = google_sheets._worksheets[("test-sheet", "warm-diff")]
+    calls = sheet.spreadsheet.client.calls
+    before = calls.copy()
+    sent = []
+    original = sheet.batch_update
+    monkeypatch.setattr(sheet, "batch_update", lambda data, **kwargs: (sent.append(data), original(data, **kwargs)))
+
+    rows[1][4] = time(17, 0)  # Bob clocks out
+    rows[2][3:] = [time(9, 0), None, "Present"]  # Cy arrives late
+    assert google_sheets.export_to_sheet(rows, "test-sheet", "warm-diff")
+
+    assert calls - before == {"batch_update": 1}
+    assert sent == [[
+        {"range": "E3:E3", "values": [["17:00:00"]]},
+        {"range": "D4:D4", "values": [["09:00:00"]]},
+        {"range": "F4:F4", "values": [["Present"]]},
+    ]]
+    assert sheet.get_all_values()[1:] == [
+        ["Ann", "user", "2026-01-05", "08:00:00", "", "Present"],
+        ["Bob", "user", "2026-01-05", "08:05:00", "17:00:00", "Present"],
+        ["Cy", "user", "2026-01-05", "09:00:00", "", "Present"],
+    ]
+
+
+def test_unchanged_export_makes_no_calls():
+    from app import google_sheets
+
+    rows = [["Ann", "user", date(2026, 1, 5), time(8, 0), None, "Present"]]
+    assert google_sheets.export_to_sheet(rows, "test-sheet", "unchanged")
+    calls = google_sheets._worksheets[("test-sheet", "unchanged")].spreadsheet.client.calls
+    before = calls.copy()
+
+    assert google_sheets.export_to_sheet(rows, "test-sheet", "unchanged")
+
+    assert calls == before
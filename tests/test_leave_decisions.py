@@ -0,0 +1,55 @@
+def create_leave(client, headers, day):
+    response = client.post("/create-leave", headers=headers, data={"date": day, "reason": "test"})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def decide(client, headers, ids, status):
+    response = client.post("/admin/leave/decisions", headers=headers, json={"ids": ids, "status": status})
+    assert response.status_code == 200
+    return response.json()
+
+
+def on_leave(client, headers, user_id):
+    calendar = client.get("/leave/calendar", headers=headers, params={"from": "2026-04-01", "to": "2026-04-30"}).json()
+    return sorted(day for day, user_ids in calendar.items() if user_id in user_ids)
+
+
+def leave_days(client, headers, user_id):
+    report = client.get("/reports/summary", headers=headers, params={"month": "2026-04", "per_user": "true"}).json()
+    return next((row["leave_days"] for row in report["by_user"] if row["user_id"] == user_id), 0)
+
+
+def test_decisions_keep_calendar_and_summaries_in_step(client, make_user):
+    from datetime import date
+    from app import summaries
+    from app.database import SessionLocal
+
+    _, admin = make_user(role="admin")
+    user_id, headers = make_user()
+    first, second = create_leave(client, headers, "2026-04-06"), create_leave(client, headers, "2026-04-06")
+    other_day = create_leave(client, headers, "2026-04-07")
+
+    result = decide(client, admin, [first, second, other_day, first, 999999], "approved")
+    assert (sorted(result["updated"]), result["unchanged"], result["not_found"]) == (
+        sorted([first, second, other_day]), [], [999999])
+    assert on_leave(client, admin, user_id) == ["2026-04-06", "2026-04-07"]
+    assert leave_days(client, admin, user_id) == 2
+    approved = client.get("/Get-leave-lists", headers=headers, params={"status": "approved"}).json()
+    assert sorted(row["id"] for row in approved) == sorted([first, second, other_day])
+
+    # The other approved request still covers the 6th
+    assert decide(client, admin, [first], "rejected")["updated"] == [first]
+    assert on_leave(client, admin, user_id) == ["2026-04-06", "2026-04-07"]
+    assert leave_days(client, admin, user_id) == 2
+    assert decide(client, admin, [first], "rejected")["unchanged"] == [first]
+
+    assert decide(client, admin, [second], "rejected")["updated"] == [second]
+    assert on_leave(client, admin, user_id) == ["2026-04-07"]
+    assert leave_days(client, admin, user_id) == 1
+    assert [row["id"] for row in client.get("/Get-leave-lists", headers=headers,
+                                            params={"status": "rejected"}).json()] == [first, second]
+
+    with SessionLocal() as db:
+        summaries.rebuild(db, date(2026, 4, 1), date(2026, 4, 30))
+    assert leave_days(client, admin, user_id) == 1
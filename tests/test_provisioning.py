@@ -0,0 +1,13 @@
+def test_bulk_upload_accepts_roles_with_a_shift_rule(client, make_user):
+    _, headers = make_user(role="admin")
+    rows = [
+        {"name": "Eve", "email": "eve@bulk.test", "password": "pass123", "role": "evening"},
+        {"name": "Mal", "email": "mal@bulk.test", "password": "pass123", "role": "night"},
+    ]
+
+    response = client.post("/admin/users/bulk", headers=headers, json=rows)
+
+    assert response.status_code == 200
+    statuses = [(row["email"], row["status"]) for row in response.json()["results"]]
+    assert statuses[0] == ("eve@bulk.test", "created")
+    assert statuses[1] == ("mal@bulk.test", "invalid")
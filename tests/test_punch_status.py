@@ -0,0 +1,62 @@
+from datetime import datetime
+
+
+def test_unknown_punch_id_is_not_found(client, make_user):
+    _, headers = make_user()
+
+    assert client.get("/attendance/punches/no-such-punch", headers=headers).status_code == 404
+
+
+def test_buffered_punch_is_queued_for_its_owner_only(client, make_user, monkeypatch):
+    from app.punch_buffer import punch_buffer
+
+    user_id, headers = make_user()
+    _, other_headers = make_user()
+    monkeypatch.setattr(punch_buffer, "_pending", [
+        {"key": "buffered", "user_id": user_id, "kind": "clock_in", "timestamp": datetime.now()},
+    ])
+
+    response = client.get("/attendance/punches/buffered", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+    assert client.get("/attendance/punches/buffered", headers=other_headers).status_code == 404
+
+
+def test_write_behind_clock_in_is_documented_and_answered_as_queued_punch(client, make_user):
+    from app.punch_buffer import punch_buffer
+
+    responses = client.get("/openapi.json").json()["paths"]["/attendance/clock-in"]["post"]["responses"]
+    assert responses["202"]["content"]["application/json"]["schema"]["$ref"].endswith("/QueuedPunch")
+
+    user_id, headers = make_user()
+    punch_buffer.start()
+    try:
+        response = client.post("/attendance/clock-in", headers=headers)
+    finally:
+        punch_buffer.stop()
+    assert response.status_code == 202
+    body = response.json()
+    assert (body["status"], body["user_id"], body["kind"]) == ("queued", user_id, "clock_in")
+    assert client.get(f"/attendance/punches/{body['punch_id']}", headers=headers).json()["status"] == "clock_in"
+
+
+def test_orphaned_journal_is_replayed_in_batches(client, make_user, monkeypatch, tmp_path):
+    import json
+    from app import crud
+    from app.punch_buffer import PunchBuffer
+
+    users = [make_user() for _ in range(5)]
+    with open(tmp_path / "punches-999999.log", "w", encoding="utf-8") as f:
+        for n, (user_id, _) in enumerate(users):
+            f.write(json.dumps({"key": f"orphan-{n}", "user_id": user_id, "name": "x", "role": "user",
+                                "kind": "clock_in", "timestamp": datetime(2026, 3, 2, 9, n).isoformat()}) + "\n")
+    batches = []
+    apply = crud.apply_buffered_punches
+    monkeypatch.setattr(crud, "apply_buffered_punches", lambda db, punches: (batches.append(len(punches)), apply(db, punches))[1])
+
+    buffer = PunchBuffer(journal_dir=str(tmp_path), max_events=2)
+    buffer.start()
+    buffer.stop()
+
+    assert batches == [2, 2, 1]
+    assert not list(tmp_path.glob("punches-999999.log"))
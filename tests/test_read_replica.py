@@ -0,0 +1,27 @@
+import sqlite3
+
+from sqlalchemy import create_engine, event
+
+
+def test_reads_go_to_the_replica_and_writes_never_do(client, make_user, monkeypatch, tmp_path):
+    from app import database
+    from app.database import ReadRouter, engine
+
+    user_id, headers = make_user()
+    # The replica starts as a copy of the primary and, with no replication, stays that way
+    replica_path = tmp_path / "replica.db"
+    with sqlite3.connect(engine.url.database) as source, sqlite3.connect(replica_path) as target:
+        source.backup(target)
+    replica = create_engine(f"sqlite:///{replica_path}")
+    statements = []
+    event.listen(replica, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    monkeypatch.setattr(database, "read_router", ReadRouter(engine, [replica]))
+
+    assert client.post("/attendance/clock-in", headers=headers).status_code == 200
+    response = client.get("/attendance/today", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json() == []  # Served by the replica, which never saw the clock-in
+    assert any(statement.lstrip().upper().startswith("SELECT") for statement in statements)
+    assert not [s for s in statements if s.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))]
+    replica.dispose()
@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+
+class BlockedWebSocket:
+    """Holds every send until released, so events pile up in the send queue."""
+
+    def __init__(self):
+        self.released = asyncio.Event()
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        await self.released.wait()
+        self.sent.append(json.loads(message))
+
+    async def close(self, code=1000):
+        pass
+
+
+def test_queued_event_is_replaced_by_a_newer_one_for_the_same_record():
+    from app.realtime import ConnectionManager, InProcessBus
+
+    async def scenario():
+        manager = ConnectionManager(InProcessBus(), queue_size=10)
+        websocket = BlockedWebSocket()
+        await manager.connect(websocket)
+        await manager.publish("attendance.clock_in", {"user_id": 0, "date": "2026-01-01", "clock_in": "08:00:00"})
+        await asyncio.sleep(0)  # The writer takes the first event and blocks sending it
+        for user_id, clock_in in ((1, "08:01:00"), (2, "08:02:00"), (1, "08:03:00"), (1, "08:04:00")):
+            await manager.publish("attendance.clock_in", {"user_id": user_id, "date": "2026-01-01", "clock_in": clock_in})
+        await manager.publish("leave.decided", {"ids": [1], "status": "approved"})
+        await manager.publish("leave.decided", {"ids": [1], "status": "approved"})
+        websocket.released.set()
+        while manager.connections[websocket].queue.qsize():
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.001)
+        manager.disconnect(websocket)
+        return manager, websocket.sent
+
+    manager, sent = asyncio.run(scenario())
+
+    assert [(event["type"], event["data"].get("user_id"), event["data"].get("clock_in")) for event in sent] == [
+        ("attendance.clock_in", 0, "08:00:00"),
+        ("attendance.clock_in", 2, "08:02:00"),
+        ("attendance.clock_in", 1, "08:04:00"),
+        ("leave.decided", None, None),
+    ]
+    seqs = [event["seq"] for event in sent]
+    assert seqs == sorted(seqs)
+    assert manager.stats()["coalesced"] == 3
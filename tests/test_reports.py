@@ -0,0 +1,54 @@
+from datetime import date, timedelta
+
+import pytest
+
+
+def test_hours_report_range_is_capped(client, make_user):
+    from config.settings import REPORT_MAX_DAYS
+
+    _, headers = make_user(role="admin")
+    start = date(2026, 1, 1)
+    last_allowed = start + timedelta(days=REPORT_MAX_DAYS - 1)
+
+    too_long = client.get("/reports/hours", headers=headers,
+                          params={"from": start.isoformat(), "to": (last_allowed + timedelta(days=1)).isoformat()})
+    assert too_long.status_code == 400
+    assert client.get("/reports/hours", headers=headers,
+                      params={"from": start.isoformat(), "to": start.isoformat()}).status_code == 200
+
+
+def test_hours_arithmetic():
+    import numpy as np
+    from app.reports import compute_hours
+    from app.shifts import DEFAULT_RULE
+
+    start, grace, standard = DEFAULT_RULE.start_seconds, DEFAULT_RULE.grace_seconds, DEFAULT_RULE.standard_seconds
+    nan = np.nan
+    users = {1: ("Ann", "user"), 2: ("Bob", "user"), 3: ("Cy", "user")}
+    attendance = {
+        "user_id": np.array([1, 1, 2, 2, 3]),
+        "day": np.array([10, 11, 10, 11, 10]),
+        # Ann: on time with half an hour of overtime, then late by grace + 10 minutes and still in
+        # Bob: on time without clocking out, then absent; Cy: on leave
+        "clock_in": np.array([start, start + grace + 600, start, nan, nan]),
+        "clock_out": np.array([start + standard + 1800, nan, nan, nan, nan]),
+    }
+    leave = {"user_id": np.array([3]), "day": np.array([10])}
+
+    rows = {row["user_id"]: row for row in compute_hours(attendance, leave, users)}
+
+    assert rows[1] == {
+        "user_id": 1, "name": "Ann", "role": "user", "days_present": 2,
+        "worked_hours": round((standard + 1800) / 3600, 2), "overtime_hours": 0.5,
+        "late_arrivals": 1, "late_minutes": round((grace + 600) / 60, 1), "leave_days": 0,
+    }
+    assert (rows[2]["days_present"], rows[2]["worked_hours"], rows[2]["late_arrivals"]) == (1, 0.0, 0)
+    assert (rows[3]["days_present"], rows[3]["leave_days"]) == (0, 1)
+
+
+def test_shift_rules_crossing_midnight_are_rejected():
+    from app.shifts import ShiftRule
+
+    assert ShiftRule("14:00", 10, 8).late_after_seconds == 14 * 3600 + 600
+    with pytest.raises(ValueError):
+        ShiftRule("21:00", 10, 8)
@@ -0,0 +1,38 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, event
+
+
+@pytest.mark.parametrize("url", ["/attendance/today", "/Get-leave-lists"])
+def test_cache_hit_checks_out_no_connection(client, make_user, monkeypatch, tmp_path, url):
+    from app import database
+    from app.database import ReadRouter, engine
+    from app.user_index import user_index
+
+    _, headers = make_user()
+    monkeypatch.setattr(user_index, "check_interval", 3600)
+    # Read sessions check a replica connection out as soon as they are opened
+    replica_path = tmp_path / "replica.db"
+    with sqlite3.connect(engine.url.database) as source, sqlite3.connect(replica_path) as target:
+        source.backup(target)
+    replica = create_engine(f"sqlite:///{replica_path}")
+    monkeypatch.setattr(database, "read_router", ReadRouter(engine, [replica]))
+    first = client.get(url, headers=headers)
+    assert first.status_code == 200
+
+    checkouts = []
+    count = lambda *args: checkouts.append(1)
+    event.listen(engine, "checkout", count)
+    event.listen(replica, "checkout", count)
+    try:
+        cached = client.get(url, headers=headers)
+        not_modified = client.get(url, headers={**headers, "If-None-Match": first.headers["etag"]})
+    finally:
+        event.remove(engine, "checkout", count)
+        event.remove(replica, "checkout", count)
+        replica.dispose()
+
+    assert cached.status_code == 200 and cached.content == first.content
+    assert not_modified.status_code == 304
+    assert checkouts == []
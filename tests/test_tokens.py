@@ -0,0 +1,31 @@
+import pytest
+
+
+def respell_last_char(segment: str) -> str:
+    """Same decoded bytes, different trailing (discarded) bits."""
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+    index = alphabet.index(segment[-1])
+    return segment[:-1] + alphabet[index ^ 1]
+
+
+def test_token_round_trip():
+    from app.auth import create_access_token, decode_token
+
+    assert decode_token(create_access_token({"sub": "round@example.com"})).email == "round@example.com"
+
+
+@pytest.mark.parametrize("respell", [
+    respell_last_char,
+    lambda segment: segment + "=" * (-len(segment) % 4 or 4),
+    lambda segment: segment[:4] + "\n" + segment[4:],
+])
+def test_signature_spellings_other_than_the_canonical_one_are_rejected(respell):
+    from app.auth import create_access_token, decode_token, verified_tokens
+
+    token = create_access_token({"sub": "malleable@example.com"})
+    signing_input, _, signature = token.rpartition(".")
+    forged = f"{signing_input}.{respell(signature)}"
+    assert forged != token
+    verified_tokens.clear()
+
+    assert decode_token(forged) is None